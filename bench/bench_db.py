@@ -0,0 +1,132 @@
+"""
+Benchmark des requêtes SQLite avant/après les migrations d'index.
+
+Crée une base jetable au schéma initial (migration 1), la remplit avec un
+historique de détections réaliste, puis mesure les requêtes chaudes de psm.py
+(EXPLAIN QUERY PLAN + temps médian) avant et après les migrations suivantes.
+
+    python bench/bench_db.py --detections 50000 --matchs 40 --repetitions 200
+    python bench/bench_db.py --output bench_db.json
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Les requêtes telles qu'elles sont faites dans psm.py
+REQUETES = {
+    'historique_detections': (
+        'SELECT match, nb_places, date, date_formatee FROM detections ORDER BY created_at DESC LIMIT ?',
+        lambda matchs: (50,)
+    ),
+    'derniere_detection_match': (
+        'SELECT date FROM detections WHERE match = ? ORDER BY created_at DESC LIMIT 1',
+        lambda matchs: (random.choice(matchs),)
+    ),
+    'unicite_match': (
+        'SELECT nom, url FROM matches WHERE nom = ? OR url = ?',
+        lambda matchs: ('Nouveau match', 'https://billetterie.psg.fr/fr/catalogue/nouveau')
+    ),
+    'fenetres_vente_match': (
+        'SELECT id, match, type, debut, fin FROM sale_windows WHERE match = ? ORDER BY debut',
+        lambda matchs: (random.choice(matchs),)
+    ),
+}
+
+def importer_psm():
+    """Importe psm.py avec un répertoire de données jetable"""
+    os.environ.setdefault('PSM_DATA_DIR', tempfile.mkdtemp(prefix='psm-bench-db-'))
+    sys.path.insert(0, RACINE)
+    import psm
+    return psm
+
+def remplir(conn, nb_matchs, nb_detections):
+    """Matchs, fenêtres de vente et détections étalées sur un an"""
+    matchs = [f"PSG vs Adversaire {i}" for i in range(nb_matchs)]
+    conn.executemany(
+        'INSERT INTO matches (nom, url, competition) VALUES (?, ?, ?)',
+        [(nom, f"https://billetterie.psg.fr/fr/catalogue/match-{i}", 'Ligue 1') for i, nom in enumerate(matchs)]
+    )
+    debut = datetime.now() - timedelta(days=365)
+    conn.executemany(
+        'INSERT INTO sale_windows (match, type, debut, fin) VALUES (?, ?, ?, ?)',
+        [(nom, 'vente_generale', (debut + timedelta(days=i)).isoformat(), (debut + timedelta(days=i, hours=2)).isoformat())
+         for i, nom in enumerate(matchs * 3)]
+    )
+    lignes = []
+    for _ in range(nb_detections):
+        quand = debut + timedelta(seconds=random.randint(0, 365 * 86400))
+        lignes.append((random.choice(matchs), random.randint(1, 6), quand.isoformat(),
+                       quand.strftime('%d/%m/%Y %H:%M'), quand.strftime('%Y-%m-%d %H:%M:%S')))
+    conn.executemany(
+        'INSERT INTO detections (match, nb_places, date, date_formatee, created_at) VALUES (?, ?, ?, ?, ?)', lignes
+    )
+    conn.commit()
+    return matchs
+
+def mesurer(conn, matchs, repetitions):
+    """Plan et temps médian (ms) de chaque requête"""
+    resultats = {}
+    for nom, (sql, parametres) in REQUETES.items():
+        plan = [ligne[3] for ligne in conn.execute('EXPLAIN QUERY PLAN ' + sql, parametres(matchs))]
+        durees = []
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            conn.execute(sql, parametres(matchs)).fetchall()
+            durees.append(time.perf_counter() - debut)
+        resultats[nom] = {'plan': plan, 'mediane_ms': round(statistics.median(durees) * 1000, 4)}
+    return resultats
+
+def main():
+    parser = argparse.ArgumentParser(description="Plans et temps des requêtes SQLite avant/après les migrations d'index")
+    parser.add_argument('--detections', type=int, default=50000)
+    parser.add_argument('--matchs', type=int, default=40)
+    parser.add_argument('--repetitions', type=int, default=200)
+    parser.add_argument('--output', help="Écrire le rapport JSON dans ce fichier")
+    args = parser.parse_args()
+
+    psm = importer_psm()
+    random.seed(42)
+    chemin = os.path.join(tempfile.mkdtemp(prefix='psm-bench-db-'), 'bench.db')
+    conn = sqlite3.connect(chemin)
+
+    # Avant : schéma initial et tables ajoutées ensuite, sans les index
+    version_avant = psm.appliquer_migrations(conn, jusqu_a=3)
+    matchs = remplir(conn, args.matchs, args.detections)
+    conn.execute('ANALYZE')
+    avant = mesurer(conn, matchs, args.repetitions)
+
+    version_apres = psm.appliquer_migrations(conn)
+    conn.execute('ANALYZE')
+    apres = mesurer(conn, matchs, args.repetitions)
+
+    print(f"{args.detections} détections, {args.matchs} matchs, {args.repetitions} répétitions")
+    print(f"Schéma v{version_avant} → v{version_apres}\n")
+    for nom in REQUETES:
+        gain = avant[nom]['mediane_ms'] / apres[nom]['mediane_ms'] if apres[nom]['mediane_ms'] else float('inf')
+        print(f"{nom}: {avant[nom]['mediane_ms']:.4f} ms → {apres[nom]['mediane_ms']:.4f} ms (x{gain:.1f})")
+        print(f"   avant: {' | '.join(avant[nom]['plan'])}")
+        print(f"   après: {' | '.join(apres[nom]['plan'])}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'date': datetime.now().isoformat(),
+                'sqlite': sqlite3.sqlite_version,
+                'parametres': vars(args),
+                'schema': {'avant': version_avant, 'apres': version_apres},
+                'avant': avant,
+                'apres': apres
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\nRapport écrit dans {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Benchmark hors ligne du scraping (verifier_match).
+
+Les pages de billetterie sont enregistrées une fois en HAR, puis rejouées par
+Playwright sans toucher au site : chaque vérification passe par le vrai code
+de psm.py (pool navigateur, attente, extraction, persistance) et on mesure le
+temps de chaque phase de façon reproductible.
+
+    python bench/bench_scraper.py record --nom "PSG vs OM" --url https://billetterie.psg.fr/fr/catalogue/...
+    python bench/bench_scraper.py replay --iterations 5 --output bench_report.json
+    python bench/bench_scraper.py compare bench_main.json bench_ma_branche.json
+
+Le rapport JSON (une entrée par match + un agrégat global, min/médiane/p95/max
+par phase) sert à comparer deux branches avec la commande compare.
+"""
+import argparse
+import base64
+import json
+import math
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOTS_DIR = os.path.join(RACINE, 'bench', 'snapshots')
+MANIFEST_FILE = 'manifest.json'
+
+def importer_psm():
+    """Importe psm.py avec un répertoire de données jetable et sans Telegram"""
+    os.environ.setdefault('PSM_DATA_DIR', tempfile.mkdtemp(prefix='psm-bench-'))
+    sys.path.insert(0, RACINE)
+    import psm
+    psm.envoyer_message = lambda msg: None  # Jamais d'alerte réelle pendant un benchmark
+    return psm
+
+def charger_manifest(dossier):
+    chemin = os.path.join(dossier, MANIFEST_FILE)
+    if not os.path.exists(chemin):
+        return []
+    with open(chemin, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def sauvegarder_manifest(dossier, snapshots):
+    with open(os.path.join(dossier, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(snapshots, f, ensure_ascii=False, indent=2)
+
+def slug(nom):
+    return re.sub(r'[^a-z0-9]+', '-', nom.lower()).strip('-') or 'match'
+
+def stats_serie(valeurs):
+    """min/médiane/p95/max d'une liste de durées (secondes)"""
+    valeurs = sorted(valeurs)
+    n = len(valeurs)
+    milieu = n // 2
+    mediane = valeurs[milieu] if n % 2 else (valeurs[milieu - 1] + valeurs[milieu]) / 2
+    return {
+        'n': n,
+        'min': round(valeurs[0], 4),
+        'mediane': round(mediane, 4),
+        'p95': round(valeurs[max(0, math.ceil(0.95 * n) - 1)], 4),
+        'max': round(valeurs[-1], 4)
+    }
+
+def html_document(har_path, url):
+    """Retourne le HTML du document principal enregistré dans le HAR (ou None)"""
+    with open(har_path, 'r', encoding='utf-8') as f:
+        har = json.load(f)
+    for entree in har['log']['entries']:
+        if entree['request']['url'].split('#')[0] != url:
+            continue
+        contenu = entree['response'].get('content', {})
+        texte = contenu.get('text')
+        if texte is None:
+            continue
+        if contenu.get('encoding') == 'base64':
+            texte = base64.b64decode(texte).decode('utf-8', errors='replace')
+        return texte
+    return None
+
+def infos_git():
+    def git(*args):
+        try:
+            return subprocess.check_output(['git', *args], cwd=RACINE, stderr=subprocess.DEVNULL).decode().strip()
+        except Exception:
+            return None
+    return {'commit': git('rev-parse', 'HEAD'), 'branche': git('rev-parse', '--abbrev-ref', 'HEAD')}
+
+def commande_record(args):
+    psm = importer_psm()
+    psm.ROUTE_FILTER_ENABLED = False  # Enregistrer la page complète, le filtre s'appliquera au replay
+    os.makedirs(args.snapshots, exist_ok=True)
+    snapshots = [s for s in charger_manifest(args.snapshots) if s['nom'] != args.nom]
+    har = os.path.join(args.snapshots, f"{slug(args.nom)}.har")
+    
+    resultat = psm.browser_pool.run(
+        lambda: psm._analyser_match(args.nom, args.url, har=har, har_update=True), timeout=psm.CHECK_TIMEOUT)
+    snapshots.append({
+        'nom': args.nom,
+        'url': args.url,
+        'har': os.path.relpath(har, args.snapshots),
+        'enregistre_le': datetime.now().isoformat(),
+        'nb_pmr': resultat['nb_pmr'],
+        'nb_offres': len(resultat['offres'])
+    })
+    sauvegarder_manifest(args.snapshots, snapshots)
+    psm.browser_pool.shutdown()
+    print(f"✅ {args.nom} enregistré dans {har} ({resultat['nb_pmr']} PMR, {len(resultat['offres'])} offre(s))")
+
+def commande_replay(args):
+    snapshots = charger_manifest(args.snapshots)
+    if not snapshots:
+        sys.exit(f"Aucun snapshot dans {args.snapshots} (lancer d'abord la commande record)")
+    psm = importer_psm()
+    
+    rapport = {
+        'genere_le': datetime.now().isoformat(),
+        'git': infos_git(),
+        'python': platform.python_version(),
+        'iterations': args.iterations,
+        'check_concurrency': psm.CHECK_CONCURRENCY,
+        'matchs': {},
+        'global': {}
+    }
+    series_globales = {}
+    
+    for snapshot in snapshots:
+        har = os.path.join(args.snapshots, snapshot['har'])
+        match = {'nom': snapshot['nom'], 'url': snapshot['url'], 'har': har}
+        series = {}
+        erreurs = 0
+        dernier = None
+        
+        # Tier HTTP : analyse du HTML enregistré (sans réseau)
+        html = html_document(har, snapshot['url'])
+        if html is not None:
+            for _ in range(args.iterations):
+                debut = time.perf_counter()
+                psm.analyser_html(html)
+                series.setdefault('analyse_html', []).append(time.perf_counter() - debut)
+        
+        for _ in range(args.iterations):
+            psm.empreinte_par_match.clear()  # Chaque itération refait le chemin complet (détection, alerte, status)
+            dernier = psm.verifier_match(match)
+            if dernier['erreur']:
+                erreurs += 1
+                continue
+            for phase, duree in dernier['phases'].items():
+                series.setdefault(phase, []).append(duree)
+            series.setdefault('total', []).append(dernier['duree'])
+        
+        rapport['matchs'][snapshot['nom']] = {
+            'nb_pmr': dernier['nb_pmr'] if dernier else None,
+            'nb_pmr_enregistre': snapshot.get('nb_pmr'),
+            'source': dernier['source'] if dernier else None,
+            'erreurs': erreurs,
+            'phases': {phase: stats_serie(valeurs) for phase, valeurs in series.items()}
+        }
+        for phase, valeurs in series.items():
+            series_globales.setdefault(phase, []).extend(valeurs)
+    
+    rapport['global'] = {phase: stats_serie(valeurs) for phase, valeurs in series_globales.items()}
+    psm.browser_pool.shutdown()
+    
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(rapport, f, ensure_ascii=False, indent=2)
+    print(f"📊 Rapport écrit dans {args.output}")
+    for phase, stats in sorted(rapport['global'].items()):
+        print(f"   {phase:<14} médiane {stats['mediane'] * 1000:8.1f} ms   p95 {stats['p95'] * 1000:8.1f} ms   (n={stats['n']})")
+
+def commande_compare(args):
+    with open(args.avant, 'r', encoding='utf-8') as f:
+        avant = json.load(f)
+    with open(args.apres, 'r', encoding='utf-8') as f:
+        apres = json.load(f)
+    print(f"{'phase':<14} {'avant (ms)':>12} {'après (ms)':>12} {'écart':>8}")
+    for phase in sorted(set(avant['global']) | set(apres['global'])):
+        a = avant['global'].get(phase, {}).get('mediane')
+        b = apres['global'].get(phase, {}).get('mediane')
+        if a is None or b is None:
+            print(f"{phase:<14} {'-' if a is None else f'{a * 1000:.1f}':>12} {'-' if b is None else f'{b * 1000:.1f}':>12}")
+            continue
+        ecart = f"{(b - a) / a * 100:+.0f}%" if a else '-'
+        print(f"{phase:<14} {a * 1000:12.1f} {b * 1000:12.1f} {ecart:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne de verifier_match (record/replay HAR)")
+    sous = parser.add_subparsers(dest='commande', required=True)
+    
+    record = sous.add_parser('record', help="Enregistrer une page de match en HAR")
+    record.add_argument('--nom', required=True)
+    record.add_argument('--url', required=True)
+    record.add_argument('--snapshots', default=SNAPSHOTS_DIR)
+    record.set_defaults(fonction=commande_record)
+    
+    replay = sous.add_parser('replay', help="Rejouer les snapshots et produire le rapport JSON")
+    replay.add_argument('--iterations', type=int, default=5)
+    replay.add_argument('--snapshots', default=SNAPSHOTS_DIR)
+    replay.add_argument('--output', default='bench_report.json')
+    replay.set_defaults(fonction=commande_replay)
+    
+    compare = sous.add_parser('compare', help="Comparer deux rapports (médianes globales)")
+    compare.add_argument('avant')
+    compare.add_argument('apres')
+    compare.set_defaults(fonction=commande_compare)
+    
+    args = parser.parse_args()
+    args.fonction(args)
+
+if __name__ == '__main__':
+    main()
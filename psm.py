@@ -1,4 +1,4 @@
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 import requests
 import time
 from datetime import datetime, timedelta
@@ -8,11 +8,29 @@ import os
 import threading
 from http.server import HTTPServer, SimpleHTTPRequestHandler
 import locale
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 import collections
 from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import sqlite3
+import asyncio
+import contextlib
+import atexit
+import heapq
+import hashlib
+import re
+import itertools
+import bisect
+import uuid
+import math
+import socket
+import signal
+import sys
+import copy
+import logging
+import logging.handlers
+from dataclasses import dataclass
+from urllib.parse import urlparse
 
 # ====================
 # SYSTÈME DE LOGS POUR L'ADMIN
@@ -49,7 +67,7 @@ except:
 # CONFIGURATION RÉPERTOIRE DE DONNÉES
 # ====================
 # Répertoire persistant pour toutes les données (base de données et fichiers JSON)
-DATA_DIR = '/app/data'
+DATA_DIR = os.getenv('PSM_DATA_DIR', '/app/data')
 
 # Créer le répertoire de données s'il n'existe pas et vérifier les permissions
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -74,48 +92,272 @@ GROQ_CACHE_FILE = os.path.join(DATA_DIR, 'groq_cache.json')
 DETECTIONS_HISTORY_FILE = os.path.join(DATA_DIR, 'detections_history.json')
 STATUS_FILE = os.path.join(DATA_DIR, 'status.json')
 
+# ====================
+# TRACES DE DIAGNOSTIC
+# ====================
+# Événements et spans nommés, en JSON (une ligne par événement) dans un fichier tournant.
+# Désactivées par défaut : un appel ne coûte alors qu'une comparaison d'entiers, sans
+# formatage ni écriture. TRACE_LEVEL=debug|info|warning|error pour les activer.
+TRACE_DEBUG, TRACE_INFO, TRACE_WARNING, TRACE_ERROR, TRACE_OFF = 10, 20, 30, 40, 100
+TRACE_NIVEAUX = {'debug': TRACE_DEBUG, 'info': TRACE_INFO, 'warning': TRACE_WARNING, 'error': TRACE_ERROR, 'off': TRACE_OFF}
+TRACE_LEVEL = os.getenv("TRACE_LEVEL", "off").lower()
+TRACE_SAMPLE = os.getenv("TRACE_SAMPLE", "1.0")  # Fraction des événements sous warning gardés (validée par Traceur)
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(DATA_DIR, 'traces.jsonl'))
+TRACE_MAX_MB = float(os.getenv("TRACE_MAX_MB", "10"))  # Taille d'un fichier avant rotation
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", "3"))  # Anciens fichiers gardés (traces.jsonl.1, .2...)
+
+class _SpanInactif:
+    """Span désactivé (traces coupées) : ne mesure rien"""
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+    
+    def noter(self, **donnees):
+        pass
+
+_SPAN_INACTIF = _SpanInactif()
+
+class _SpanErreurs(_SpanInactif):
+    """Span filtré par le niveau ou l'échantillonnage : rien n'est mesuré, seule une exception est tracée"""
+    __slots__ = ('traceur', 'nom', 'donnees')
+    
+    def __init__(self, traceur, nom, donnees):
+        self.traceur = traceur
+        self.nom = nom
+        self.donnees = donnees
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.donnees['erreur'] = repr(exc)
+            self.traceur._emettre(self.nom, TRACE_ERROR, self.donnees)
+        return False
+
+class _Span:
+    __slots__ = ('traceur', 'nom', 'niveau', 'donnees', 'debut')
+    
+    def __init__(self, traceur, nom, niveau, donnees):
+        self.traceur = traceur
+        self.nom = nom
+        self.niveau = niveau
+        self.donnees = donnees
+    
+    def __enter__(self):
+        self.debut = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.donnees['duree_ms'] = round((time.perf_counter() - self.debut) * 1000, 3)
+        if exc_type is not None:
+            self.donnees['erreur'] = repr(exc)
+        self.traceur._emettre(self.nom, max(self.niveau, TRACE_ERROR) if exc_type else self.niveau, self.donnees)
+        return False
+    
+    def noter(self, **donnees):
+        """Ajoute des champs à l'événement écrit en sortie du span"""
+        self.donnees.update(donnees)
+
+class Traceur:
+    """Traces de diagnostic : niveaux, échantillonnage, fichier tournant borné"""
+    
+    def __init__(self, niveau=TRACE_LEVEL, echantillon=TRACE_SAMPLE, fichier=TRACE_FILE):
+        self.fichier = fichier
+        self._lock = threading.Lock()
+        self._logger = None  # Créé à la première écriture : rien n'est ouvert tant que c'est désactivé
+        self.emis = 0
+        self.ecartes = 0
+        self.echantillon = 1.0
+        try:
+            self.configurer(niveau, echantillon)
+        except ValueError as e:
+            # Variable d'environnement erronée : démarrer quand même, sans traces
+            log(f"⚠️ {e}, traces désactivées", 'warning')
+            self.niveau = TRACE_OFF
+    
+    def configurer(self, niveau=None, echantillon=None):
+        """Change le niveau ('debug', 'info', ..., 'off') et/ou l'échantillonnage à chaud"""
+        # Tout valider avant de changer quoi que ce soit
+        if niveau is not None and niveau not in TRACE_NIVEAUX:
+            raise ValueError(f"Niveau de trace inconnu: {niveau} ({', '.join(TRACE_NIVEAUX)})")
+        if echantillon is not None:
+            try:
+                echantillon = float(echantillon)
+            except (TypeError, ValueError):
+                raise ValueError(f"Échantillonnage de trace invalide: {echantillon!r} (nombre entre 0 et 1)") from None
+        if niveau is not None:
+            self.niveau = TRACE_NIVEAUX[niveau]
+        if echantillon is not None:
+            self.echantillon = min(1.0, max(0.0, echantillon))
+    
+    def actif(self, niveau=TRACE_DEBUG):
+        """Pour éviter de calculer les données d'un événement qui ne sera pas écrit"""
+        return niveau >= self.niveau
+    
+    def _garder(self, niveau):
+        if niveau < self.niveau:
+            return False
+        if niveau < TRACE_WARNING and self.echantillon < 1.0 and random.random() >= self.echantillon:
+            self.ecartes += 1
+            return False
+        return True
+    
+    # nom et niveau positionnels seulement : les données peuvent avoir leur propre clé 'nom' (résultat d'un check)
+    def evenement(self, nom, niveau=TRACE_DEBUG, /, **donnees):
+        if self._garder(niveau):
+            self._emettre(nom, niveau, donnees)
+    
+    def span(self, nom, niveau=TRACE_DEBUG, /, **donnees):
+        """with trace.span('nom') as span: ... → un événement avec duree_ms (et l'erreur éventuelle)"""
+        if not self._garder(niveau):
+            # Une erreur dans le span est tracée même si le span lui-même est filtré
+            return _SpanErreurs(self, nom, donnees) if self.actif(TRACE_ERROR) else _SPAN_INACTIF
+        return _Span(self, nom, niveau, donnees)
+    
+    def _sortie(self):
+        with self._lock:
+            if self._logger is None:
+                logger = logging.getLogger('psm.traces')
+                logger.propagate = False
+                logger.setLevel(logging.DEBUG)
+                handler = logging.handlers.RotatingFileHandler(
+                    self.fichier, maxBytes=int(TRACE_MAX_MB * 1024 * 1024),
+                    backupCount=TRACE_BACKUPS, encoding='utf-8', delay=True)
+                logger.addHandler(handler)
+                self._logger = logger
+            return self._logger
+    
+    def _emettre(self, nom, niveau, donnees):
+        try:
+            ligne = json.dumps({
+                'ts': datetime.now().isoformat(timespec='milliseconds'),
+                'niveau': logging.getLevelName(niveau).lower(),
+                'evenement': nom,
+                'thread': threading.current_thread().name,
+                **donnees
+            }, ensure_ascii=False, default=str)
+            self._sortie().log(niveau, ligne)
+            self.emis += 1
+        except Exception as e:
+            print(f"⚠️ Erreur écriture trace {nom}: {e}")
+    
+    def resume(self):
+        niveau = next((nom for nom, valeur in TRACE_NIVEAUX.items() if valeur == self.niveau), self.niveau)
+        return {'niveau': niveau, 'echantillon': self.echantillon, 'fichier': self.fichier,
+                'emis': self.emis, 'ecartes': self.ecartes}
+
+trace = Traceur()
+
 # ====================
 # CONFIGURATION SQLITE
 # ====================
 DB_FILE = os.path.join(DATA_DIR, 'psm_bot.db')
-db_conn = None  # Connexion SQLite
-DB_TIMEOUT = 20.0  # Timeout en secondes pour les opérations de base de données
+DB_TIMEOUT = 20.0  # Timeout en secondes pour les opérations de base de données (busy_timeout)
 MAX_RETRIES = 3  # Nombre maximum de tentatives en cas de verrou
 RETRY_DELAY = 0.1  # Délai initial entre les tentatives (en secondes)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))  # Connexions libres gardées pour les threads suivants
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "8192"))  # Cache de pages par connexion
 
 # Verrou pour protéger les opérations critiques sur les matches
 matches_lock = threading.Lock()
 
+# Un seul écrivain à la fois dans le process (voir execute_write) : en WAL les lectures
+# ne sont jamais bloquées par une écriture, seules les écritures se sérialisent
+db_write_lock = threading.RLock()
+db_local = threading.local()
+
+class PoolConnexions:
+    """
+    Connexions SQLite réutilisées d'un thread à l'autre.
+    
+    Chaque thread garde sa connexion tant qu'il vit (get_db_connection) ; quand il se
+    termine (thread de requête Flask, vérification), elle revient dans le pool au lieu
+    d'être fermée, jusqu'à DB_POOL_SIZE connexions libres.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._libres = []
+        self._ouvertes = set()
+    
+    def _ouvrir(self):
+        conn = sqlite3.connect(DB_FILE, check_same_thread=False, timeout=DB_TIMEOUT)
+        conn.row_factory = sqlite3.Row  # Permet d'accéder aux colonnes par nom
+        conn.execute('PRAGMA journal_mode=WAL')  # Lecteurs et écrivain ne se bloquent plus
+        conn.execute('PRAGMA synchronous=NORMAL')  # Suffisant en WAL, beaucoup moins de fsync
+        conn.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+    
+    def emprunter(self):
+        with self._lock:
+            if self._libres:
+                return self._libres.pop()
+        conn = self._ouvrir()
+        with self._lock:
+            self._ouvertes.add(conn)
+        return conn
+    
+    def rendre(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # Thread terminé au milieu d'une écriture
+        except sqlite3.Error:
+            self._fermer(conn)
+            return
+        with self._lock:
+            if len(self._libres) < DB_POOL_SIZE:
+                self._libres.append(conn)
+                return
+        self._fermer(conn)
+    
+    def _fermer(self, conn):
+        with self._lock:
+            self._ouvertes.discard(conn)
+        with contextlib.suppress(sqlite3.Error):
+            conn.close()
+    
+    def fermer_tout(self):
+        with self._lock:
+            ouvertes = list(self._ouvertes)
+            self._ouvertes.clear()
+            self._libres.clear()
+        for conn in ouvertes:
+            with contextlib.suppress(sqlite3.Error):
+                conn.close()
+    
+    def resume(self):
+        with self._lock:
+            return {'ouvertes': len(self._ouvertes), 'libres': len(self._libres)}
+
+class _ConnexionDuThread:
+    """Tient la connexion d'un thread ; la rend au pool quand le thread se termine"""
+    
+    def __init__(self, conn):
+        self.conn = conn
+    
+    def __del__(self):
+        with contextlib.suppress(Exception):
+            db_pool.rendre(self.conn)
+
+db_pool = PoolConnexions()
+atexit.register(db_pool.fermer_tout)
+
 def get_db_connection():
-    """Obtient ou crée la connexion SQLite avec timeout"""
-    global db_conn
-    # #region agent log
-    import json as json_module
-    import os
-    try:
-        debug_log_path = os.path.join(os.path.dirname(__file__), '.cursor', 'debug.log')
-        os.makedirs(os.path.dirname(debug_log_path), exist_ok=True)
-        with open(debug_log_path, 'a', encoding='utf-8') as f:
-            f.write(json_module.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"C","location":"psm.py:get_db_connection:ENTRY","message":"get_db_connection called","data":{"db_conn_is_none":db_conn is None,"db_file":DB_FILE,"db_file_exists":os.path.exists(DB_FILE)},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-    except: pass
-    # #endregion
-    if db_conn is None:
+    """Retourne la connexion SQLite du thread courant (empruntée au pool au premier appel)"""
+    emprunt = getattr(db_local, 'emprunt', None)
+    if emprunt is None:
+        # Une seule trace par thread (emprunt au pool), rien sur le chemin courant
         try:
-            db_conn = sqlite3.connect(DB_FILE, check_same_thread=False, timeout=DB_TIMEOUT)
-            db_conn.row_factory = sqlite3.Row  # Permet d'accéder aux colonnes par nom
-            # #region agent log
-            try:
-                debug_log_path = os.path.join(os.path.dirname(__file__), '.cursor', 'debug.log')
-                os.makedirs(os.path.dirname(debug_log_path), exist_ok=True)
-                with open(debug_log_path, 'a', encoding='utf-8') as f:
-                    f.write(json_module.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"C","location":"psm.py:get_db_connection:NEW_CONN","message":"New DB connection created","data":{"db_file":DB_FILE,"timeout":DB_TIMEOUT},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-            except: pass
-            # #endregion
+            emprunt = db_local.emprunt = _ConnexionDuThread(db_pool.emprunter())
+            trace.evenement('db.connexion', db_file=DB_FILE, libres=len(db_pool._libres))
         except sqlite3.OperationalError as e:
+            trace.evenement('db.connexion', TRACE_ERROR, db_file=DB_FILE, erreur=str(e))
             log(f"❌ Erreur connexion base de données: {e}", 'error')
-            db_conn = None
             raise
-    return db_conn
+    return emprunt.conn
 
 def execute_with_retry(operation, *args, **kwargs):
     """
@@ -158,74 +400,251 @@ def execute_with_retry(operation, *args, **kwargs):
         raise last_error
     return None
 
-def init_database():
-    """Initialise la base de données SQLite et crée les tables si nécessaire"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Table matches
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS matches (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nom TEXT NOT NULL UNIQUE,
-                url TEXT NOT NULL,
-                competition TEXT,
-                date TEXT,
-                time TEXT,
-                lieu TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Table status (une seule ligne)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS status (
-                id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
-                data TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Table analytics (une seule ligne)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS analytics (
-                id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
-                data TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+def execute_write(operation, *args, **kwargs):
+    """
+    Exécute une opération d'écriture : comme execute_with_retry, mais sérialisée
+    derrière db_write_lock (un seul écrivain à la fois dans le process).
+    
+    L'opération reçoit la connexion du thread et doit faire son commit.
+    """
+    with db_write_lock:
+        try:
+            return execute_with_retry(operation, *args, **kwargs)
+        except Exception:
+            conn = get_db_connection()
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+# ====================
+# MIGRATIONS DU SCHÉMA
+# ====================
+# Chaque migration est appliquée une seule fois, dans sa propre transaction, et notée
+# dans schema_version. Pour faire évoluer le schéma : ajouter une entrée à MIGRATIONS,
+# ne jamais modifier une migration déjà déployée.
+
+def _migration_schema_initial(cursor):
+    # Table matches
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS matches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nom TEXT NOT NULL UNIQUE,
+            url TEXT NOT NULL,
+            competition TEXT,
+            date TEXT,
+            time TEXT,
+            lieu TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Table status (une seule ligne)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS status (
+            id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            data TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Table analytics (une seule ligne)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analytics (
+            id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            data TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Table groq_cache
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS groq_cache (
+            match_name TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Table detections
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS detections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            match TEXT NOT NULL,
+            nb_places INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            date_formatee TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _migration_fenetres_vente(cursor):
+    # Ouvertures de vente connues par match (calendrier des ventes)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sale_windows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            match TEXT NOT NULL,
+            type TEXT NOT NULL,
+            debut TEXT NOT NULL,
+            fin TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _migration_baux(cursor):
+    # Répartition des matchs entre plusieurs workers
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS match_leases (
+            match TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            acquired_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS workers (
+            id TEXT PRIMARY KEY,
+            seen_at REAL NOT NULL
+        )
+    ''')
+
+def _migration_index(cursor):
+    # Historique trié par date, dernière détection d'un match, fenêtres d'un match, baux d'un worker
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_detections_created_at ON detections (created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_detections_match_created_at ON detections (match, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sale_windows_match_debut ON sale_windows (match, debut)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_match_leases_owner ON match_leases (owner)')
+
+def _migration_url_unique(cursor):
+    # L'unicité de l'URL n'était vérifiée qu'en Python. Les doublons éventuels ne sont pas
+    # supprimés d'office (détections, fenêtres de vente et baux y sont rattachés par nom) :
+    # la migration s'arrête et les liste, à fusionner à la main avant de relancer.
+    doublons = cursor.execute('''
+        SELECT url, GROUP_CONCAT(id || ' ' || quote(nom), ', ')
+        FROM matches
+        GROUP BY url
+        HAVING COUNT(*) > 1
+    ''').fetchall()
+    if doublons:
+        detail = '; '.join(f"{url} -> {matchs}" for url, matchs in doublons)
+        raise ValueError(f"{len(doublons)} URL(s) de match en double, à dédoublonner avant la migration : {detail}")
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_matches_url ON matches (url)')
+
+# Agrégats des détections par match : table -> longueur du préfixe de `date` (ISO) qui forme la période
+ROLLUPS_DETECTIONS = {
+    'hourly': ('detections_hourly', 13),  # 2026-10-18T14
+    'daily': ('detections_daily', 10),    # 2026-10-18
+}
+
+def _migration_rollups_detections(cursor):
+    # L'historique complet est gardé : les agrégats évitent de le parcourir pour les statistiques
+    for table, longueur in ROLLUPS_DETECTIONS.values():
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                match TEXT NOT NULL,
+                periode TEXT NOT NULL,
+                nb_detections INTEGER NOT NULL,
+                max_places INTEGER,
+                premiere TEXT NOT NULL,
+                derniere TEXT NOT NULL,
+                PRIMARY KEY (match, periode)
+            ) WITHOUT ROWID
         ''')
-        
-        # Table groq_cache
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS groq_cache (
-                match_name TEXT PRIMARY KEY,
-                data TEXT NOT NULL,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_periode ON {table} (periode)')
+        # Reprise de l'historique existant
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO {table} (match, periode, nb_detections, max_places, premiere, derniere)
+            SELECT match, substr(date, 1, {longueur}), COUNT(*), MAX(nb_places), MIN(date), MAX(date)
+            FROM detections
+            WHERE match IS NOT NULL AND date IS NOT NULL
+            GROUP BY match, substr(date, 1, {longueur})
         ''')
-        
-        # Table detections
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS detections (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                match TEXT NOT NULL,
-                nb_places INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                date_formatee TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+
+def _migration_status_par_match(cursor):
+    # Une ligne par match, mise à jour seule après son check (le blob `status` reste le snapshot public)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS match_status (
+            match TEXT PRIMARY KEY,
+            pmr_disponible INTEGER NOT NULL DEFAULT 0,
+            nb_checks INTEGER NOT NULL DEFAULT 0,
+            dernier_check TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Reprise des compteurs du dernier snapshot (dernier_check n'y est qu'en texte relatif)
+    row = cursor.execute('SELECT data FROM status WHERE id = 1').fetchone()
+    if row:
+        for m in json.loads(row[0]).get('matchs', []):
+            cursor.execute(
+                'INSERT OR IGNORE INTO match_status (match, pmr_disponible, nb_checks) VALUES (?, ?, ?)',
+                (m['nom'], int(bool(m.get('pmr_disponible'))), m.get('nb_checks', 0))
             )
-        ''')
-        
-        conn.commit()
-        log("✅ Base de données SQLite initialisée avec succès", 'success')
-        log(f"📂 Chemin base de données: {os.path.abspath(DB_FILE)}", 'info')
-        return True
-    except Exception as e:
-        log(f"❌ Erreur initialisation base de données: {e}", 'error')
-        import traceback
-        traceback.print_exc()
-        return False
+
+# (version, description, fonction) dans l'ordre d'application
+MIGRATIONS = [
+    (1, "Schéma initial", _migration_schema_initial),
+    (2, "Fenêtres de vente", _migration_fenetres_vente),
+    (3, "Baux des workers", _migration_baux),
+    (4, "Index detections, sale_windows et match_leases", _migration_index),
+    (5, "URL de match unique", _migration_url_unique),
+    (6, "Agrégats horaires et journaliers des détections", _migration_rollups_detections),
+    (7, "Status par match", _migration_status_par_match),
+]
+
+def version_schema(conn):
+    """Version du schéma appliquée à la base (0 si aucune migration)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+def appliquer_migrations(conn, jusqu_a=None):
+    """
+    Applique les migrations manquantes, chacune dans sa transaction.
+    
+    Args:
+        jusqu_a: Dernière version à appliquer (None = toutes), utile au benchmark
+    
+    Returns:
+        int: Version du schéma après migration
+    """
+    courante = version_schema(conn)
+    for version, description, migration in MIGRATIONS:
+        if version <= courante or (jusqu_a is not None and version > jusqu_a):
+            continue
+        # IMMEDIATE : prend le verrou d'écriture tout de suite (autre process qui migre en même temps)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,)).fetchone():
+                conn.rollback()  # Appliquée entre-temps par un autre process
+                continue
+            migration(conn.cursor())
+            conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)', (version, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        courante = version
+        log(f"🗄️ Migration {version} appliquée: {description}", 'info')
+    return courante
+
+def init_database():
+    """Initialise la base de données SQLite et applique les migrations du schéma"""
+    with db_write_lock:
+        try:
+            version = appliquer_migrations(get_db_connection())
+            log(f"✅ Base de données SQLite initialisée avec succès (schéma v{version})", 'success')
+            log(f"📂 Chemin base de données: {os.path.abspath(DB_FILE)}", 'info')
+            return True
+        except Exception as e:
+            log(f"❌ Erreur initialisation base de données: {e}", 'error')
+            import traceback
+            traceback.print_exc()
+            return False
 
 def migrate_json_to_sqlite():
     """Migre les données depuis les fichiers JSON vers SQLite (une seule fois)"""
@@ -327,15 +746,7 @@ def migrate_json_to_sqlite():
                 with open(DETECTIONS_HISTORY_FILE, 'r', encoding='utf-8') as f:
                     detections = json.load(f)
                 for detection in detections:
-                    cursor.execute('''
-                        INSERT INTO detections (match, nb_places, date, date_formatee)
-                        VALUES (?, ?, ?, ?)
-                    ''', (
-                        detection.get('match'),
-                        detection.get('nb_places'),
-                        detection.get('date'),
-                        detection.get('date_formatee')
-                    ))
+                    _ecrire_detection(conn, detection)
                 log(f"✅ {len(detections)} détection(s) migrée(s)", 'success')
             except Exception as e:
                 log(f"⚠️ Erreur migration detections_history.json: {e}", 'warning')
@@ -351,14 +762,24 @@ def migrate_json_to_sqlite():
         return False
 
 # Fonctions SQLite pour remplacer Firebase
-def save_match_to_db(match_data):
-    """Sauvegarde ou met à jour un match dans la base de données"""
+def save_match_to_db(match_data, creation=False):
+    """
+    Sauvegarde ou met à jour un match dans la base de données.
+    
+    Avec creation=True, un nom déjà pris lève IntegrityError comme une URL déjà prise
+    (pas de mise à jour du match existant).
+    """
     def _save_operation(conn, match_data):
         cursor = conn.cursor()
         try:
-            cursor.execute('''
-                INSERT OR REPLACE INTO matches (nom, url, competition, date, time, lieu)
-                VALUES (?, ?, ?, ?, ?, ?)
+            # UPSERT sur le nom : une URL déjà prise par un autre match lève IntegrityError
+            # (INSERT OR REPLACE supprimerait silencieusement l'autre match)
+            conflit = '' if creation else '''
+                ON CONFLICT(nom) DO UPDATE SET url = excluded.url, competition = excluded.competition,
+                    date = excluded.date, time = excluded.time, lieu = excluded.lieu'''
+            cursor.execute(f'''
+                INSERT INTO matches (nom, url, competition, date, time, lieu)
+                VALUES (?, ?, ?, ?, ?, ?){conflit}
             ''', (
                 match_data.get('nom'),
                 match_data.get('url'),
@@ -374,7 +795,7 @@ def save_match_to_db(match_data):
             raise  # Re-lancer pour gestion spécifique
     
     try:
-        return execute_with_retry(_save_operation, match_data)
+        return execute_write(_save_operation, match_data)
     except sqlite3.IntegrityError as e:
         error_msg = str(e)
         if "UNIQUE constraint" in error_msg or "unique" in error_msg.lower():
@@ -394,26 +815,126 @@ def save_match_to_db(match_data):
         traceback.print_exc()
         return False
 
-def load_matches_from_db():
-    """Charge tous les matchs depuis la base de données"""
-    def _load_operation(conn):
-        cursor = conn.cursor()
-        cursor.execute('SELECT nom, url, competition, date, time, lieu FROM matches ORDER BY created_at DESC')
-        rows = cursor.fetchall()
-        matches = []
-        for row in rows:
-            matches.append({
-                'nom': row['nom'],
-                'url': row['url'],
-                'competition': row['competition'] if row['competition'] else None,  # Convertir '' en None
-                'date': row['date'] if row['date'] else None,  # Convertir '' en None
-                'time': row['time'] if row['time'] else None,  # Convertir '' en None
-                'lieu': row['lieu'] if row['lieu'] else None   # Convertir '' en None
-            })
-        return matches
+@dataclass(frozen=True, slots=True)
+class MatchRecord:
+    """Un match tel qu'en base : compact, immuable, donc partageable entre threads"""
+    id: int | None
+    nom: str
+    url: str
+    competition: str | None = None
+    date: str | None = None
+    time: str | None = None
+    lieu: str | None = None
+    
+    # Lecture façon dict : le checker accepte aussi les dicts des outils (benchmark, avec 'har')
+    def __getitem__(self, cle):
+        try:
+            return getattr(self, cle)
+        except AttributeError:
+            raise KeyError(cle) from None
+    
+    def get(self, cle, defaut=None):
+        return getattr(self, cle, defaut)
+    
+    def valeurs(self):
+        return (self.id, self.nom, self.url, self.competition, self.date, self.time, self.lieu)
     
+    def to_dict(self):
+        return {'id': self.id, 'nom': self.nom, 'url': self.url, 'competition': self.competition,
+                'date': self.date, 'time': self.time, 'lieu': self.lieu}
+    
+    @classmethod
+    def depuis_dict(cls, d):
+        """Match venant de matches.json (pas d'id tant qu'il n'est pas en base)"""
+        return cls(d.get('id'), d.get('nom'), d.get('url'), d.get('competition') or None,
+                   d.get('date') or None, d.get('time') or None, d.get('lieu') or None)
+
+class MatchRepository:
+    """
+    Accès aux matchs en base : des MatchRecord avec index par id, nom et URL.
+    
+    Carte d'identité : une ligne inchangée depuis le dernier chargement redonne le même
+    objet, donc recharger la liste n'alloue que pour les matchs ajoutés ou modifiés.
+    """
+    # '' et NULL sont normalisés par SQLite, pas ligne par ligne en Python
+    COLONNES = "id, nom, url, NULLIF(competition, ''), NULLIF(date, ''), NULLIF(time, ''), NULLIF(lieu, '')"
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._par_id = {}
+        self._par_nom = {}
+        self._par_url = {}
+        self.chargements = 0
+        self.reutilises = 0
+    
+    def _record(self, ligne):
+        valeurs = tuple(ligne)
+        existant = self._par_id.get(valeurs[0])
+        if existant is not None and existant.valeurs() == valeurs:
+            self.reutilises += 1
+            return existant
+        return MatchRecord(*valeurs)
+    
+    def _indexer(self, record):
+        ancien = self._par_id.get(record.id)
+        if ancien is not None:
+            self._par_nom.pop(ancien.nom, None)
+            self._par_url.pop(ancien.url, None)
+        self._par_id[record.id] = record
+        self._par_nom[record.nom] = record
+        self._par_url[record.url] = record
+    
+    def charger(self):
+        """Tous les matchs, plus récent d'abord (les erreurs SQLite remontent)"""
+        def _load_operation(conn):
+            return conn.execute(f'SELECT {self.COLONNES} FROM matches ORDER BY created_at DESC').fetchall()
+        lignes = execute_with_retry(_load_operation)
+        with self._lock:
+            records = [self._record(ligne) for ligne in lignes]
+            self._par_id = {r.id: r for r in records}
+            self._par_nom = {r.nom: r for r in records}
+            self._par_url = {r.url: r for r in records}
+            self.chargements += 1
+        return records
+    
+    def enregistrer(self, match, creation=False):
+        """Upsert d'un match (dict ou MatchRecord) ; retourne son MatchRecord, ou None en cas d'échec"""
+        if not save_match_to_db(match, creation=creation):
+            return None
+        def _load_operation(conn, nom):
+            return conn.execute(f'SELECT {self.COLONNES} FROM matches WHERE nom = ?', (nom,)).fetchone()
+        ligne = execute_with_retry(_load_operation, match.get('nom'))
+        if ligne is None:
+            return None
+        with self._lock:
+            record = self._record(ligne)
+            self._indexer(record)
+        return record
+    
+    def oublier(self, nom):
+        """Retire un match supprimé des index"""
+        with self._lock:
+            record = self._par_nom.pop(nom, None)
+            if record is not None:
+                self._par_id.pop(record.id, None)
+                self._par_url.pop(record.url, None)
+        return record
+    
+    def par_nom(self, nom):
+        return self._par_nom.get(nom)
+    
+    def par_url(self, url):
+        return self._par_url.get(url)
+    
+    def resume(self):
+        return {'matchs': len(self._par_id), 'chargements': self.chargements, 'reutilises': self.reutilises}
+
+match_repository = MatchRepository()
+
+def load_matches_from_db():
+    """Charge tous les matchs depuis la base de données (MatchRecord, plus récent d'abord)"""
     try:
-        return execute_with_retry(_load_operation)
+        return match_repository.charger()
     except sqlite3.OperationalError as e:
         log(f"❌ Erreur opérationnelle SQLite lors du chargement: {e}", 'error')
         return []
@@ -445,7 +966,13 @@ def delete_match_from_db(match_nom):
             if cache_deleted > 0:
                 log(f"🗑️ Cache Groq supprimé pour le match '{match_nom}'", 'info')
             
-            # 3. Supprimer le match lui-même
+            # 3. Supprimer ses fenêtres de vente et les agrégats de ses détections
+            cursor.execute('DELETE FROM sale_windows WHERE match = ?', (match_nom,))
+            for table, _ in ROLLUPS_DETECTIONS.values():
+                cursor.execute(f'DELETE FROM {table} WHERE match = ?', (match_nom,))
+            cursor.execute('DELETE FROM match_status WHERE match = ?', (match_nom,))
+            
+            # 4. Supprimer le match lui-même
             cursor.execute('DELETE FROM matches WHERE nom = ?', (match_nom,))
             match_deleted = cursor.rowcount
             deleted_count = match_deleted
@@ -468,7 +995,7 @@ def delete_match_from_db(match_nom):
             raise
     
     try:
-        return execute_with_retry(_delete_operation, match_nom)
+        return execute_write(_delete_operation, match_nom)
     except sqlite3.OperationalError as e:
         log(f"❌ Erreur suppression match dans SQLite (verrou): {e}", 'error')
         return False
@@ -478,21 +1005,51 @@ def delete_match_from_db(match_nom):
         traceback.print_exc()
         return False
 
+def _ecrire_status(conn, status_data):
+    conn.execute('''
+        INSERT OR REPLACE INTO status (id, data, updated_at)
+        VALUES (1, ?, CURRENT_TIMESTAMP)
+    ''', (json.dumps(status_data, ensure_ascii=False),))
+
 def save_status_to_db(status_data):
     """Sauvegarde le status dans la base de données"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO status (id, data, updated_at)
-            VALUES (1, ?, CURRENT_TIMESTAMP)
-        ''', (json.dumps(status_data, ensure_ascii=False),))
+    def _save_operation(conn, status_data):
+        _ecrire_status(conn, status_data)
         conn.commit()
         return True
+    
+    try:
+        return execute_write(_save_operation, status_data)
     except Exception as e:
         log(f"⚠️ Erreur sauvegarde status dans SQLite: {e}", 'warning')
         return False
 
+def _ecrire_match_status(conn, data):
+    conn.execute('''
+        INSERT INTO match_status (match, pmr_disponible, nb_checks, dernier_check, updated_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (match) DO UPDATE SET
+            pmr_disponible = excluded.pmr_disponible,
+            nb_checks = excluded.nb_checks,
+            dernier_check = excluded.dernier_check,
+            updated_at = excluded.updated_at
+    ''', (data['match'], int(data['pmr_disponible']), data['nb_checks'], data['dernier_check']))
+
+def load_match_status_from_db(match_nom):
+    """Status d'un seul match (pmr_disponible, nb_checks, dernier_check), ou None"""
+    try:
+        conn = get_db_connection()
+        row = conn.execute(
+            'SELECT match, pmr_disponible, nb_checks, dernier_check FROM match_status WHERE match = ?',
+            (match_nom,)
+        ).fetchone()
+        if row:
+            return {**dict(row), 'pmr_disponible': bool(row['pmr_disponible'])}
+        return None
+    except Exception as e:
+        log(f"⚠️ Erreur chargement status du match depuis SQLite: {e}", 'warning')
+        return None
+
 def load_status_from_db():
     """Charge le status depuis la base de données"""
     try:
@@ -507,17 +1064,21 @@ def load_status_from_db():
         log(f"⚠️ Erreur chargement status depuis SQLite: {e}", 'warning')
         return None
 
+def _ecrire_analytics(conn, analytics_data):
+    conn.execute('''
+        INSERT OR REPLACE INTO analytics (id, data, updated_at)
+        VALUES (1, ?, CURRENT_TIMESTAMP)
+    ''', (json.dumps(analytics_data, ensure_ascii=False),))
+
 def save_analytics_to_db(analytics_data):
     """Sauvegarde les analytics dans la base de données"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO analytics (id, data, updated_at)
-            VALUES (1, ?, CURRENT_TIMESTAMP)
-        ''', (json.dumps(analytics_data, ensure_ascii=False),))
+    def _save_operation(conn, analytics_data):
+        _ecrire_analytics(conn, analytics_data)
         conn.commit()
         return True
+    
+    try:
+        return execute_write(_save_operation, analytics_data)
     except Exception as e:
         log(f"⚠️ Erreur sauvegarde analytics dans SQLite: {e}", 'warning')
         return False
@@ -536,21 +1097,25 @@ def load_analytics_from_db():
         log(f"⚠️ Erreur chargement analytics depuis SQLite: {e}", 'warning')
         return None
 
+def _ecrire_groq_cache(conn, match_name, cache_data):
+    conn.execute('''
+        INSERT OR REPLACE INTO groq_cache (match_name, data, last_updated)
+        VALUES (?, ?, ?)
+    ''', (
+        match_name,
+        json.dumps(cache_data, ensure_ascii=False),
+        cache_data.get('last_updated', datetime.now().isoformat())
+    ))
+
 def save_groq_cache_to_db(match_name, cache_data):
     """Sauvegarde le cache Groq dans la base de données"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO groq_cache (match_name, data, last_updated)
-            VALUES (?, ?, ?)
-        ''', (
-            match_name,
-            json.dumps(cache_data, ensure_ascii=False),
-            cache_data.get('last_updated', datetime.now().isoformat())
-        ))
+    def _save_operation(conn, match_name, cache_data):
+        _ecrire_groq_cache(conn, match_name, cache_data)
         conn.commit()
         return True
+    
+    try:
+        return execute_write(_save_operation, match_name, cache_data)
     except Exception as e:
         log(f"⚠️ Erreur sauvegarde cache Groq dans SQLite: {e}", 'warning')
         return False
@@ -569,37 +1134,58 @@ def load_groq_cache_from_db(match_name):
         log(f"⚠️ Erreur chargement cache Groq depuis SQLite: {e}", 'warning')
         return None
 
+def _ecrire_detection(conn, detection_data):
+    # Historique complet (plus d'élagage) + une ligne d'agrégat par granularité, en upsert
+    match = detection_data.get('match')
+    nb_places = detection_data.get('nb_places')
+    date = detection_data.get('date')
+    conn.execute('''
+        INSERT INTO detections (match, nb_places, date, date_formatee)
+        VALUES (?, ?, ?, ?)
+    ''', (match, nb_places, date, detection_data.get('date_formatee')))
+    if not match or not date:
+        return
+    for table, longueur in ROLLUPS_DETECTIONS.values():
+        conn.execute(f'''
+            INSERT INTO {table} (match, periode, nb_detections, max_places, premiere, derniere)
+            VALUES (?, ?, 1, ?, ?, ?)
+            ON CONFLICT (match, periode) DO UPDATE SET
+                nb_detections = nb_detections + 1,
+                max_places = MAX(COALESCE(max_places, excluded.max_places), excluded.max_places),
+                premiere = MIN(premiere, excluded.premiere),
+                derniere = MAX(derniere, excluded.derniere)
+        ''', (match, date[:longueur], nb_places, date, date))
+
 def save_detection_to_db(detection_data):
     """Sauvegarde une détection dans la base de données"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO detections (match, nb_places, date, date_formatee)
-            VALUES (?, ?, ?, ?)
-        ''', (
-            detection_data.get('match'),
-            detection_data.get('nb_places'),
-            detection_data.get('date'),
-            detection_data.get('date_formatee')
-        ))
-        conn.commit()
-        
-        # Garder seulement les 50 dernières détections
-        cursor.execute('''
-            DELETE FROM detections 
-            WHERE id NOT IN (
-                SELECT id FROM detections 
-                ORDER BY created_at DESC 
-                LIMIT 50
-            )
-        ''')
+    def _save_operation(conn, detection_data):
+        _ecrire_detection(conn, detection_data)
         conn.commit()
         return True
+    
+    try:
+        return execute_write(_save_operation, detection_data)
     except Exception as e:
         log(f"⚠️ Erreur sauvegarde détection dans SQLite: {e}", 'warning')
         return False
 
+def load_last_detection_date(match_nom):
+    """Retourne la date (ISO) de la dernière détection d'un match, ou None"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT date FROM detections
+            WHERE match = ?
+            ORDER BY created_at DESC
+            LIMIT 1
+        ''', (match_nom,))
+        row = cursor.fetchone()
+        return row['date'] if row else None
+    except Exception as e:
+        log(f"⚠️ Erreur lecture dernière détection depuis SQLite: {e}", 'warning')
+        return None
+
 def load_detections_from_db(limit=50):
     """Charge les détections depuis la base de données"""
     try:
@@ -625,76 +1211,333 @@ def load_detections_from_db(limit=50):
         log(f"⚠️ Erreur chargement détections depuis SQLite: {e}", 'warning')
         return []
 
-# ====================
-# HISTORIQUE DES DÉTECTIONS PMR
-# ====================
+def load_detection_rollups(granularite='daily', match=None, depuis=None, avant=None, limit=500):
+    """
+    Agrégats de détections par match et par période, les plus récents d'abord.
+    
+    Args:
+        granularite: 'hourly' ou 'daily'
+        depuis: Préfixe ISO inclus (ex: '2026-10-01'), avant: préfixe ISO exclu
+    """
+    table, _ = ROLLUPS_DETECTIONS[granularite]
+    conditions, parametres = [], []
+    if match:
+        conditions.append('match = ?')
+        parametres.append(match)
+    if depuis:
+        conditions.append('periode >= ?')
+        parametres.append(depuis)
+    if avant:
+        conditions.append('periode < ?')
+        parametres.append(avant)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    conn = get_db_connection()
+    rows = conn.execute(f'''
+        SELECT match, periode, nb_detections, max_places, premiere, derniere
+        FROM {table} {where}
+        ORDER BY periode DESC
+        LIMIT ?
+    ''', (*parametres, limit)).fetchall()
+    return [dict(row) for row in rows]
 
-def charger_historique_detections():
-    """Charge l'historique des détections PMR depuis SQLite"""
-    try:
-        detections = load_detections_from_db(limit=50)
-        # Sauvegarder aussi dans le fichier local (backup)
-        if detections:
-            with open(DETECTIONS_HISTORY_FILE, 'w', encoding='utf-8') as f:
-                json.dump(detections, f, ensure_ascii=False, indent=2)
-        return detections
-    except Exception as e:
-        log(f"⚠️ Erreur chargement historique: {e}", 'warning')
-        # Fallback sur fichier local
-        if os.path.exists(DETECTIONS_HISTORY_FILE):
-            try:
-                with open(DETECTIONS_HISTORY_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception:
-                pass
-    return []
+def load_detection_patterns(match=None):
+    """Répartition des détections par heure de la journée et par jour de la semaine (0 = dimanche)"""
+    where, parametres = ('WHERE match = ?', (match,)) if match else ('', ())
+    conn = get_db_connection()
+    par_heure = [0] * 24
+    for row in conn.execute(f'''
+        SELECT CAST(substr(periode, 12, 2) AS INTEGER) AS heure, SUM(nb_detections) AS nb
+        FROM detections_hourly {where}
+        GROUP BY heure
+    ''', parametres):
+        par_heure[row['heure']] = row['nb']
+    par_jour_semaine = [0] * 7
+    for row in conn.execute(f'''
+        SELECT CAST(strftime('%w', periode) AS INTEGER) AS jour, SUM(nb_detections) AS nb
+        FROM detections_daily {where}
+        GROUP BY jour
+    ''', parametres):
+        par_jour_semaine[row['jour']] = row['nb']
+    return {'par_heure': par_heure, 'par_jour_semaine': par_jour_semaine}
 
-def sauvegarder_detection(match_nom, nb_places):
-    """Sauvegarde une détection PMR dans l'historique"""
+def save_sale_window_to_db(window_data):
+    """Enregistre une fenêtre de vente et retourne son id (None en cas d'erreur)"""
+    def _save_operation(conn, window_data):
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO sale_windows (match, type, debut, fin)
+            VALUES (?, ?, ?, ?)
+        ''', (
+            window_data['match'],
+            window_data['type'],
+            window_data['debut'],
+            window_data['fin']
+        ))
+        conn.commit()
+        return cursor.lastrowid
+    
     try:
-        detection = {
-            "match": match_nom,
-            "nb_places": nb_places,
-            "date": datetime.now().isoformat(),
-            "date_formatee": formater_date_francaise(datetime.now())
-        }
-        # Sauvegarder dans SQLite (gère automatiquement la limite de 50)
-        save_detection_to_db(detection)
-        
-        # Sauvegarder aussi dans le fichier local (backup)
-        historique = charger_historique_detections()
-        historique.append(detection)
-        if len(historique) > 50:
-            historique = historique[-50:]
-        with open(DETECTIONS_HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(historique, f, ensure_ascii=False, indent=2)
+        return execute_write(_save_operation, window_data)
     except Exception as e:
-        log(f"⚠️ Erreur sauvegarde détection: {e}", 'warning')
+        log(f"❌ Erreur sauvegarde fenêtre de vente dans SQLite: {e}", 'error')
+        return None
+
+def load_sale_windows_from_db(match_nom=None):
+    """Charge les fenêtres de vente (d'un match, ou de tous), triées par début"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        if match_nom is None:
+            cursor.execute('SELECT id, match, type, debut, fin FROM sale_windows ORDER BY debut')
+        else:
+            cursor.execute('SELECT id, match, type, debut, fin FROM sale_windows WHERE match = ? ORDER BY debut', (match_nom,))
+        return [dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        log(f"⚠️ Erreur chargement fenêtres de vente depuis SQLite: {e}", 'warning')
+        return []
+
+def delete_sale_window_from_db(window_id):
+    """Supprime une fenêtre de vente. Retourne le nom du match concerné, ou None si introuvable."""
+    def _delete_operation(conn, window_id):
+        cursor = conn.cursor()
+        cursor.execute('SELECT match FROM sale_windows WHERE id = ?', (window_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute('DELETE FROM sale_windows WHERE id = ?', (window_id,))
+        conn.commit()
+        return row['match']
+    
+    try:
+        return execute_write(_delete_operation, window_id)
+    except Exception as e:
+        log(f"❌ Erreur suppression fenêtre de vente dans SQLite: {e}", 'error')
+        return None
+
+# ====================
+# PERSISTANCE DIFFÉRÉE (WRITE-BEHIND)
+# ====================
+# Les vérifications et les handlers HTTP ne touchent plus au disque : ils déposent un
+# événement dans la file d'un écrivain unique, qui fusionne les événements d'un même objet
+# (seul le dernier status compte) et les commite par lots, une transaction par lot.
+PERSIST_INTERVAL = float(os.getenv("PERSIST_INTERVAL", "0.5"))  # Attente max avant le commit d'un lot (secondes)
+PERSIST_MAX_LOT = int(os.getenv("PERSIST_MAX_LOT", "500"))  # Lot plein : commit sans attendre la fin de l'intervalle
+PERSIST_MAX_ESSAIS = int(os.getenv("PERSIST_MAX_ESSAIS", "5"))  # Au-delà, un événement qui échoue seul est abandonné
+
+def _ecrire_json(chemin, donnees):
+    """Écriture atomique d'une sauvegarde JSON (le site ne lit jamais un fichier à moitié écrit)"""
+    temporaire = chemin + '.tmp'
+    with open(temporaire, 'w', encoding='utf-8') as f:
+        json.dump(donnees, f, ensure_ascii=False, indent=2)
+    os.replace(temporaire, chemin)
+
+# Type d'événement -> écriture SQL (sans commit, le lot commite une seule fois)
+ECRITURES_SQL = {
+    'status': _ecrire_status,
+    'match_status': _ecrire_match_status,
+    'analytics': _ecrire_analytics,
+    'detection': _ecrire_detection,
+    'groq_cache': lambda conn, data: _ecrire_groq_cache(conn, data['match_name'], data),
+}
+
+def _ecrire_lot(conn, evenements):
+    for (type_evt, _), donnees in evenements:
+        ECRITURES_SQL[type_evt](conn, donnees)
+    conn.commit()
+
+class PersistenceWriter:
+    """Écrivain unique : file d'événements fusionnés, commits groupés, vidage à l'arrêt"""
+    
+    def __init__(self, intervalle=PERSIST_INTERVAL):
+        self.intervalle = intervalle
+        self._cond = threading.Condition()
+        self._en_attente = {}  # (type, clé) -> données, dans l'ordre d'arrivée
+        self._sequence = itertools.count()  # Clés uniques des événements non fusionnables (détections)
+        self._ecriture = threading.Lock()  # Un seul lot à la fois (thread d'écriture ou vidage à l'arrêt)
+        self._essais = {}  # (type, clé) -> échecs de l'événement en attente
+        self._thread = None
+        self.evenements = 0
+        self.fusionnes = 0
+        self.lots = 0
+        self.ecrits = 0
+        self.erreurs = 0
+        self.abandonnes = 0
+        self.dernier_lot_ms = None
+    
+    def soumettre(self, type_evt, donnees, cle=None):
+        """
+        Dépose un événement et rend la main tout de suite.
+        Avec une clé, l'événement remplace celui de même clé encore en attente ;
+        sans clé (détections), chaque événement est écrit.
+        """
+        cle = (type_evt, next(self._sequence) if cle is None else cle)
+        with self._cond:
+            self.evenements += 1
+            if self._en_attente.pop(cle, None) is not None:
+                self.fusionnes += 1
+            self._essais.pop(cle, None)  # Nouvelles données : compteur d'échecs remis à zéro
+            self._en_attente[cle] = donnees
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._boucle, name='persistance', daemon=True)
+                self._thread.start()
+            if len(self._en_attente) >= PERSIST_MAX_LOT:
+                self._cond.notify()
+    
+    def _boucle(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._en_attente)
+                # Laisser le lot se remplir (group commit), sauf s'il est déjà plein
+                self._cond.wait_for(lambda: len(self._en_attente) >= PERSIST_MAX_LOT, timeout=self.intervalle)
+            try:
+                self.vider()
+            except Exception as e:
+                log(f"⚠️ Erreur écrivain de persistance: {e}", 'warning')
+    
+    def vider(self):
+        """Commite tout ce qui est en attente. Retourne le nombre d'événements écrits."""
+        with self._ecriture:
+            with self._cond:
+                lot, self._en_attente = self._en_attente, {}
+            if not lot:
+                return 0
+            debut = time.perf_counter()
+            try:
+                execute_write(_ecrire_lot, list(lot.items()))
+            except Exception as e:
+                self.erreurs += 1
+                log(f"⚠️ Erreur commit groupé ({len(lot)} événement(s)), écriture un par un: {e}", 'warning')
+                lot = self._ecrire_un_par_un(lot)
+                if not lot:
+                    return 0
+            with self._cond:
+                for cle in lot:
+                    self._essais.pop(cle, None)
+            self._ecrire_sauvegardes(lot)
+            self.lots += 1
+            self.ecrits += len(lot)
+            self.dernier_lot_ms = round((time.perf_counter() - debut) * 1000, 2)
+            trace.evenement('persistance.lot', evenements=len(lot), duree_ms=self.dernier_lot_ms)
+            return len(lot)
+    
+    def _ecrire_un_par_un(self, lot):
+        """
+        Après l'échec d'un lot : un commit par événement, pour qu'un événement invalide ne
+        bloque pas les autres. Les échecs sont remis en file, puis abandonnés (et loggés)
+        après PERSIST_MAX_ESSAIS tentatives. Retourne les événements écrits.
+        """
+        ecrits = {}
+        echecs = {}
+        remis = {}
+        for cle, donnees in lot.items():
+            try:
+                execute_write(_ecrire_lot, [(cle, donnees)])
+                ecrits[cle] = donnees
+            except Exception as e:
+                echecs[cle] = (donnees, e)
+        with self._cond:
+            for cle, (donnees, erreur) in echecs.items():
+                if cle in self._en_attente:
+                    continue  # Remplacé entre-temps par une version plus récente
+                essais = self._essais.get(cle, 0) + 1
+                if essais >= PERSIST_MAX_ESSAIS:
+                    self._essais.pop(cle, None)
+                    self.abandonnes += 1
+                    log(f"❌ Événement {cle[0]} abandonné après {essais} échec(s): {erreur}", 'error')
+                    trace.evenement('persistance.abandon', TRACE_INFO, type=cle[0], essais=essais, erreur=str(erreur))
+                    continue
+                self._essais[cle] = essais
+                remis[cle] = donnees
+            # Remettre en tête ; les événements arrivés entre-temps gardent le dernier mot
+            self._en_attente = {**remis, **self._en_attente}
+        return ecrits
+    
+    def _ecrire_sauvegardes(self, lot):
+        """Sauvegardes JSON locales, une écriture par fichier et par lot"""
+        derniers = {}
+        groq = {}
+        for (type_evt, _), donnees in lot.items():
+            derniers[type_evt] = donnees
+            if type_evt == 'groq_cache':
+                groq[donnees['match_name']] = donnees
+        try:
+            if 'status' in derniers:
+                _ecrire_json(STATUS_FILE, derniers['status'])
+            if 'analytics' in derniers:
+                _ecrire_json(ANALYTICS_FILE, derniers['analytics'])
+            if 'detection' in derniers:
+                _ecrire_json(DETECTIONS_HISTORY_FILE, load_detections_from_db(limit=50))
+            if groq:
+                cache = {}
+                if os.path.exists(GROQ_CACHE_FILE):
+                    with open(GROQ_CACHE_FILE, 'r', encoding='utf-8') as f:
+                        cache = json.load(f)
+                cache.update(groq)
+                _ecrire_json(GROQ_CACHE_FILE, cache)
+        except Exception as e:
+            log(f"⚠️ Erreur sauvegarde JSON locale: {e}", 'warning')
+    
+    def resume(self):
+        with self._cond:
+            en_attente = len(self._en_attente)
+        return {
+            'intervalle_s': self.intervalle,
+            'en_attente': en_attente,
+            'evenements': self.evenements,
+            'fusionnes': self.fusionnes,
+            'lots': self.lots,
+            'ecrits': self.ecrits,
+            'erreurs': self.erreurs,
+            'abandonnes': self.abandonnes,
+            'dernier_lot_ms': self.dernier_lot_ms
+        }
+
+persistence = PersistenceWriter()
+# Arrêt (atexit, SIGTERM via sys.exit) : vider la file avant la fermeture des connexions
+atexit.register(persistence.vider)
+
+# ====================
+# HISTORIQUE DES DÉTECTIONS PMR
+# ====================
+
+def charger_historique_detections():
+    """Charge l'historique des détections PMR depuis SQLite"""
+    try:
+        # Le fichier local (backup) est réécrit par l'écrivain de persistance
+        return load_detections_from_db(limit=50)
+    except Exception as e:
+        log(f"⚠️ Erreur chargement historique: {e}", 'warning')
+        # Fallback sur fichier local
+        if os.path.exists(DETECTIONS_HISTORY_FILE):
+            try:
+                with open(DETECTIONS_HISTORY_FILE, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception:
+                pass
+    return []
+
+def sauvegarder_detection(match_nom, nb_places):
+    """Sauvegarde une détection PMR dans l'historique"""
+    try:
+        detection = {
+            "match": match_nom,
+            "nb_places": nb_places,
+            "date": datetime.now().isoformat(),
+            "date_formatee": formater_date_francaise(datetime.now())
+        }
+        # SQLite (historique complet + agrégats) puis fichier local (backup), écrits par l'écrivain de persistance
+        persistence.soumettre('detection', detection)
+    except Exception as e:
+        log(f"⚠️ Erreur sauvegarde détection: {e}", 'warning')
 
 # Charger les matchs depuis SQLite ou fichier JSON
 def charger_matchs():
     """Charge les matchs depuis SQLite (fichier local en backup)"""
-    # #region agent log
-    import json as json_module
-    import os
-    try:
-        debug_log_path = os.path.join(os.path.dirname(__file__), '.cursor', 'debug.log')
-        os.makedirs(os.path.dirname(debug_log_path), exist_ok=True)
-        with open(debug_log_path, 'a', encoding='utf-8') as f:
-            f.write(json_module.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"D","location":"psm.py:charger_matchs:ENTRY","message":"charger_matchs called","data":{"db_file_exists":os.path.exists(DB_FILE),"matches_file_exists":os.path.exists(MATCHES_FILE)},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-    except: pass
-    # #endregion
     try:
         # PRIORITÉ 1 : SQLite (source de vérité)
-        matches = load_matches_from_db()
-        # #region agent log
-        try:
-            debug_log_path = os.path.join(os.path.dirname(__file__), '.cursor', 'debug.log')
-            os.makedirs(os.path.dirname(debug_log_path), exist_ok=True)
-            with open(debug_log_path, 'a', encoding='utf-8') as f:
-                f.write(json_module.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"D","location":"psm.py:charger_matchs:AFTER_SQLITE","message":"After load from SQLite","data":{"match_count":len(matches) if matches else 0,"matches":matches},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-        except: pass
-        # #endregion
+        with trace.span('matchs.charger', source='sqlite') as span:
+            matches = load_matches_from_db()
+            span.noter(nb_matchs=len(matches))
         if matches:
             # Ne pas faire de backup automatique vers JSON (créerait des incohérences)
             # Le backup sera fait explicitement après les opérations réussies
@@ -714,26 +1557,11 @@ def charger_matchs():
         # PRIORITÉ 2 : Fichier local (fallback UNIQUEMENT si SQLite n'existe pas)
         # Ne restaurer depuis JSON que si SQLite n'existe pas du tout
         if os.path.exists(MATCHES_FILE):
-            # #region agent log
-            try:
-                debug_log_path = os.path.join(os.path.dirname(__file__), '.cursor', 'debug.log')
-                os.makedirs(os.path.dirname(debug_log_path), exist_ok=True)
-                with open(debug_log_path, 'a', encoding='utf-8') as f:
-                    f.write(json_module.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"D","location":"psm.py:charger_matchs:CHECKING_JSON","message":"Checking matches.json","data":{"file_exists":True},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-            except: pass
-            # #endregion
             try:
                 with open(MATCHES_FILE, 'r', encoding='utf-8') as f:
                     matches = json.load(f)
                 
-                # #region agent log
-                try:
-                    debug_log_path = os.path.join(os.path.dirname(__file__), '.cursor', 'debug.log')
-                    os.makedirs(os.path.dirname(debug_log_path), exist_ok=True)
-                    with open(debug_log_path, 'a', encoding='utf-8') as f:
-                        f.write(json_module.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"D","location":"psm.py:charger_matchs:JSON_LOADED","message":"matches.json loaded","data":{"match_count":len(matches) if matches else 0,"matches":matches},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-                except: pass
-                # #endregion
+                trace.evenement('matchs.charger', TRACE_INFO, source='matches.json', nb_matchs=len(matches) if matches else 0)
                 if matches and len(matches) > 0:
                     log(f"📂 matches.json trouvé avec {len(matches)} match(s) - restauration depuis backup", 'info')
                     log(f"📂 SQLite n'existe pas, restauration depuis JSON: {os.path.abspath(MATCHES_FILE)}", 'info')
@@ -741,18 +1569,11 @@ def charger_matchs():
                     for match in matches:
                         save_match_to_db(match)
                     log(f"✅ {len(matches)} match(s) restauré(s) dans SQLite depuis matches.json", 'success')
-                    return matches
+                    return load_matches_from_db() or [MatchRecord.depuis_dict(m) for m in matches]
                 else:
                     log(f"ℹ️ matches.json vide ou inexistant", 'info')
             except Exception as e:
-                # #region agent log
-                try:
-                    debug_log_path = os.path.join(os.path.dirname(__file__), '.cursor', 'debug.log')
-                    os.makedirs(os.path.dirname(debug_log_path), exist_ok=True)
-                    with open(debug_log_path, 'a', encoding='utf-8') as f:
-                        f.write(json_module.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"D","location":"psm.py:charger_matchs:JSON_ERROR","message":"Error reading matches.json","data":{"error":str(e)},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-                except: pass
-                # #endregion
+                trace.evenement('matchs.charger', TRACE_WARNING, source='matches.json', erreur=str(e))
                 log(f"⚠️ Erreur lecture matches.json: {e}", 'warning')
         
         # Si on arrive ici, SQLite n'existe pas et matches.json n'existe pas ou est vide
@@ -787,7 +1608,7 @@ def charger_matchs():
         except Exception as e:
             log(f"⚠️ Erreur sauvegarde matches.json: {e}", 'warning')
         log(f"📂 matches.json créé avec {len(matchs_default)} match(s) par défaut", 'info')
-        return matchs_default
+        return load_matches_from_db() or [MatchRecord.depuis_dict(m) for m in matchs_default]
     except sqlite3.OperationalError as e:
         log(f"❌ Erreur SQLite (verrou ou autre): {e}", 'error')
         # En cas d'erreur SQLite, essayer de charger depuis JSON en dernier recours
@@ -796,7 +1617,7 @@ def charger_matchs():
                 with open(MATCHES_FILE, 'r', encoding='utf-8') as f:
                     matches = json.load(f)
                 log(f"⚠️ Chargement depuis matches.json en dernier recours: {len(matches)} match(s)", 'warning')
-                return matches if matches else []
+                return [MatchRecord.depuis_dict(m) for m in matches] if matches else []
             except Exception as e2:
                 log(f"❌ Impossible de charger depuis matches.json: {e2}", 'error')
         return []
@@ -810,7 +1631,7 @@ def charger_matchs():
                 with open(MATCHES_FILE, 'r', encoding='utf-8') as f:
                     matches = json.load(f)
                 log(f"⚠️ Chargement depuis matches.json en dernier recours: {len(matches)} match(s)", 'warning')
-                return matches if matches else []
+                return [MatchRecord.depuis_dict(m) for m in matches] if matches else []
             except Exception as e2:
                 log(f"❌ Impossible de charger depuis matches.json: {e2}", 'error')
         return []
@@ -826,7 +1647,7 @@ def build_groq_prompt(match_name, match_data, match_status, comparison_matches):
     Args:
         match_name: Nom du match (ex: "PSG vs OM")
         match_data: Données du match depuis matches.json (competition, date, time, lieu)
-        match_status: Statut actuel depuis status.json (nb_checks, pmr_disponible)
+        match_status: Statut actuel depuis la table match_status (nb_checks, pmr_disponible)
         comparison_matches: Liste des matchs de comparaison
     
     Returns:
@@ -1057,7 +1878,7 @@ def detect_match_importance(home_team, away_team, match_name):
 def get_comparison_matches(match_name, home_team, limit=3):
     """Récupère les VRAIS autres matchs depuis matches.json pour la comparaison"""
     try:
-        matches_data = charger_matchs()  # Utiliser la fonction existante
+        matches_data = match_registry.lister()
         
         # Filtrer les matchs : même équipe à domicile, exclure le match actuel
         comparison_matches = []
@@ -1154,19 +1975,8 @@ def save_groq_cache(match_name, data):
         data['last_updated'] = datetime.now().isoformat()
         data['match_name'] = match_name
         
-        # Sauvegarder dans SQLite
-        save_groq_cache_to_db(match_name, data)
-        
-        # Sauvegarder aussi dans le fichier local (backup)
-        cache = {}
-        if os.path.exists(GROQ_CACHE_FILE):
-            with open(GROQ_CACHE_FILE, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-        
-        cache[match_name] = data
-        
-        with open(GROQ_CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(cache, f, ensure_ascii=False, indent=2)
+        # SQLite + fichier local (backup), écrits par l'écrivain de persistance
+        persistence.soumettre('groq_cache', copy.deepcopy(data), cle=match_name)
         
         log(f"💾 Cache Groq sauvegardé pour {match_name}", 'info')
     except Exception as e:
@@ -1180,8 +1990,69 @@ if init_database():
 else:
     log("⚠️ Erreur initialisation SQLite, utilisation des fichiers JSON locaux uniquement", 'warning')
 
-# ✅ LISTE DES MATCHS À SURVEILLER (chargée dynamiquement)
-MATCHS = charger_matchs()
+# ====================
+# REGISTRE DES MATCHS EN MÉMOIRE
+# ====================
+# SQLite n'est lu qu'au démarrage : ensuite l'API met à jour le registre en même temps
+# que la base, et tout le reste (boucle, handlers, status) lit le registre.
+class MatchRegistry:
+    """Liste des matchs surveillés, versionnée, avec notification des abonnés à chaque changement"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matchs = []  # MatchRecord, même ordre que load_matches_from_db (plus récent d'abord)
+        self._par_nom = {}
+        self._abonnes = []
+        self.version = 0
+    
+    def _remplacer(self, matchs):
+        with self._lock:
+            self._matchs = matchs
+            self._par_nom = {m.nom: m for m in matchs}
+            self.version += 1
+            version, abonnes = self.version, list(self._abonnes)
+        for callback in abonnes:
+            try:
+                callback(version)
+            except Exception as e:
+                log(f"⚠️ Erreur abonné du registre des matchs: {e}", 'warning')
+    
+    def recharger(self):
+        """Relit les matchs depuis SQLite ; ne notifie que si la liste a changé (mêmes objets si rien n'a bougé)"""
+        matchs = charger_matchs()
+        if matchs != self._matchs:
+            self._remplacer(matchs)
+        return self.version
+    
+    def lister(self):
+        return list(self._matchs)
+    
+    def get(self, nom):
+        return self._par_nom.get(nom)
+    
+    def par_index(self, index):
+        matchs = self._matchs
+        return matchs[index] if 0 <= index < len(matchs) else None
+    
+    def ajouter(self, match):
+        self._remplacer([match] + [m for m in self._matchs if m.nom != match.nom])
+    
+    def supprimer(self, nom):
+        match_repository.oublier(nom)
+        self._remplacer([m for m in self._matchs if m.nom != nom])
+    
+    def en_dicts(self):
+        """La liste pour le JSON (API, backup matches.json)"""
+        return [m.to_dict() for m in self._matchs]
+    
+    def abonner(self, callback):
+        """callback(version) est appelé après chaque changement"""
+        with self._lock:
+            self._abonnes.append(callback)
+
+# ✅ LISTE DES MATCHS À SURVEILLER (chargée une fois, puis tenue à jour par l'API)
+match_registry = MatchRegistry()
+match_registry.recharger()
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "8222793392:AAFBtlCNAlPyUYgf1aup06HAvRO9V14DmRo")
 CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "-1003428870741")
@@ -1218,8 +2089,86 @@ def envoyer_message(msg):
     except Exception as e:
         print("Erreur Telegram:", e)
 
+# Plusieurs vérifications peuvent se terminer en même temps : un seul snapshot de status à la fois
+status_lock = threading.Lock()
+status_courant = None  # Dernier snapshot, servi par /api/status sans relire le disque
+STATUS_DEBOUNCE = float(os.getenv("STATUS_DEBOUNCE", "2"))  # Au plus une reconstruction du snapshot public par intervalle (secondes)
+# Offres inchangées : la ligne du match n'est réécrite que pour rafraîchir ses compteurs et son dernier check
+STATUS_REFRESH_INTERVAL = float(os.getenv("STATUS_REFRESH_INTERVAL", "300"))
+status_ecrit_par_match = {}  # nom -> time.monotonic() de la dernière écriture de sa ligne
+
+class StatusSnapshot:
+    """Snapshot public (status.json) reconstruit au plus une fois par intervalle, et seulement après un changement"""
+    
+    def __init__(self, delai=STATUS_DEBOUNCE):
+        self.delai = delai
+        self._lock = threading.Lock()
+        self._sale = False
+        self._timer = None
+        self._derniere = 0.0  # time.monotonic() de la dernière reconstruction
+        self.demandes = 0
+        self.reconstructions = 0
+    
+    def invalider(self):
+        """Un match a changé : programmer une reconstruction (les demandes rapprochées n'en font qu'une)"""
+        with self._lock:
+            self.demandes += 1
+            self._sale = True
+            if self._timer is not None:
+                return  # Déjà programmée, elle prendra ce changement
+            attente = max(0.0, self._derniere + self.delai - time.monotonic())
+            self._timer = threading.Timer(attente, self.reconstruire)
+            self._timer.daemon = True
+            self._timer.start()
+    
+    def reconstruire(self):
+        """Reconstruit le snapshot s'il y a eu un changement depuis la dernière fois"""
+        with self._lock:
+            self._timer = None
+            if not self._sale:
+                return False
+            self._sale = False
+            self._derniere = time.monotonic()
+        with status_lock, trace.span('status.reconstruire'):
+            _sauvegarder_status()
+        self.reconstructions += 1
+        return True
+    
+    def resume(self):
+        return {'delai_s': self.delai, 'demandes': self.demandes, 'reconstructions': self.reconstructions}
+
+status_snapshot = StatusSnapshot()
+# Arrêt : le dernier changement part dans la file avant qu'elle soit vidée (atexit en ordre inverse)
+atexit.register(status_snapshot.reconstruire)
+
 def sauvegarder_status():
-    """Sauvegarde l'état du bot dans status.json pour le site web ET dans SQLite"""
+    """Met à jour status.json pour le site web ET SQLite (snapshot reconstruit en différé)"""
+    status_snapshot.invalider()
+
+def noter_status_match(nom, change=True):
+    """
+    Après le check d'un match : upsert de sa seule ligne, le snapshot public suit en différé.
+    Sans changement d'offres, rien n'est écrit avant STATUS_REFRESH_INTERVAL secondes.
+    
+    Returns:
+        bool: True si la ligne a été écrite
+    """
+    maintenant = time.monotonic()
+    precedente = status_ecrit_par_match.get(nom)
+    if not change and precedente is not None and maintenant - precedente < STATUS_REFRESH_INTERVAL:
+        return False
+    status_ecrit_par_match[nom] = maintenant
+    dernier_check = dernier_check_par_match.get(nom)
+    persistence.soumettre('match_status', {
+        'match': nom,
+        'pmr_disponible': pmr_disponible_par_match.get(nom, False),
+        'nb_checks': nb_checks_par_match.get(nom, 0),
+        'dernier_check': dernier_check.isoformat() if dernier_check else None
+    }, cle=nom)
+    status_snapshot.invalider()
+    return True
+
+def _sauvegarder_status():
     status = {
         "bot_actif": True,
         "derniere_mise_a_jour": formater_date_francaise(datetime.now()),
@@ -1229,7 +2178,8 @@ def sauvegarder_status():
     total_checks = 0
     alertes_envoyees = 0
     
-    for match in MATCHS:
+    matchs = match_registry.lister()
+    for match in matchs:
         nom = match["nom"]
         
         # Calculer le temps depuis le dernier check
@@ -1263,138 +2213,2025 @@ def sauvegarder_status():
             "nb_checks": nb_checks
         })
     
-    # Calculer le taux de disponibilité (pourcentage de fois où PMR était disponible)
-    nb_matchs = len(MATCHS)
-    if nb_matchs > 0:
-        matchs_avec_pmr = sum(1 for match in MATCHS if pmr_disponible_par_match.get(match["nom"], False))
-        taux_disponibilite = round((matchs_avec_pmr / nb_matchs) * 100, 1)
+    # Calculer le taux de disponibilité (pourcentage de fois où PMR était disponible)
+    nb_matchs = len(matchs)
+    if nb_matchs > 0:
+        matchs_avec_pmr = sum(1 for match in matchs if pmr_disponible_par_match.get(match["nom"], False))
+        taux_disponibilite = round((matchs_avec_pmr / nb_matchs) * 100, 1)
+    else:
+        taux_disponibilite = 0.0
+    
+    # Ajouter les statistiques globales
+    status["statistiques"] = {
+        "verifications_totales": total_checks,
+        "alertes_envoyees": alertes_envoyees,
+        "taux_disponibilite": f"{taux_disponibilite}%",
+        "matchs_surveilles": nb_matchs
+    }
+    
+    global status_courant
+    status_courant = status
+    # SQLite + status.json : seul le dernier snapshot en attente est écrit
+    persistence.soumettre('status', status, cle='status')
+
+# ====================
+# POOL DE NAVIGATEUR CHROMIUM
+# ====================
+# Un seul Chromium reste lancé entre les vérifications : chaque check emprunte un
+# contexte (réutilisé tant qu'il est sain) et ouvre juste une page dedans.
+BROWSER_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--disable-software-rasterizer',
+    '--disable-extensions',
+    '--window-size=1920x1080',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-features=IsolateOrigins,site-per-process',
+]
+BROWSER_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+BROWSER_VIEWPORT = {'width': 1920, 'height': 1080}
+BROWSER_RECYCLE_AFTER = int(os.getenv("BROWSER_RECYCLE_AFTER", "200"))  # Relancer Chromium après N vérifications (voir aussi MemoryWatchdog)
+BROWSER_MAX_IDLE_CONTEXTS = int(os.getenv("BROWSER_MAX_IDLE_CONTEXTS", "2"))  # Contextes gardés au chaud
+BROWSER_CONTEXT_MAX_USES = int(os.getenv("BROWSER_CONTEXT_MAX_USES", "25"))  # Un contexte est jeté après N pages
+# Optionnel : profil Chromium sur le volume, cookies et cache HTTP survivent aux arrêts de la
+# machine. Par défaut, contextes isolés recyclés par le pool (et seuls compatibles avec le replay HAR)
+BROWSER_PERSISTENT_PROFILE = os.getenv("BROWSER_PERSISTENT_PROFILE", "0") == "1"
+BROWSER_PROFILE_DIR = os.getenv("BROWSER_PROFILE_DIR", os.path.join(DATA_DIR, 'chromium-profile'))
+BROWSER_DISK_CACHE_MB = int(os.getenv("BROWSER_DISK_CACHE_MB", "100"))
+CHECK_TIMEOUT = int(os.getenv("CHECK_TIMEOUT", "300"))  # Durée max d'une vérification (secondes)
+CHECK_CONCURRENCY = max(1, int(os.getenv("CHECK_CONCURRENCY", "3")))  # Pages ouvertes en même temps au max
+
+class BrowserPool:
+    """
+    Navigateur Chromium persistant partagé par toutes les vérifications.
+    
+    Playwright (API async) tourne dans une boucle asyncio dédiée à un thread.
+    Les autres threads (boucle principale, vérifications forcées) y soumettent
+    leurs coroutines avec run() : c'est ce qui permet de partager UN seul
+    navigateur entre threads, ce que l'API sync de Playwright interdit.
+    
+    Avec BROWSER_PERSISTENT_PROFILE, le "navigateur" est un contexte persistant
+    (profil sur le volume) et toutes les pages s'ouvrent dedans.
+    """
+    
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._lock = None  # asyncio.Lock, créé dans la boucle du pool
+        self._slots = None  # asyncio.Semaphore limitant les pages simultanées
+        self._playwright = None
+        self._browser = None  # Browser, ou BrowserContext persistant avec BROWSER_PERSISTENT_PROFILE
+        self._browser_ferme = False
+        self._idle_contexts = []
+        self._context_uses = {}
+        self._in_use = 0
+        self._checks_since_launch = 0
+        self.launches = 0
+        self.derniere_duree_lancement = 0.0
+        self.recyclages = 0
+        self._recyclage_demande = None
+    
+    def _ensure_loop(self):
+        """Démarre la boucle asyncio du pool au premier appel"""
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='browser-pool', daemon=True)
+                self._thread.start()
+    
+    def run(self, coro_factory, timeout=None):
+        """
+        Exécute coro_factory() dans la boucle du navigateur et attend le résultat.
+        
+        Args:
+            coro_factory: Fonction sans argument qui retourne la coroutine à exécuter
+            timeout: Délai max en secondes (la coroutine est annulée au-delà)
+        """
+        self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(coro_factory(), self._loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+    
+    def demander_recyclage(self, raison):
+        """Demande la relance du navigateur dès que les pages en cours seront rendues"""
+        if self._recyclage_demande is None:
+            self._recyclage_demande = raison
+    
+    def _raison_recyclage(self):
+        if self._recyclage_demande is not None:
+            return self._recyclage_demande
+        if self._checks_since_launch >= BROWSER_RECYCLE_AFTER:
+            return f"{self._checks_since_launch} vérifications"
+        return None
+    
+    async def _acquire_browser(self):
+        """Retourne un navigateur sain, en le (re)lançant si nécessaire"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        while True:
+            async with self._lock:
+                raison = self._raison_recyclage() if self._browser is not None else None
+                # Recyclage en attente : on laisse les pages en cours se terminer sans en ouvrir de nouvelles
+                if raison is None or self._in_use == 0:
+                    break
+            await asyncio.sleep(0.2)
+        async with self._lock:
+            if self._browser is not None:
+                if self._browser_ferme:
+                    log("⚠️ Navigateur déconnecté, relance...", 'warning')
+                    await self._close_browser()
+                elif (raison := self._raison_recyclage()) is not None and self._in_use == 0:
+                    log(f"♻️ Recyclage du navigateur ({raison})", 'info')
+                    self.recyclages += 1
+                    self._recyclage_demande = None
+                    await self._close_browser()
+            if self._browser is None:
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                debut = time.monotonic()
+                if BROWSER_PERSISTENT_PROFILE:
+                    navigateur = await self._lancer_profil()
+                    navigateur.on('close', lambda _: self._marquer_ferme(navigateur))
+                else:
+                    navigateur = await self._playwright.chromium.launch(headless=True, args=BROWSER_ARGS, timeout=60000)
+                    navigateur.on('disconnected', lambda _: self._marquer_ferme(navigateur))
+                self._browser = navigateur
+                self._browser_ferme = False
+                self._checks_since_launch = 0
+                self.launches += 1
+                self.derniere_duree_lancement = time.monotonic() - debut
+                log(f"🚀 Navigateur Chromium lancé en {self.derniere_duree_lancement:.1f}s (lancement n°{self.launches})", 'info')
+            self._in_use += 1
+            self._checks_since_launch += 1
+            return self._browser
+    
+    def _marquer_ferme(self, navigateur):
+        if navigateur is self._browser:
+            self._browser_ferme = True
+    
+    async def _lancer_profil(self):
+        """Lance Chromium sur le profil persistant du volume"""
+        os.makedirs(BROWSER_PROFILE_DIR, exist_ok=True)
+        # Verrous laissés par un arrêt brutal : Chromium refuserait d'ouvrir le profil
+        for verrou in ('SingletonLock', 'SingletonSocket', 'SingletonCookie'):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(BROWSER_PROFILE_DIR, verrou))
+        return await self._playwright.chromium.launch_persistent_context(
+            BROWSER_PROFILE_DIR,
+            headless=True,
+            args=BROWSER_ARGS + [f'--disk-cache-size={BROWSER_DISK_CACHE_MB * 1024 * 1024}'],
+            viewport=BROWSER_VIEWPORT,
+            user_agent=BROWSER_USER_AGENT,
+            service_workers='block',  # Sinon leurs requêtes échappent à page.route() et à l'interception
+            timeout=60000
+        )
+    
+    async def _close_browser(self):
+        """Ferme le navigateur courant et oublie ses contextes"""
+        browser = self._browser
+        self._browser = None
+        self._idle_contexts = []
+        self._context_uses = {}
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception as e:
+                log(f"⚠️ Erreur fermeture navigateur: {e}", 'warning')
+    
+    @contextlib.asynccontextmanager
+    async def page(self, har=None, har_update=False):
+        """
+        Emprunte une page neuve dans un contexte du pool (à utiliser avec async with).
+        
+        Au plus CHECK_CONCURRENCY pages sont ouvertes en même temps, chacune dans
+        son propre contexte : les suivantes attendent qu'une place se libère.
+        
+        Args:
+            har: Fichier HAR à rejouer (ou à enregistrer si har_update) dans un
+                 contexte dédié, non réutilisé (voir bench/bench_scraper.py)
+            har_update: Enregistrer le réseau dans har au lieu de le rejouer
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(CHECK_CONCURRENCY)
+        async with self._slots:
+            async with self._page(har, har_update) as page:
+                yield page
+    
+    @contextlib.asynccontextmanager
+    async def _page(self, har, har_update):
+        if BROWSER_PERSISTENT_PROFILE:
+            if har is not None:
+                raise ValueError("Le replay HAR demande des contextes isolés : lancer avec BROWSER_PERSISTENT_PROFILE=0")
+            async with self._page_profil() as page:
+                yield page
+            return
+        browser = await self._acquire_browser()
+        context = None
+        page = None
+        reutilisable = False
+        try:
+            while har is None and self._idle_contexts and context is None:
+                candidat = self._idle_contexts.pop()
+                if candidat.browser is browser:
+                    context = candidat
+            if context is None:
+                context = await browser.new_context(viewport=BROWSER_VIEWPORT, user_agent=BROWSER_USER_AGENT,
+                                                    service_workers='block')  # Comme le contexte persistant
+            if har is not None:
+                # Le HAR n'est écrit qu'à la fermeture du contexte : jamais réutilisé
+                await context.route_from_har(har, not_found='fallback' if har_update else 'abort',
+                                             update=har_update, update_content='embed')
+            self._context_uses[context] = self._context_uses.get(context, 0) + 1
+            
+            page = await context.new_page()
+            page.set_default_timeout(120000)
+            page.set_default_navigation_timeout(120000)
+            yield page
+            reutilisable = True
+        finally:
+            self._in_use -= 1
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    reutilisable = False
+            if context is not None:
+                garder = (
+                    reutilisable
+                    and har is None
+                    and browser is self._browser
+                    and not self._browser_ferme
+                    and self._context_uses.get(context, 0) < BROWSER_CONTEXT_MAX_USES
+                    and len(self._idle_contexts) < BROWSER_MAX_IDLE_CONTEXTS
+                )
+                if garder:
+                    self._idle_contexts.append(context)
+                else:
+                    self._context_uses.pop(context, None)
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+    
+    @contextlib.asynccontextmanager
+    async def _page_profil(self):
+        """Page neuve dans le contexte persistant (cookies et cache partagés entre checks)"""
+        profil = await self._acquire_browser()
+        page = None
+        try:
+            page = await profil.new_page()
+            page.set_default_timeout(120000)
+            page.set_default_navigation_timeout(120000)
+            yield page
+        finally:
+            self._in_use -= 1
+            if page is not None:
+                with contextlib.suppress(Exception):
+                    await page.close()
+    
+    async def _shutdown(self):
+        await self._close_browser()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+    
+    def shutdown(self):
+        """Ferme proprement le navigateur et Playwright (appelé à l'arrêt du process)"""
+        if self._loop is None:
+            return
+        try:
+            self.run(self._shutdown, timeout=30)
+        except Exception as e:
+            print(f"⚠️ Erreur arrêt du pool navigateur: {e}")
+
+browser_pool = BrowserPool()
+atexit.register(browser_pool.shutdown)
+
+# ====================
+# SURVEILLANCE MÉMOIRE DE CHROMIUM
+# ====================
+# Sur la VM de 1 Go, c'est l'arbre de processus Chromium qui fait tomber le container
+# en OOM. On échantillonne son RSS et on demande un recyclage au pool au-delà du seuil.
+BROWSER_MEMORY_LIMIT_MB = int(os.getenv("BROWSER_MEMORY_LIMIT_MB", "550"))
+WATCHDOG_INTERVAL = int(os.getenv("WATCHDOG_INTERVAL", "30"))  # Secondes entre deux échantillons
+WATCHDOG_LOG_EVERY = 20  # Un échantillon loggé sur N (les dépassements sont toujours loggés)
+
+def _descendants(pid_racine):
+    """PIDs de tous les descendants de pid_racine (lecture de /proc)"""
+    enfants = {}
+    for entree in os.listdir('/proc'):
+        if not entree.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entree}/stat', 'r') as f:
+                stat = f.read()
+        except OSError:
+            continue  # Processus terminé entre-temps
+        # Le nom du processus (2e champ) peut contenir des espaces : on repart de la dernière parenthèse
+        ppid = int(stat.rsplit(')', 1)[1].split()[1])
+        enfants.setdefault(ppid, []).append(int(entree))
+    resultat = []
+    a_visiter = [pid_racine]
+    while a_visiter:
+        for enfant in enfants.get(a_visiter.pop(), []):
+            resultat.append(enfant)
+            a_visiter.append(enfant)
+    return resultat
+
+def mesurer_memoire_navigateur():
+    """
+    Somme le RSS des processus Chromium lancés par ce process (via le driver Playwright).
+    
+    Returns:
+        dict|None: {'rss_mb', 'processus'} ou None si /proc n'est pas disponible
+    """
+    if not os.path.isdir('/proc'):
+        return None
+    rss_kb = 0
+    nb_processus = 0
+    for pid in _descendants(os.getpid()):
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                cmdline = f.read()
+            if b'chrom' not in cmdline and b'headless_shell' not in cmdline:
+                continue  # Driver node de Playwright, autres sous-process
+            with open(f'/proc/{pid}/status', 'r') as f:
+                for ligne in f:
+                    if ligne.startswith('VmRSS:'):
+                        rss_kb += int(ligne.split()[1])
+                        nb_processus += 1
+                        break
+        except (OSError, ValueError):
+            continue
+    return {'rss_mb': round(rss_kb / 1024, 1), 'processus': nb_processus}
+
+class MemoryWatchdog:
+    """Échantillonne périodiquement la mémoire de Chromium et déclenche les recyclages"""
+    
+    def __init__(self, pool):
+        self.pool = pool
+        self.echantillons = collections.deque(maxlen=120)
+        self.depassements = 0
+        self._thread = None
+    
+    def echantillonner(self):
+        mesure = mesurer_memoire_navigateur()
+        if mesure is None:
+            return None
+        echantillon = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'checks_depuis_lancement': self.pool._checks_since_launch,
+            **mesure
+        }
+        self.echantillons.append(echantillon)
+        if mesure['rss_mb'] > BROWSER_MEMORY_LIMIT_MB:
+            self.depassements += 1
+            log(f"🧠 Chromium à {mesure['rss_mb']} Mo ({mesure['processus']} processus) > {BROWSER_MEMORY_LIMIT_MB} Mo, recyclage demandé", 'warning')
+            self.pool.demander_recyclage(f"mémoire {mesure['rss_mb']} Mo")
+        elif len(self.echantillons) % WATCHDOG_LOG_EVERY == 0:
+            log(f"🧠 Chromium: {mesure['rss_mb']} Mo ({mesure['processus']} processus)", 'info')
+        return echantillon
+    
+    def _boucle(self):
+        while True:
+            try:
+                self.echantillonner()
+            except Exception as e:
+                log(f"⚠️ Erreur watchdog mémoire: {e}", 'warning')
+            time.sleep(WATCHDOG_INTERVAL)
+    
+    def demarrer(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._boucle, name='memory-watchdog', daemon=True)
+            self._thread.start()
+    
+    def resume(self):
+        echantillons = list(self.echantillons)
+        return {
+            'limite_mb': BROWSER_MEMORY_LIMIT_MB,
+            'dernier': echantillons[-1] if echantillons else None,
+            'max_mb': max((e['rss_mb'] for e in echantillons), default=None),
+            'depassements': self.depassements,
+            'recyclages': self.pool.recyclages,
+            'lancements': self.pool.launches,
+            'echantillons': echantillons[-20:]
+        }
+
+memory_watchdog = MemoryWatchdog(browser_pool)
+
+# ====================
+# ATTENTE ADAPTATIVE DE LA PAGE
+# ====================
+PMR_SELECTOR = 'div[data-offer-type="PMR"]'
+# N'importe quelle offre (PMR ou non). Plus large que PMR_SELECTOR : le plan B DOM liste toutes
+# les offres et compte comme PMR tout élément dont data-offer-type vaut PMR, quelle que soit
+# la balise et la casse.
+OFFERS_SELECTOR = '[data-offer-type]'
+PAGE_READY_TIMEOUT_MS = int(os.getenv("PAGE_READY_TIMEOUT_MS", "20000"))  # Délai max d'attente des offres
+PAGE_READY_GRACE_MS = int(os.getenv("PAGE_READY_GRACE_MS", "2000"))  # Marge après network idle sans offre
+PAGE_READY_OFFERS_GRACE_MS = int(os.getenv("PAGE_READY_OFFERS_GRACE_MS", "500"))  # Marge après l'apparition des offres
+# Attendre le repos du réseau ? À couper si la billetterie fait du polling (le réseau ne se calme jamais)
+PAGE_READY_NETWORKIDLE = os.getenv("PAGE_READY_NETWORKIDLE", "1") == "1"
+SCROLL_MAX = int(os.getenv("SCROLL_MAX", "5"))  # Nombre max de scrolls si lazy-loading
+SCROLL_STEP_PX = 1500
+SCROLL_SETTLE_MS = 2000  # Attente max du réseau après un scroll
+
+async def _attendre_silencieusement(awaitable):
+    """Attend une opération Playwright et retourne True si elle a réussi (False sur timeout/erreur)"""
+    try:
+        await awaitable
+        return True
+    except Exception:
+        return False
+
+async def attendre_page_prete(page, deadline_ms=None, evenement=None):
+    """
+    Attend que la page du match soit exploitable, sans délai fixe.
+    
+    Se résout dès que :
+    - un payload d'offres a été intercepté (evenement, voir InterceptionOffres),
+    - une offre PMR est présente (inutile d'attendre le reste),
+    - ou des offres sont présentes depuis PAGE_READY_OFFERS_GRACE_MS (ou le réseau est au repos),
+    - ou le réseau est au repos et rien n'apparaît pendant PAGE_READY_GRACE_MS,
+    - ou le délai max est atteint.
+    
+    Le repos du réseau (networkidle) n'est attendu que si PAGE_READY_NETWORKIDLE est actif.
+    
+    Returns:
+        str: La raison de la résolution ('reseau', 'pmr', 'offres', 'vide', 'delai')
+    """
+    deadline_ms = deadline_ms or PAGE_READY_TIMEOUT_MS
+    pmr_task = asyncio.ensure_future(_attendre_silencieusement(
+        page.wait_for_selector(PMR_SELECTOR, state='attached', timeout=deadline_ms)))
+    offres_task = asyncio.ensure_future(_attendre_silencieusement(
+        page.wait_for_selector(OFFERS_SELECTOR, state='attached', timeout=deadline_ms)))
+    taches = {pmr_task, offres_task}
+    idle_task = None
+    if PAGE_READY_NETWORKIDLE:
+        idle_task = asyncio.ensure_future(_attendre_silencieusement(
+            page.wait_for_load_state('networkidle', timeout=deadline_ms)))
+        taches.add(idle_task)
+    reseau_task = None
+    if evenement is not None:
+        reseau_task = asyncio.ensure_future(evenement.wait())
+        taches.add(reseau_task)
+    fin = time.monotonic() + deadline_ms / 1000
+    raison = 'delai'
+    
+    try:
+        en_cours = set(taches)
+        while en_cours:
+            restant = fin - time.monotonic()
+            if restant <= 0:
+                break
+            _, en_cours = await asyncio.wait(en_cours, timeout=restant, return_when=asyncio.FIRST_COMPLETED)
+            
+            if reseau_task is not None and reseau_task.done():
+                raison = 'reseau'
+                break
+            if pmr_task.done() and pmr_task.result():
+                raison = 'pmr'
+                break
+            if offres_task.done() and offres_task.result():
+                # Offres affichées : courte marge pour une PMR ou le payload, sans attendre le réseau
+                restant = min(PAGE_READY_OFFERS_GRACE_MS / 1000, fin - time.monotonic())
+                attente = {t for t in (pmr_task, reseau_task, idle_task) if t is not None and not t.done()}
+                if restant > 0 and attente:
+                    await asyncio.wait(attente, timeout=restant, return_when=asyncio.FIRST_COMPLETED)
+                if reseau_task is not None and reseau_task.done():
+                    raison = 'reseau'
+                elif pmr_task.done() and pmr_task.result():
+                    raison = 'pmr'
+                else:
+                    raison = 'offres'
+                break
+            if idle_task is not None and idle_task.done() and not offres_task.done():
+                # Réseau au repos mais pas encore d'offre : petite marge pour le rendu JS
+                restant = min(PAGE_READY_GRACE_MS / 1000, fin - time.monotonic())
+                if restant > 0:
+                    await asyncio.wait(taches - {idle_task}, timeout=restant, return_when=asyncio.FIRST_COMPLETED)
+                if reseau_task is not None and reseau_task.done():
+                    raison = 'reseau'
+                elif pmr_task.done() and pmr_task.result():
+                    raison = 'pmr'
+                elif offres_task.done() and offres_task.result():
+                    raison = 'offres'
+                else:
+                    raison = 'vide'
+                break
+    finally:
+        for tache in taches:
+            if not tache.done():
+                tache.cancel()
+        # Récupérer les annulations pour éviter les warnings "exception never retrieved"
+        await asyncio.gather(*taches, return_exceptions=True)
+    
+    return raison
+
+async def scroller_si_lazy_loading(page):
+    """
+    Scrolle uniquement si la page charge des offres au défilement.
+    
+    Un premier scroll sert de sonde : si le nombre d'offres n'augmente pas,
+    on s'arrête là. Sinon on continue tant que de nouvelles offres arrivent.
+    
+    Returns:
+        int: Nombre de scrolls effectués
+    """
+    hauteurs = await page.evaluate("() => [document.documentElement.scrollHeight, window.innerHeight]")
+    if hauteurs[0] <= hauteurs[1]:
+        return 0  # Rien à faire défiler
+    
+    nb_offres = len(await page.query_selector_all(OFFERS_SELECTOR))
+    scrolls = 0
+    while scrolls < SCROLL_MAX:
+        await page.mouse.wheel(0, SCROLL_STEP_PX)
+        scrolls += 1
+        if PAGE_READY_NETWORKIDLE:
+            await _attendre_silencieusement(page.wait_for_load_state('networkidle', timeout=SCROLL_SETTLE_MS))
+        else:
+            await _attendre_silencieusement(page.wait_for_function(
+                "([sel, n]) => document.querySelectorAll(sel).length > n",
+                arg=[OFFERS_SELECTOR, nb_offres], timeout=SCROLL_SETTLE_MS))
+        nouveau_nb = len(await page.query_selector_all(OFFERS_SELECTOR))
+        if nouveau_nb <= nb_offres:
+            break  # Pas de lazy-loading (ou fin de liste)
+        nb_offres = nouveau_nb
+    return scrolls
+
+# ====================
+# DÉTECTION PMR PAR INTERCEPTION RÉSEAU
+# ====================
+# La billetterie récupère son catalogue d'offres en XHR/fetch (JSON). On écoute ces
+# réponses pendant le chargement : dès qu'un payload d'offres est reconnu, on a la
+# liste structurée sans attendre le rendu. Le comptage DOM reste le plan B.
+OFFER_TYPE_KEYS = ('offerType', 'offer_type', 'offerTypeCode', 'offerTypeName')
+OFFER_PRICE_KEYS = ('price', 'prix', 'amount', 'minPrice', 'priceMin', 'unitPrice')
+OFFER_NAME_KEYS = ('name', 'label', 'title', 'nom', 'libelle')
+OFFER_UNAVAILABLE_STATUS = ('SOLD_OUT', 'SOLDOUT', 'UNAVAILABLE', 'CLOSED', 'EPUISE')
+PAYLOAD_MAX_NODES = 20000  # Garde-fou pour les très gros JSON
+# Seules les réponses du catalogue d'offres sont lues : recommandations, upsells, etc. ont
+# aussi des objets avec type + prix et donneraient 0 PMR à tort
+OFFERS_URL_REGEX = re.compile(os.getenv("OFFERS_URL_REGEX", r"catalog|offer|offre|tarif|pric|seat|ticket"), re.I)
+OFFERS_URL_EXCLUDE_REGEX = re.compile(os.getenv("OFFERS_URL_EXCLUDE_REGEX", r"recommend|suggest|upsell|cross-?sell|similar|analytics|track"), re.I)
+DOM_CROSS_CHECK_MS = int(os.getenv("DOM_CROSS_CHECK_MS", "3000"))  # Attente max du rendu pour le contrôle DOM
+PRIX_REGEX = re.compile(r'(\d+(?:[.,]\d{1,2})?)\s*€')
+
+def _lire_prix(valeur):
+    """Convertit un prix de payload (nombre, chaîne ou {'amount': ..}) en float"""
+    if isinstance(valeur, dict):
+        valeur = next((valeur[k] for k in ('amount', 'value', 'valeur') if k in valeur), None)
+    if isinstance(valeur, bool):
+        return None
+    if isinstance(valeur, (int, float)):
+        return float(valeur)
+    if isinstance(valeur, str):
+        try:
+            return float(valeur.replace('€', '').replace(',', '.').strip())
+        except ValueError:
+            return None
+    return None
+
+def _lire_disponibilite(offre):
+    """Déduit la disponibilité d'une offre de payload (None si inconnue)"""
+    for cle in ('available', 'isAvailable', 'disponible', 'onSale'):
+        if isinstance(offre.get(cle), bool):
+            return offre[cle]
+    for cle in ('availableQuantity', 'quantity', 'remaining', 'stock'):
+        if isinstance(offre.get(cle), (int, float)) and not isinstance(offre.get(cle), bool):
+            return offre[cle] > 0
+    statut = offre.get('status') or offre.get('availability')
+    if isinstance(statut, str):
+        return statut.upper() not in OFFER_UNAVAILABLE_STATUS
+    return None
+
+def _normaliser_offre(offre):
+    """Retourne l'offre sous forme normalisée, ou None si le dict n'est pas une offre"""
+    type_offre = next((offre[k] for k in OFFER_TYPE_KEYS if isinstance(offre.get(k), str)), None)
+    if type_offre is None:
+        # 'type' seul est trop générique : on ne le prend que s'il y a aussi un prix
+        if isinstance(offre.get('type'), str) and any(k in offre for k in OFFER_PRICE_KEYS):
+            type_offre = offre['type']
+        else:
+            return None
+    return {
+        'type': type_offre.upper(),
+        'nom': next((offre[k] for k in OFFER_NAME_KEYS if isinstance(offre.get(k), str)), None),
+        'prix': next((p for p in (_lire_prix(offre.get(k)) for k in OFFER_PRICE_KEYS if k in offre) if p is not None), None),
+        'disponible': _lire_disponibilite(offre)
+    }
+
+def extraire_offres_payload(data):
+    """
+    Parcourt un payload JSON et en extrait les offres reconnues.
+    
+    Returns:
+        list|None: Liste d'offres normalisées {type, nom, prix, disponible},
+                   ou None si le payload ne ressemble pas à un catalogue d'offres
+    """
+    offres = []
+    pile = collections.deque([data])
+    visites = 0
+    while pile and visites < PAYLOAD_MAX_NODES:
+        noeud = pile.popleft()
+        visites += 1
+        if isinstance(noeud, dict):
+            offre = _normaliser_offre(noeud)
+            if offre is not None:
+                offres.append(offre)
+            pile.extend(v for v in noeud.values() if isinstance(v, (dict, list)))
+        elif isinstance(noeud, list):
+            pile.extend(v for v in noeud if isinstance(v, (dict, list)))
+    return offres or None
+
+def compter_pmr(offres):
+    """Nombre d'offres PMR disponibles (une disponibilité inconnue compte comme disponible)"""
+    return sum(1 for o in offres if o['type'] == 'PMR' and o['disponible'] is not False)
+
+class InterceptionOffres:
+    """Écoute les réponses XHR/fetch du catalogue d'offres et garde le premier payload reconnu"""
+    
+    def __init__(self):
+        self.offres = None
+        self.url = None
+        self.trouve = asyncio.Event()
+    
+    async def sur_reponse(self, response):
+        if self.offres is not None:
+            return
+        if response.request.resource_type not in ('xhr', 'fetch'):
+            return
+        if 'json' not in (response.headers.get('content-type') or ''):
+            return
+        chemin = urlparse(response.url).path
+        if not OFFERS_URL_REGEX.search(chemin) or OFFERS_URL_EXCLUDE_REGEX.search(chemin):
+            return
+        try:
+            data = await response.json()
+        except Exception:
+            return  # Corps illisible, redirection, page fermée...
+        offres = extraire_offres_payload(data)
+        if offres and self.offres is None:
+            self.offres = offres
+            self.url = response.url
+            self.trouve.set()
+
+async def extraire_offres_dom(page):
+    """Plan B : reconstruit la liste d'offres à partir des éléments data-offer-type"""
+    elements = await page.eval_on_selector_all(
+        OFFERS_SELECTOR,
+        "els => els.map(e => ({type: e.getAttribute('data-offer-type') || '', texte: (e.innerText || '').slice(0, 300)}))"
+    )
+    offres = []
+    for element in elements:
+        texte = element['texte'].strip()
+        prix = PRIX_REGEX.search(texte)
+        offres.append({
+            'type': element['type'].upper(),
+            'nom': texte.split('\n', 1)[0] if texte else None,
+            'prix': float(prix.group(1).replace(',', '.')) if prix else None,
+            'disponible': None
+        })
+    return offres
+
+# ====================
+# LIMITATION DE DÉBIT PAR HÔTE
+# ====================
+# Un seau à jetons par hôte, partagé par la sonde HTTP et les navigations Chromium :
+# les checks parallèles ne peuvent pas dépasser RATE_LIMIT_PER_MINUTE requêtes de page
+# vers la billetterie. Un 403/429 ou une page de challenge gèle l'hôte avec un back-off
+# exponentiel, remis à zéro au premier chargement réussi.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "20"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "3"))
+RATE_LIMIT_JITTER = float(os.getenv("RATE_LIMIT_JITTER", "1.5"))  # Secondes aléatoires ajoutées à chaque attente
+RATE_LIMIT_BACKOFF_BASE = int(os.getenv("RATE_LIMIT_BACKOFF_BASE", "60"))
+RATE_LIMIT_BACKOFF_MAX = int(os.getenv("RATE_LIMIT_BACKOFF_MAX", "1800"))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "10"))  # Au-delà, le check est reporté au lieu d'attendre
+
+class CheckDiffere(Exception):
+    """Hôte gelé ou file de jetons trop longue : le check est replanifié dans `attente` secondes"""
+    
+    def __init__(self, hote, attente):
+        super().__init__(f"{hote} limité, check reporté de {attente:.0f}s")
+        self.attente = attente
+        self.phases = {}  # Phases déjà mesurées quand le report survient en cours de check
+
+class SeauJetons:
+    """Seau à jetons d'un hôte, avec gel temporaire après un blocage"""
+    
+    def __init__(self):
+        self.jetons = float(RATE_LIMIT_BURST)
+        self.derniere_recharge = time.monotonic()
+        self.pause_jusqu_a = 0.0
+        self.backoff = 0
+        self.requetes = 0
+        self.blocages = 0
+        self.attente_totale = 0.0
+        self.reports = 0
+    
+    def _recharger(self, maintenant):
+        # Pas de recharge pendant un gel : derniere_recharge est alors dans le futur
+        if maintenant > self.derniere_recharge:
+            taux = RATE_LIMIT_PER_MINUTE / 60
+            self.jetons = min(RATE_LIMIT_BURST, self.jetons + (maintenant - self.derniere_recharge) * taux)
+            self.derniere_recharge = maintenant
+    
+    def reserver(self, maintenant):
+        """Prend un jeton (éventuellement à crédit) et retourne le délai à respecter avant la requête"""
+        self._recharger(maintenant)
+        self.jetons -= 1
+        self.requetes += 1
+        attente = max(0.0, self.pause_jusqu_a - maintenant)
+        if self.jetons < 0:
+            attente += -self.jetons / (RATE_LIMIT_PER_MINUTE / 60)
+        return attente
+    
+    def rendre(self):
+        """Annule une réservation (check reporté) : le jeton reste aux suivants"""
+        self.jetons += 1
+        self.requetes -= 1
+    
+    def bloquer(self, maintenant):
+        self.backoff = min(RATE_LIMIT_BACKOFF_MAX, self.backoff * 2 if self.backoff else RATE_LIMIT_BACKOFF_BASE)
+        self.pause_jusqu_a = maintenant + self.backoff
+        self.jetons = min(self.jetons, 0.0)
+        self.derniere_recharge = max(self.derniere_recharge, self.pause_jusqu_a)
+        self.blocages += 1
+        return self.backoff
+
+class RateLimiter:
+    """Limiteur de débit partagé (threads de check et boucle asyncio du pool)"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seaux = {}
+    
+    def _seau(self, url):
+        hote = urlparse(url).hostname or url
+        seau = self._seaux.get(hote)
+        if seau is None:
+            seau = self._seaux[hote] = SeauJetons()
+        return hote, seau
+    
+    def reserver(self, url, attente_max=RATE_LIMIT_MAX_WAIT):
+        """
+        Retourne le nombre de secondes à attendre avant de requêter url (0 si limiteur désactivé).
+        
+        Raises:
+            CheckDiffere: si l'attente dépasse attente_max (le jeton n'est alors pas consommé)
+        """
+        if not RATE_LIMIT_ENABLED:
+            return 0.0
+        with self._lock:
+            hote, seau = self._seau(url)
+            attente = seau.reserver(time.monotonic())
+            if attente_max is not None and attente > attente_max:
+                seau.rendre()
+                seau.reports += 1
+                raise CheckDiffere(hote, attente)
+            if attente > 0:
+                attente += random.uniform(0, RATE_LIMIT_JITTER)
+                seau.attente_totale += attente
+        if attente >= 5:
+            log(f"🚦 {hote}: requête différée de {attente:.1f}s", 'info')
+        return attente
+    
+    def attendre(self, url):
+        """Version bloquante de reserver() pour les threads de check (attente bornée par RATE_LIMIT_MAX_WAIT)"""
+        attente = self.reserver(url)
+        if attente > 0:
+            time.sleep(attente)
+    
+    async def attendre_async(self, url):
+        """Version asyncio de reserver() pour la boucle du pool de navigateur (attente bornée)"""
+        attente = self.reserver(url)
+        if attente > 0:
+            await asyncio.sleep(attente)
+    
+    def signaler_blocage(self, url, raison):
+        if not RATE_LIMIT_ENABLED:
+            return
+        with self._lock:
+            hote, seau = self._seau(url)
+            backoff = seau.bloquer(time.monotonic())
+        log(f"🛑 {hote} bloque les requêtes ({raison}), pause de {backoff}s", 'warning')
+    
+    def signaler_succes(self, url):
+        with self._lock:
+            _, seau = self._seau(url)
+            seau.backoff = 0
+    
+    def resume(self):
+        maintenant = time.monotonic()
+        with self._lock:
+            return {hote: {
+                'requetes': seau.requetes,
+                'blocages': seau.blocages,
+                'reports': seau.reports,
+                'jetons': round(max(seau.jetons, 0.0), 2),
+                'pause_restante': round(max(0.0, seau.pause_jusqu_a - maintenant), 1),
+                'attente_totale': round(seau.attente_totale, 1)
+            } for hote, seau in self._seaux.items()}
+
+rate_limiter = RateLimiter()
+
+# ====================
+# SONDE HTTP AVANT LE NAVIGATEUR
+# ====================
+# Tier 1 : un simple GET de la page du match. Si le HTML rendu côté serveur (ou son
+# état JSON embarqué) contient déjà les offres, on a la réponse sans Chromium.
+# Tier 2 : le navigateur, uniquement si la page est rendue côté client, bloquée ou ambiguë.
+HTTP_PROBE_ENABLED = os.getenv("HTTP_PROBE_ENABLED", "1") == "1"
+HTTP_PROBE_TIMEOUT = float(os.getenv("HTTP_PROBE_TIMEOUT", "15"))
+HTTP_PROBE_BROWSER_EVERY = int(os.getenv("HTTP_PROBE_BROWSER_EVERY", "10"))  # Contrôle navigateur tous les N checks concluants
+CHALLENGE_MARKERS = ('cf-chl', 'challenge-platform', 'captcha', 'queue-it', 'datadome', 'access denied')
+OFFER_ATTR_REGEX = re.compile(r'data-offer-type\s*=\s*["\']([^"\']*)["\']', re.I)
+STATE_SCRIPT_REGEX = re.compile(
+    r'<script[^>]*id=["\'](?:__NEXT_DATA__|__NUXT_DATA__|ng-state|serverApp-state)["\'][^>]*>(.*?)</script>', re.S | re.I)
+STATE_ASSIGN_REGEX = re.compile(
+    r'window\.__(?:INITIAL_STATE|NUXT|APOLLO_STATE|PRELOADED_STATE)__\s*=\s*(\{.*?\})\s*;?\s*</script>', re.S)
+
+http_session = requests.Session()
+http_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+http_session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+http_session.headers.update({
+    'User-Agent': BROWSER_USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'fr-FR,fr;q=0.9,en;q=0.8'
+})
+
+# Statistiques par tier (taux de réponse concluante et latence)
+tier_stats = {}
+tier_stats_lock = threading.Lock()
+http_concluants_consecutifs = {}
+
+def enregistrer_tier(tier, verdict, duree):
+    """Comptabilise un passage dans un tier ('http' ou 'navigateur') avec son verdict et sa durée"""
+    with tier_stats_lock:
+        stats = tier_stats.setdefault(tier, {'checks': 0, 'duree_totale': 0.0, 'duree_max': 0.0, 'verdicts': {}})
+        stats['checks'] += 1
+        stats['duree_totale'] += duree
+        stats['duree_max'] = max(stats['duree_max'], duree)
+        stats['verdicts'][verdict] = stats['verdicts'].get(verdict, 0) + 1
+
+def get_tier_stats():
+    """Retourne une copie des stats par tier avec latence moyenne et taux de réponse concluante"""
+    with tier_stats_lock:
+        resultat = {}
+        for tier, stats in tier_stats.items():
+            checks = stats['checks']
+            concluants = stats['verdicts'].get('concluant', 0) if tier == 'http' else checks - stats['verdicts'].get('erreur', 0)
+            resultat[tier] = {
+                'checks': checks,
+                'verdicts': dict(stats['verdicts']),
+                'taux_concluant': round(concluants / checks * 100, 1) if checks else 0.0,
+                'duree_moyenne': round(stats['duree_totale'] / checks, 3) if checks else 0.0,
+                'duree_max': round(stats['duree_max'], 3)
+            }
+        return resultat
+
+def analyser_html(html):
+    """
+    Cherche les offres dans le HTML rendu côté serveur.
+    
+    Returns:
+        tuple: (verdict, offres) avec verdict 'concluant', 'bloque' ou 'inconclusif'
+    """
+    debut_html = html[:5000].lower()
+    if any(marqueur in debut_html for marqueur in CHALLENGE_MARKERS):
+        return 'bloque', None
+    
+    types = OFFER_ATTR_REGEX.findall(html)
+    if types:
+        return 'concluant', [{'type': t.upper(), 'nom': None, 'prix': None, 'disponible': None} for t in types]
+    
+    for regex in (STATE_SCRIPT_REGEX, STATE_ASSIGN_REGEX):
+        for brut in regex.findall(html):
+            try:
+                offres = extraire_offres_payload(json.loads(brut))
+            except ValueError:
+                continue
+            if offres:
+                return 'concluant', offres
+    return 'inconclusif', None
+
+def sonder_http(url):
+    """GET de la page du match avec la session partagée, puis analyse du HTML"""
+    rate_limiter.attendre(url)
+    try:
+        response = http_session.get(url, timeout=HTTP_PROBE_TIMEOUT)
+    except requests.RequestException as e:
+        return {'verdict': 'erreur', 'offres': None, 'detail': str(e)}
+    if response.status_code in (403, 429):
+        rate_limiter.signaler_blocage(url, f"HTTP {response.status_code}")
+        return {'verdict': 'bloque', 'offres': None, 'detail': f"HTTP {response.status_code}"}
+    if response.status_code >= 400:
+        return {'verdict': 'erreur', 'offres': None, 'detail': f"HTTP {response.status_code}"}
+    verdict, offres = analyser_html(response.text)
+    if verdict == 'bloque':
+        rate_limiter.signaler_blocage(url, 'page de challenge')
+    else:
+        rate_limiter.signaler_succes(url)
+    return {'verdict': verdict, 'offres': offres, 'detail': f"HTTP {response.status_code}"}
+
+# ====================
+# FILTRAGE DES REQUÊTES PENDANT LES CHECKS
+# ====================
+# Images, polices, vidéos, trackers et scripts tiers ne servent à rien pour trouver
+# les offres PMR : on ne laisse passer que certains types de ressources, et seulement
+# vers les domaines autorisés (plus le domaine de la page du match).
+ROUTE_FILTER_ENABLED = os.getenv("ROUTE_FILTER_ENABLED", "1") == "1"
+ROUTE_ALLOWED_RESOURCE_TYPES = frozenset(
+    t.strip() for t in os.getenv("ROUTE_ALLOWED_RESOURCE_TYPES", "document,script,xhr,fetch,stylesheet").split(',') if t.strip())
+ROUTE_ALLOWED_DOMAINS = tuple(
+    d.strip().lower() for d in os.getenv("ROUTE_ALLOWED_DOMAINS", "psg.fr").split(',') if d.strip())
+
+# Cumul depuis le démarrage (pour /api/checker/stats)
+route_stats = {'autorisees': 0, 'bloquees': 0, 'octets_autorises': 0}
+route_stats_lock = threading.Lock()
+
+def domaine_autorise(host, domaines):
+    """True si host est un des domaines (ou un sous-domaine)"""
+    return any(host == d or host.endswith('.' + d) for d in domaines)
+
+class FiltreRequetes:
+    """Route Playwright d'une vérification, avec ses compteurs de requêtes bloquées/autorisées"""
+    
+    def __init__(self, url_match):
+        hote_match = (urlparse(url_match).hostname or '').lower()
+        self.domaines = ROUTE_ALLOWED_DOMAINS + ((hote_match,) if hote_match else ())
+        self.autorisees = 0
+        self.bloquees = 0
+        self.octets_autorises = 0
+        self.bloquees_par_type = {}
+    
+    async def router(self, route):
+        requete = route.request
+        hote = (urlparse(requete.url).hostname or '').lower()
+        if requete.resource_type in ROUTE_ALLOWED_RESOURCE_TYPES and domaine_autorise(hote, self.domaines):
+            self.autorisees += 1
+            await route.fallback()  # Laisse la main au routeur suivant (HAR du benchmark) ou au réseau
+        else:
+            self.bloquees += 1
+            self.bloquees_par_type[requete.resource_type] = self.bloquees_par_type.get(requete.resource_type, 0) + 1
+            await route.abort('blockedbyclient')
+    
+    async def sur_requete_terminee(self, requete):
+        try:
+            tailles = await requete.sizes()
+            self.octets_autorises += tailles['responseBodySize'] + tailles['responseHeadersSize']
+        except Exception:
+            pass  # Page fermée entre-temps
+    
+    async def installer(self, page):
+        """Branche le filtre sur la page de la vérification"""
+        await page.route('**/*', self.router)
+        page.on('requestfinished', self.sur_requete_terminee)
+    
+    def resume(self):
+        with route_stats_lock:
+            route_stats['autorisees'] += self.autorisees
+            route_stats['bloquees'] += self.bloquees
+            route_stats['octets_autorises'] += self.octets_autorises
+        return {
+            'autorisees': self.autorisees,
+            'bloquees': self.bloquees,
+            'octets_autorises': self.octets_autorises,
+            'bloquees_par_type': dict(self.bloquees_par_type)
+        }
+
+async def _analyser_match(nom, url, har=None, har_update=False):
+    """
+    Charge la page du match dans le pool et retourne ses offres.
+    
+    Returns:
+        dict: {'source': 'reseau'|'dom', 'offres': [...], 'nb_pmr': int,
+               'requetes': {...}, 'phases': {phase: secondes}}
+    """
+    phases = {}
+    # Jeton réservé avant de prendre une page : un check limité n'immobilise ni page ni slot
+    # (en replay HAR rien ne part sur le réseau : pas de limitation de débit)
+    limiter = har is None
+    if limiter:
+        debut = time.monotonic()
+        await rate_limiter.attendre_async(url)
+        phases['limitation'] = time.monotonic() - debut
+    
+    debut = time.monotonic()
+    lancements = browser_pool.launches
+    async with browser_pool.page(har=har, har_update=har_update) as page:
+        phases['acquisition'] = time.monotonic() - debut
+        if browser_pool.launches != lancements:
+            phases['lancement'] = browser_pool.derniere_duree_lancement
+            phases['acquisition'] -= phases['lancement']
+        
+        interception = InterceptionOffres()
+        page.on('response', interception.sur_reponse)
+        filtre = None
+        if ROUTE_FILTER_ENABLED:
+            filtre = FiltreRequetes(url)
+            await filtre.installer(page)
+        
+        log(f"🌐 Chargement de {nom}...", 'info')
+        debut = time.monotonic()
+        try:
+            response = await page.goto(url, timeout=120000, wait_until="domcontentloaded")
+            log(f"✅ Page chargée pour {nom}", 'success')
+        except Exception as goto_error:
+            log(f"⚠️ Erreur lors du chargement de la page pour {nom}: {goto_error}", 'warning')
+            log(f"🔄 Nouvelle tentative...", 'info')
+            if limiter:
+                try:
+                    await rate_limiter.attendre_async(url)
+                except CheckDiffere as e:
+                    # Reporté après une première navigation ratée : elle compte dans les phases
+                    phases['navigation'] = time.monotonic() - debut
+                    e.phases = phases
+                    raise
+            response = await page.goto(url, timeout=120000, wait_until="domcontentloaded")
+            log(f"✅ Page chargée pour {nom} (2ème tentative)", 'success')
+        phases['navigation'] = time.monotonic() - debut
+        if limiter and response is not None and response.status in (403, 429):
+            rate_limiter.signaler_blocage(url, f"HTTP {response.status}")
+        
+        debut = time.monotonic()
+        raison = await attendre_page_prete(page, evenement=interception.trouve)
+        scrolls = 0
+        if raison not in ('pmr', 'reseau'):
+            scrolls = await scroller_si_lazy_loading(page)
+        phases['attente'] = time.monotonic() - debut
+        log(f"⏱️ Page prête pour {nom} en {phases['attente']:.1f}s ({raison}, {scrolls} scroll(s))", 'info')
+        
+        debut = time.monotonic()
+        if interception.offres is not None:
+            log(f"📡 {len(interception.offres)} offre(s) lue(s) depuis {interception.url}", 'info')
+            offres = interception.offres
+            source = 'reseau'
+            if compter_pmr(offres) == 0:
+                # 0 PMR côté réseau : contrôle par le DOM avant de conclure (mauvais payload possible)
+                await _attendre_silencieusement(
+                    page.wait_for_selector(OFFERS_SELECTOR, state='attached', timeout=DOM_CROSS_CHECK_MS))
+                offres_dom = await extraire_offres_dom(page)
+                if compter_pmr(offres_dom) > 0:
+                    log(f"⚠️ {nom}: 0 PMR dans {interception.url} mais {compter_pmr(offres_dom)} dans la page, on garde le DOM", 'warning')
+                    offres = offres_dom
+                    source = 'dom'
+        else:
+            offres = await extraire_offres_dom(page)
+            source = 'dom'
+        phases['extraction'] = time.monotonic() - debut
+        
+        if limiter and not offres:
+            # Page vide : vérifier qu'on n'est pas tombé sur un challenge anti-bot
+            debut_html = (await page.evaluate("document.documentElement.outerHTML.slice(0, 5000)")).lower()
+            if any(marqueur in debut_html for marqueur in CHALLENGE_MARKERS):
+                rate_limiter.signaler_blocage(url, 'page de challenge')
+        elif limiter and response is not None and response.ok:
+            rate_limiter.signaler_succes(url)
+        
+        resultat = {'source': source, 'offres': offres, 'nb_pmr': compter_pmr(offres), 'phases': phases}
+        if filtre is not None:
+            resultat['requetes'] = filtre.resume()
+            log(f"🧹 Requêtes {nom}: {filtre.autorisees} autorisée(s) ({filtre.octets_autorises / 1024:.0f} Ko), {filtre.bloquees} bloquée(s)", 'info')
+        return resultat
+
+def verifier_offres(nom, url, har=None):
+    """
+    Récupère les offres d'un match en commençant par le tier le moins cher.
+    
+    La sonde HTTP suffit quand la page est rendue côté serveur. On passe au navigateur
+    si elle est inconclusive/bloquée, et de temps en temps même si elle est concluante
+    (HTTP_PROBE_BROWSER_EVERY) pour contrôler qu'elle ne rate pas d'offres chargées en JS.
+    Avec un HAR (benchmark hors ligne), on va directement au navigateur en mode replay.
+    
+    Returns:
+        dict: {'source': 'http'|'reseau'|'dom', 'offres': [...], 'nb_pmr': int, 'phases': {...}}
+    """
+    phases = {}
+    if har is None and HTTP_PROBE_ENABLED and http_concluants_consecutifs.get(nom, 0) < HTTP_PROBE_BROWSER_EVERY:
+        debut = time.monotonic()
+        sonde = sonder_http(url)
+        phases['sonde_http'] = time.monotonic() - debut
+        enregistrer_tier('http', sonde['verdict'], phases['sonde_http'])
+        if sonde['verdict'] == 'concluant':
+            http_concluants_consecutifs[nom] = http_concluants_consecutifs.get(nom, 0) + 1
+            return {'source': 'http', 'offres': sonde['offres'], 'nb_pmr': compter_pmr(sonde['offres']), 'phases': phases}
+        log(f"↪️ Sonde HTTP {sonde['verdict']} pour {nom} ({sonde['detail']}), passage au navigateur", 'info')
+    
+    http_concluants_consecutifs[nom] = 0
+    debut = time.monotonic()
+    try:
+        resultat = browser_pool.run(lambda: _analyser_match(nom, url, har=har), timeout=CHECK_TIMEOUT)
+    except CheckDiffere as e:
+        if 'navigation' in e.phases:
+            # Reporté au moment de retenter une navigation ratée : cette tentative est une erreur du tier
+            enregistrer_tier('navigateur', 'erreur', time.monotonic() - debut)
+        # Sinon reporté avant toute navigation : ni erreur ni mesure pour le tier
+        e.phases = {**phases, **e.phases}
+        raise
+    except Exception:
+        enregistrer_tier('navigateur', 'erreur', time.monotonic() - debut)
+        raise
+    enregistrer_tier('navigateur', resultat['source'], time.monotonic() - debut)
+    resultat['phases'] = {**phases, **resultat['phases']}
+    return resultat
+
+# ====================
+# EMPREINTE DES OFFRES
+# ====================
+# La plupart des checks retombent sur exactement les mêmes offres que le précédent.
+# On compare une empreinte des offres pour ne refaire détection/alerte/status qu'en cas de changement.
+empreinte_par_match = {}
+derniers_changements = collections.deque(maxlen=50)
+
+def _cle_offre(offre):
+    prix = f"{offre['prix']:.2f}" if offre['prix'] is not None else '-'
+    return f"{offre['type']}|{prix}"
+
+def _empreinte(detail):
+    """Empreinte à partir des compteurs 'TYPE|prix' (seule partie gardée dans le snapshot à chaud)"""
+    detail = collections.Counter({cle: n for cle, n in detail.items() if n > 0})
+    types = collections.Counter()
+    for cle, n in detail.items():
+        types[cle.split('|', 1)[0]] += n
+    brut = json.dumps(sorted(detail.items()), ensure_ascii=False)
+    return {
+        'hash': hashlib.sha1(brut.encode('utf-8')).hexdigest()[:16],
+        'detail': detail,
+        'types': types,
+        'avec_prix': any(not cle.endswith('|-') for cle in detail)
+    }
+
+def calculer_empreinte(resultat):
+    """
+    Résume les offres disponibles d'un check en compteurs type/prix.
+    
+    Ni nom ni source, et une disponibilité inconnue compte comme disponible : seuls les
+    champs donnés par tous les tiers. La sonde HTTP n'a pas toujours les prix, d'où
+    'types', comparé quand l'un des deux checks n'en a pas.
+    """
+    return _empreinte(collections.Counter(_cle_offre(o) for o in resultat['offres'] if o['disponible'] is not False))
+
+def comparer_empreintes(precedente, nouvelle):
+    """
+    Retourne None si rien n'a changé, sinon un diff compact {'ajoutees': {...}, 'retirees': {...}}.
+    """
+    if precedente is None:
+        return {'ajoutees': dict(nouvelle['detail']), 'retirees': {}}
+    if precedente['avec_prix'] and nouvelle['avec_prix']:
+        if precedente['hash'] == nouvelle['hash']:
+            return None
+        avant, apres = precedente['detail'], nouvelle['detail']
+    else:
+        if precedente['types'] == nouvelle['types']:
+            return None
+        avant, apres = precedente['types'], nouvelle['types']
+    return {'ajoutees': dict(apres - avant), 'retirees': dict(avant - apres)}
+
+# ====================
+# MÉTRIQUES (FORMAT PROMETHEUS)
+# ====================
+# Histogrammes de latence par phase et par match, et compteurs de checks, exposés
+# sur /api/metrics. Implémentation minimale en mémoire, sans dépendance supplémentaire.
+METRICS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+METRICS_AIDE = {
+    'psm_check_phase_seconds': ('histogram', "Durée de chaque phase d'un check"),
+    'psm_check_duration_seconds': ('histogram', "Durée totale d'un check"),
+    'psm_checks_total': ('counter', "Checks effectués, par source et résultat"),
+    'psm_offres_changements_total': ('counter', "Checks dont les offres ont changé"),
+    'psm_pmr_disponibles': ('gauge', "Nombre d'offres PMR au dernier check"),
+    'psm_browser_launches_total': ('counter', "Lancements de Chromium"),
+    'psm_browser_recycles_total': ('counter', "Recyclages de Chromium"),
+    'psm_browser_rss_megabytes': ('gauge', "RSS de l'arbre Chromium au dernier échantillon"),
+    'psm_check_queue_pending': ('gauge', "Jobs en attente dans la file des vérifications"),
+}
+
+class Histogramme:
+    def __init__(self):
+        self.buckets = [0] * len(METRICS_BUCKETS)
+        self.somme = 0.0
+        self.total = 0
+    
+    def observer(self, valeur):
+        index = bisect.bisect_left(METRICS_BUCKETS, valeur)
+        if index < len(self.buckets):
+            self.buckets[index] += 1
+        self.somme += valeur
+        self.total += 1
+
+def _labels_prometheus(labels, extra=None):
+    paires = list(labels) + ([extra] if extra else [])
+    if not paires:
+        return ''
+    echapper = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{cle}="{echapper(valeur)}"' for cle, valeur in paires) + '}'
+
+class Metriques:
+    """Registre des métriques, alimenté par les threads de check"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}  # nom -> {labels triés: Histogramme | float}
+    
+    def _serie(self, nom, labels, defaut):
+        cle = tuple(sorted(labels.items()))
+        serie = self._series.setdefault(nom, {})
+        if cle not in serie:
+            serie[cle] = defaut()
+        return serie, cle
+    
+    def observer(self, nom, valeur, **labels):
+        with self._lock:
+            serie, cle = self._serie(nom, labels, Histogramme)
+            serie[cle].observer(valeur)
+    
+    def incrementer(self, nom, valeur=1, **labels):
+        with self._lock:
+            serie, cle = self._serie(nom, labels, float)
+            serie[cle] += valeur
+    
+    def fixer(self, nom, valeur, **labels):
+        with self._lock:
+            serie, cle = self._serie(nom, labels, float)
+            serie[cle] = float(valeur)
+    
+    def enregistrer_check(self, resultat):
+        """Ventile le résultat de verifier_match dans les métriques"""
+        nom = resultat['nom']
+        for phase, duree in resultat['phases'].items():
+            self.observer('psm_check_phase_seconds', duree, match=nom, phase=phase)
+        self.observer('psm_check_duration_seconds', resultat['duree'], match=nom)
+        self.incrementer('psm_checks_total', match=nom, source=resultat['source'] or 'aucune',
+                         resultat='erreur' if resultat['erreur'] else 'differe' if resultat['differe'] else 'ok')
+        if resultat['change']:
+            self.incrementer('psm_offres_changements_total', match=nom)
+        if resultat['nb_pmr'] is not None:
+            self.fixer('psm_pmr_disponibles', resultat['nb_pmr'], match=nom)
+    
+    def exporter(self):
+        """Texte au format d'exposition Prometheus 0.0.4"""
+        lignes = []
+        with self._lock:
+            for nom in sorted(self._series):
+                type_metrique, aide = METRICS_AIDE.get(nom, ('untyped', nom))
+                lignes.append(f"# HELP {nom} {aide}")
+                lignes.append(f"# TYPE {nom} {type_metrique}")
+                for cle, valeur in sorted(self._series[nom].items()):
+                    if isinstance(valeur, Histogramme):
+                        cumul = 0
+                        for borne, nb in zip(METRICS_BUCKETS, valeur.buckets):
+                            cumul += nb
+                            lignes.append(f"{nom}_bucket{_labels_prometheus(cle, ('le', borne))} {cumul}")
+                        lignes.append(f"{nom}_bucket{_labels_prometheus(cle, ('le', '+Inf'))} {valeur.total}")
+                        lignes.append(f"{nom}_sum{_labels_prometheus(cle)} {valeur.somme:.6f}")
+                        lignes.append(f"{nom}_count{_labels_prometheus(cle)} {valeur.total}")
+                    else:
+                        lignes.append(f"{nom}{_labels_prometheus(cle)} {valeur:g}")
+        return '\n'.join(lignes) + '\n'
+
+metriques = Metriques()
+
+def verifier_match(match):
+    """
+    Vérifie un match, met à jour les stats et envoie les alertes.
+    
+    Returns:
+        dict: {'nom', 'duree', 'nb_pmr' (None si erreur), 'source', 'erreur', 'change', 'phases'}
+    """
+    nom = match["nom"]
+    url = match["url"]
+    phases = {}
+    debut = time.monotonic()
+
+    if nom not in dernier_message_indispo:
+        dernier_message_indispo[nom] = datetime.now() - timedelta(hours=8)
+
+    try:
+        resultat = verifier_offres(nom, url, har=match.get('har'))
+        nb_pmr = resultat['nb_pmr']
+        phases.update(resultat['phases'])
+
+        heure = datetime.now().strftime("%H:%M:%S")
+
+        log(f"{nom} → PMR trouvées : {nb_pmr} (source: {resultat['source']}, {len(resultat['offres'])} offre(s) au total)", 'info')
+
+        diff = None
+        if not lease_manager.possede(nom):
+            # Match tenu par un autre worker (vérification forcée ici) : c'est lui qui enregistre et alerte.
+            # Ni empreinte ni ligne de status partagée, qu'on écraserait avec les compteurs de ce worker
+            log(f"{nom} → bail tenu par un autre worker, ni enregistrement ni alerte depuis {WORKER_ID}", 'info')
+        else:
+            # Comparer avec le check précédent
+            empreinte = calculer_empreinte(resultat)
+            precedente = empreinte_par_match.get(nom)
+            diff = comparer_empreintes(precedente, empreinte)
+            # L'alerte ne dépend que des PMR (un prix d'offre non PMR qui bouge ne réalerte pas)
+            pmr_change = precedente is None or precedente['types']['PMR'] != empreinte['types']['PMR']
+            empreinte_par_match[nom] = empreinte
+            if diff is not None:
+                derniers_changements.append({'match': nom, 'date': datetime.now().isoformat(), **diff})
+                log(f"🔀 Offres modifiées pour {nom}: +{diff['ajoutees']} -{diff['retirees']}", 'info')
+
+            # Mettre à jour les statistiques
+            nb_checks_par_match[nom] = nb_checks_par_match.get(nom, 0) + 1
+            dernier_check_par_match[nom] = datetime.now()
+            pmr_disponible_par_match[nom] = nb_pmr > 0
+            noter_resultat_rafale(nom, nb_pmr)
+            # Status (ligne du match + snapshot public) seulement si les offres ont changé, ou pour le rafraîchissement périodique
+            noter_status_match(nom, change=diff is not None)
+
+            if nb_pmr > 0 and not pmr_change:
+                log(f"{nom} → PMR inchangées depuis le dernier check (alerte déjà envoyée)", 'info')
+            elif nb_pmr > 0:
+                # Sauvegarder la détection et alerter seulement quand les offres changent
+                debut_phase = time.monotonic()
+                sauvegarder_detection(nom, nb_pmr)
+                phases['persistance'] = time.monotonic() - debut_phase
+                debut_phase = time.monotonic()
+                envoyer_message(f"🔥 ALERTE PLACE PMR DISPONIBLE ! 🔥\n\n🎟️ Match : {nom}\n✅ Places PMR trouvées !\n\n👉 Fonce sur la billetterie maintenant !")
+                phases['notification'] = time.monotonic() - debut_phase
+            else:
+                if datetime.now() - dernier_message_indispo[nom] >= timedelta(hours=8):
+                    debut_phase = time.monotonic()
+                    envoyer_message(f"😴 Pas encore de places PMR...\n\n🎟️ Match : {nom}\n❌ Aucune place PMR disponible pour le moment\n\n💪 On continue de surveiller pour toi !")
+                    phases['notification'] = time.monotonic() - debut_phase
+                    dernier_message_indispo[nom] = datetime.now()
+                else:
+                    log(f"{nom} → Pas de PMR (cooldown actif)", 'info')
+        resultat = {'nom': nom, 'duree': time.monotonic() - debut, 'nb_pmr': nb_pmr, 'source': resultat['source'],
+                    'erreur': None, 'change': diff is not None, 'phases': phases, 'differe': None}
+
+    except CheckDiffere as e:
+        log(f"🚦 {nom} → {e}", 'info')
+        phases.update(e.phases)
+        resultat = {'nom': nom, 'duree': time.monotonic() - debut, 'nb_pmr': None, 'source': None,
+                    'erreur': None, 'change': False, 'phases': phases, 'differe': e.attente}
+
+    except Exception as e:
+        log(f"⚠️ Erreur sur {nom} : {e}", 'error')
+        import traceback
+        log(f"📋 Détails de l'erreur :", 'error')
+        traceback.print_exc()
+        resultat = {'nom': nom, 'duree': time.monotonic() - debut, 'nb_pmr': None, 'source': None,
+                    'erreur': str(e), 'change': False, 'phases': phases, 'differe': None}
+    
+    metriques.enregistrer_check(resultat)
+    trace.evenement('check', TRACE_WARNING if resultat['erreur'] else TRACE_INFO, **resultat)
+    return resultat
+
+# ====================
+# FILE DES VÉRIFICATIONS
+# ====================
+# Toutes les vérifications (boucle et vérifications forcées depuis l'admin) passent par
+# une seule file servie par CHECK_CONCURRENCY workers : jamais plus de pages ouvertes que
+# prévu, et un même match n'est jamais vérifié deux fois en même temps.
+PRIORITE_FORCEE = 0     # Demandée depuis l'admin : passe devant
+PRIORITE_PLANIFIEE = 1  # Échéance du scheduler
+CHECK_JOBS_HISTORY = 200  # Jobs terminés consultables via /api/checks/<job_id>
+
+class CheckJob:
+    """Une vérification de match demandée, de sa mise en file à son résultat"""
+    
+    def __init__(self, match, priorite):
+        self.id = uuid.uuid4().hex[:12]
+        self.match = match
+        self.nom = match.get('nom', 'Match inconnu')
+        self.priorite = priorite
+        # Forcée depuis l'admin, à la création ou par une demande fusionnée (même en cours)
+        self.forcee = priorite == PRIORITE_FORCEE
+        self.etat = 'en_attente'  # en_attente -> en_cours -> termine | erreur
+        self.coalescences = 0
+        self.rappels = []  # Appelés avec le job une fois terminé (replanification du match...)
+        self.cree_le = datetime.now()
+        self.debut = None
+        self.fin = None
+        self.resultat = None
+        self.termine = threading.Event()
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'match': self.nom,
+            'etat': self.etat,
+            'priorite': 'forcee' if self.forcee else 'planifiee',
+            'coalescences': self.coalescences,
+            'cree_le': self.cree_le.isoformat(timespec='seconds'),
+            'debut': self.debut.isoformat(timespec='seconds') if self.debut else None,
+            'fin': self.fin.isoformat(timespec='seconds') if self.fin else None,
+            'resultat': self.resultat
+        }
+
+class CheckJobQueue:
+    """File de priorité des vérifications, avec fusion des demandes sur un même match"""
+    
+    def __init__(self, nb_workers):
+        self.nb_workers = nb_workers
+        self._cond = threading.Condition()
+        self._heap = []  # (priorite, seq, job) ; entrées périmées ignorées au dépilage
+        self._seq = itertools.count()
+        self._actifs = {}  # nom du match -> job en attente ou en cours
+        self._jobs = collections.OrderedDict()  # id -> job, historique borné
+        self._workers = []
+    
+    def soumettre(self, match, priorite=PRIORITE_PLANIFIEE, rappel=None):
+        """
+        Met un match en file, ou rejoint le job déjà en attente/en cours pour ce match.
+        
+        Args:
+            rappel: Appelé avec le job quand il est terminé (depuis le thread du worker)
+        
+        Returns:
+            tuple: (job, fusionne) - fusionne=True si la demande a rejoint un job existant
+        """
+        nom = match.get('nom', 'Match inconnu')
+        with self._cond:
+            self._demarrer_workers()
+            job = self._actifs.get(nom)
+            if job is not None:
+                job.coalescences += 1
+                if rappel is not None:
+                    job.rappels.append(rappel)
+                if priorite == PRIORITE_FORCEE:
+                    job.forcee = True  # Honoré à la fin du job, même s'il tournait déjà
+                if job.etat == 'en_attente' and priorite < job.priorite:
+                    # Remonter le job : la nouvelle entrée passe devant, l'ancienne sera ignorée
+                    job.priorite = priorite
+                    heapq.heappush(self._heap, (priorite, next(self._seq), job))
+                    self._cond.notify()
+                return job, True
+            
+            job = CheckJob(match, priorite)
+            if rappel is not None:
+                job.rappels.append(rappel)
+            self._actifs[nom] = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > CHECK_JOBS_HISTORY:
+                ancien_id, ancien = next(iter(self._jobs.items()))
+                if not ancien.termine.is_set():
+                    break  # Ne jamais oublier un job encore attendu
+                del self._jobs[ancien_id]
+            heapq.heappush(self._heap, (priorite, next(self._seq), job))
+            self._cond.notify()
+            return job, False
+    
+    def job(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+    
+    def resume(self):
+        with self._cond:
+            return {
+                'workers': self.nb_workers,
+                'en_attente': sum(1 for j in self._actifs.values() if j.etat == 'en_attente'),
+                'en_cours': sorted(j.nom for j in self._actifs.values() if j.etat == 'en_cours')
+            }
+    
+    def _demarrer_workers(self):
+        while len(self._workers) < self.nb_workers:
+            worker = threading.Thread(target=self._boucle_worker, name=f'check-{len(self._workers)}', daemon=True)
+            self._workers.append(worker)
+            worker.start()
+    
+    def _prochain_job(self):
+        with self._cond:
+            while True:
+                while self._heap:
+                    priorite, _, job = heapq.heappop(self._heap)
+                    if job.etat == 'en_attente' and priorite == job.priorite:
+                        job.etat = 'en_cours'
+                        job.debut = datetime.now()
+                        return job
+                self._cond.wait()
+    
+    def _boucle_worker(self):
+        while True:
+            job = self._prochain_job()
+            try:
+                if job.forcee:
+                    log(f"🔄 Vérification forcée de {job.nom}...", 'info')
+                resultat = verifier_match(job.match)
+                etat = 'erreur' if resultat['erreur'] else 'differe' if resultat['differe'] else 'termine'
+                if job.forcee:
+                    log(f"✅ Vérification forcée de {job.nom} terminée", 'success')
+            except Exception as e:
+                log(f"⚠️ Job {job.id} ({job.nom}) en échec: {e}", 'error')
+                resultat = {'nom': job.nom, 'duree': 0.0, 'nb_pmr': None, 'source': None,
+                            'erreur': str(e), 'change': False, 'phases': {}, 'differe': None}
+                etat = 'erreur'
+            with self._cond:
+                job.resultat = resultat
+                job.etat = etat
+                job.fin = datetime.now()
+                self._actifs.pop(job.nom, None)
+            job.termine.set()
+            for rappel in job.rappels:
+                try:
+                    rappel(job)
+                except Exception as e:
+                    log(f"⚠️ Erreur après le job {job.id} ({job.nom}): {e}", 'error')
+
+check_queue = CheckJobQueue(CHECK_CONCURRENCY)
+
+# ====================
+# PLANIFICATION ADAPTATIVE PAR MATCH
+# ====================
+# Chaque match a sa propre échéance : rarement vérifié s'il est dans plusieurs semaines,
+# souvent à l'approche du coup d'envoi ou quand des places PMR viennent d'apparaître.
+POLL_DEFAULT_INTERVAL = int(os.getenv("POLL_DEFAULT_INTERVAL", "90"))  # Match sans date connue
+POLL_MIN_INTERVAL = int(os.getenv("POLL_MIN_INTERVAL", "30"))
+POLL_MAX_INTERVAL = int(os.getenv("POLL_MAX_INTERVAL", "3600"))
+POLL_ACTIVE_INTERVAL = int(os.getenv("POLL_ACTIVE_INTERVAL", "45"))  # Activité PMR récente
+POLL_RECENT_ACTIVITY_HOURS = 6
+POLL_RESYNC_INTERVAL = 600  # Relecture de sécurité des matchs depuis SQLite (le registre est tenu à jour par l'API)
+POLL_JITTER = 5
+# (heures avant le coup d'envoi, intervalle en secondes), du plus proche au plus lointain
+POLL_HORIZONS = [(24, 60), (72, 180), (14 * 24, 600)]
+POLL_FAR_INTERVAL = 1800  # Au-delà du dernier horizon
+POLL_FINISHED_AFTER_HOURS = 3  # Match considéré comme terminé 3h après le coup d'envoi
+
+# Dernières issues (True = erreur) par match, pour ralentir sur un match qui plante
+historique_erreurs_par_match = {}
+
+# Mode rafale : les remises en vente PMR durent parfois quelques minutes. Quand des PMR
+# apparaissent (ou que leur nombre change), le match est revérifié toutes les
+# POLL_BURST_INTERVAL secondes pendant POLL_BURST_WINDOW, puis l'intervalle double toutes
+# les POLL_BURST_DOUBLING secondes jusqu'à retrouver l'intervalle normal.
+POLL_BURST_INTERVAL = int(os.getenv("POLL_BURST_INTERVAL", "15"))
+POLL_BURST_WINDOW = int(os.getenv("POLL_BURST_WINDOW", "600"))
+POLL_BURST_DOUBLING = int(os.getenv("POLL_BURST_DOUBLING", "300"))
+
+rafales_par_match = {}  # nom -> début de la rafale en cours
+echeances_a_revoir = set()  # Matchs dont l'échéance doit être recalculée (rafale, calendrier modifié)
+dernier_nb_pmr_par_match = {}
+reveil_surveillance = threading.Event()  # Réveille la boucle avant la fin de sa pause
+
+def noter_resultat_rafale(nom, nb_pmr):
+    """Démarre une rafale si des PMR apparaissent ou si leur nombre change. Retourne True si c'est le cas."""
+    precedent = dernier_nb_pmr_par_match.get(nom)
+    dernier_nb_pmr_par_match[nom] = nb_pmr
+    if nb_pmr == precedent or (precedent is None and nb_pmr == 0):
+        return False
+    rafales_par_match[nom] = datetime.now()
+    echeances_a_revoir.add(nom)
+    log(f"⚡ {nom}: PMR {precedent if precedent is not None else '?'} → {nb_pmr}, mode rafale ({POLL_BURST_INTERVAL}s pendant {POLL_BURST_WINDOW}s)", 'info')
+    reveil_surveillance.set()
+    return True
+
+def intervalle_rafale(nom, maintenant):
+    """Intervalle imposé par la rafale en cours (None si pas de rafale)"""
+    debut = rafales_par_match.get(nom)
+    if debut is None:
+        return None
+    ecoule = (maintenant - debut).total_seconds()
+    if ecoule <= POLL_BURST_WINDOW:
+        return POLL_BURST_INTERVAL
+    return POLL_BURST_INTERVAL * 2 ** ((ecoule - POLL_BURST_WINDOW) / POLL_BURST_DOUBLING)
+
+# Calendrier des ventes : les ouvertures connues (prévente membres, vente générale,
+# ouverture de la revente) sont saisies dans l'admin. Le match est vérifié souvent juste
+# avant et pendant ces fenêtres, et laissé au ralenti entre deux fenêtres à venir.
+SALE_WINDOW_TYPES = ('prevente_membres', 'vente_generale', 'revente', 'autre')
+SALE_RAMP_MINUTES = int(os.getenv("SALE_RAMP_MINUTES", "30"))  # Montée en cadence avant l'ouverture
+SALE_RAMP_INTERVAL = int(os.getenv("SALE_RAMP_INTERVAL", "60"))
+SALE_OPEN_INTERVAL = int(os.getenv("SALE_OPEN_INTERVAL", "20"))
+SALE_IDLE_INTERVAL = int(os.getenv("SALE_IDLE_INTERVAL", "900"))  # Entre deux fenêtres connues
+
+def lire_date_locale(iso):
+    """datetime.fromisoformat, ramené en heure locale naïve (…Z ou …+01:00 acceptés, comparables à datetime.now())"""
+    dt = datetime.fromisoformat(iso)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt
+
+class CalendrierVentes:
+    """Timeline précalculée des segments (rampe, vente) par match, reconstruite après chaque modification"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timelines = None  # nom -> [(debut, fin, phase, intervalle)] trié par début
+    
+    def invalider(self, nom=None):
+        with self._lock:
+            self._timelines = None
+        if nom is not None:
+            echeances_a_revoir.add(nom)
+            reveil_surveillance.set()
+    
+    def _construire(self):
+        timelines = {}
+        for fenetre in load_sale_windows_from_db():
+            try:
+                debut = lire_date_locale(fenetre['debut'])
+                fin = lire_date_locale(fenetre['fin'])
+            except ValueError:
+                continue
+            segments = timelines.setdefault(fenetre['match'], [])
+            segments.append((debut - timedelta(minutes=SALE_RAMP_MINUTES), debut, 'rampe', SALE_RAMP_INTERVAL))
+            segments.append((debut, fin, 'vente', SALE_OPEN_INTERVAL))
+        for segments in timelines.values():
+            segments.sort()
+        return timelines
+    
+    def timeline(self, nom):
+        with self._lock:
+            if self._timelines is None:
+                self._timelines = self._construire()
+            return self._timelines.get(nom, [])
+    
+    def situation(self, nom, maintenant):
+        """
+        Returns:
+            tuple: (intervalle imposé ou None, secondes avant le prochain segment ou None, fenêtre à venir)
+        """
+        intervalle = None
+        prochain = None
+        for debut, fin, _, intervalle_segment in self.timeline(nom):
+            if debut <= maintenant < fin:
+                intervalle = min(intervalle or intervalle_segment, intervalle_segment)
+            elif debut > maintenant:
+                attente = (debut - maintenant).total_seconds()
+                prochain = attente if prochain is None else min(prochain, attente)
+        return intervalle, prochain, prochain is not None
+
+calendrier_ventes = CalendrierVentes()
+
+def coup_envoi_match(match):
+    """Retourne le datetime du coup d'envoi à partir des colonnes date/time, ou None"""
+    if not match.get('date'):
+        return None
+    try:
+        return datetime.strptime(f"{match['date']} {match.get('time') or '21:00'}", '%Y-%m-%d %H:%M')
+    except ValueError:
+        return None
+
+def activite_pmr_recente(nom, maintenant):
+    """True si des PMR sont disponibles ou ont été détectées dans les dernières heures"""
+    if pmr_disponible_par_match.get(nom):
+        return True
+    derniere = load_last_detection_date(nom)
+    if not derniere:
+        return False
+    try:
+        return maintenant - datetime.fromisoformat(derniere) < timedelta(hours=POLL_RECENT_ACTIVITY_HOURS)
+    except ValueError:
+        return False
+
+def calculer_intervalle(match, maintenant=None):
+    """
+    Calcule le délai avant la prochaine vérification d'un match (en secondes).
+    
+    - Base selon la distance au coup d'envoi (POLL_HORIZONS)
+    - Accéléré à POLL_ACTIVE_INTERVAL si activité PMR récente
+    - Ralenti jusqu'à x3 selon le taux d'erreur récent
+    - Fixé par le calendrier des ventes autour des fenêtres connues, ralenti entre deux fenêtres à venir
+    - Raccourci (sous POLL_MIN_INTERVAL) pendant une rafale, qui s'éteint en rejoignant l'intervalle normal
+    - Jamais au-delà du début du prochain segment du calendrier
+    """
+    maintenant = maintenant or datetime.now()
+    nom = match['nom']
+    coup_envoi = coup_envoi_match(match)
+    
+    if coup_envoi is None:
+        intervalle = POLL_DEFAULT_INTERVAL
     else:
-        taux_disponibilite = 0.0
+        heures_restantes = (coup_envoi - maintenant).total_seconds() / 3600
+        if heures_restantes < -POLL_FINISHED_AFTER_HOURS:
+            intervalle = POLL_MAX_INTERVAL
+        else:
+            intervalle = next((i for h, i in POLL_HORIZONS if heures_restantes <= h), POLL_FAR_INTERVAL)
     
-    # Ajouter les statistiques globales
-    status["statistiques"] = {
-        "verifications_totales": total_checks,
-        "alertes_envoyees": alertes_envoyees,
-        "taux_disponibilite": f"{taux_disponibilite}%",
-        "matchs_surveilles": nb_matchs
-    }
+    plancher = POLL_MIN_INTERVAL
+    intervalle_vente, avant_segment, fenetre_a_venir = calendrier_ventes.situation(nom, maintenant)
+    if intervalle_vente is not None:
+        intervalle = intervalle_vente
+        plancher = min(plancher, intervalle_vente)
+    elif fenetre_a_venir:
+        intervalle = max(intervalle, SALE_IDLE_INTERVAL)
     
-    # Sauvegarder dans SQLite
-    save_status_to_db(status)
+    if activite_pmr_recente(nom, maintenant):
+        intervalle = min(intervalle, POLL_ACTIVE_INTERVAL)
     
-    # Sauvegarder aussi dans le fichier local (backup) - l'original n'a pas été modifié
-    import os
-    status_path = STATUS_FILE
-    with open(status_path, 'w', encoding='utf-8') as f:
-        json.dump(status, f, ensure_ascii=False, indent=2)
-    abs_path = os.path.abspath(status_path)
-    print(f"💾 status.json sauvegardé dans: {abs_path}")
-    log(f"📂 status.json sauvegardé: {abs_path}", 'info')
-
-def verifier_match(match):
-    nom = match["nom"]
-    url = match["url"]
+    erreurs = historique_erreurs_par_match.get(nom)
+    if erreurs:
+        taux_erreur = sum(erreurs) / len(erreurs)
+        intervalle *= 1 + 2 * taux_erreur
+    
+    intervalle = max(plancher, min(POLL_MAX_INTERVAL, intervalle))
+    
+    rafale = intervalle_rafale(nom, maintenant)
+    if rafale is not None:
+        if rafale < intervalle:
+            intervalle = rafale
+        else:
+            del rafales_par_match[nom]
+            log(f"⚡ {nom}: fin du mode rafale", 'info')
+    
+    if avant_segment is not None:
+        intervalle = min(intervalle, max(1.0, avant_segment))
+    return intervalle
 
-    if nom not in dernier_message_indispo:
-        dernier_message_indispo[nom] = datetime.now() - timedelta(hours=8)
+class MatchScheduler:
+    """File de priorité des matchs, triée par prochaine échéance"""
+    
+    def __init__(self):
+        # replanifier() est appelé depuis les workers de la file, à la fin de chaque job
+        self._lock = threading.RLock()
+        self._heap = []
+        self._echeances = {}  # nom -> échéance courante (les entrées du heap qui ne correspondent plus sont ignorées)
+        self._matchs = {}
+        self._en_cours = set()  # Matchs sortis de la file, replanifiés à la fin de leur check
+        self._seq = 0
+        self._restaurees = {}  # Échéances du snapshot de démarrage à chaud, consommées par synchroniser()
+    
+    def restaurer(self, echeances):
+        with self._lock:
+            self._restaurees = dict(echeances)
+    
+    def echeances(self):
+        with self._lock:
+            return dict(self._echeances)
+    
+    def _planifier(self, nom, echeance):
+        self._echeances[nom] = echeance
+        self._seq += 1
+        heapq.heappush(self._heap, (echeance, self._seq, nom))
+    
+    def _intervalle(self, match):
+        try:
+            return calculer_intervalle(match)
+        except Exception as e:
+            # Le match reste planifié même si son calendrier est inexploitable
+            log(f"⚠️ Erreur calcul d'intervalle pour {match['nom']}: {e}", 'error')
+            return POLL_DEFAULT_INTERVAL
+    
+    def synchroniser(self, matchs):
+        """Ajoute les nouveaux matchs (à vérifier tout de suite) et oublie les matchs supprimés"""
+        with self._lock:
+            noms = set()
+            for match in matchs:
+                nom = match['nom']
+                noms.add(nom)
+                self._matchs[nom] = match
+                if nom not in self._echeances:
+                    self._planifier(nom, self._restaurees.pop(nom, time.time()))
+            for nom in list(self._echeances):
+                if nom not in noms:
+                    del self._echeances[nom]
+                    self._matchs.pop(nom, None)
+                    self._en_cours.discard(nom)
+            # Rafale démarrée hors de la boucle (vérification forcée) ou calendrier de vente modifié :
+            # rapprocher l'échéance si le nouvel intervalle le demande
+            while echeances_a_revoir:
+                nom = echeances_a_revoir.pop()
+                if nom not in self._echeances or nom in self._en_cours:
+                    continue  # Un match en cours de check sera replanifié à la fin de celui-ci
+                limite = time.time() + self._intervalle(self._matchs[nom])
+                if self._echeances[nom] > limite:
+                    self._planifier(nom, limite)
+    
+    def matchs_dus(self, maintenant=None):
+        """Retire de la file et retourne les matchs dont l'échéance est passée"""
+        with self._lock:
+            maintenant = maintenant or time.time()
+            dus = []
+            while self._heap and self._heap[0][0] <= maintenant:
+                echeance, _, nom = heapq.heappop(self._heap)
+                if self._echeances.get(nom) == echeance and nom not in self._en_cours:
+                    self._en_cours.add(nom)
+                    dus.append(self._matchs[nom])
+            return dus
+    
+    def replanifier(self, match, resultat):
+        """Replace un match dans la file après sa vérification"""
+        with self._lock:
+            nom = match['nom']
+            self._en_cours.discard(nom)
+            if nom not in self._echeances:
+                return  # Supprimé pendant la vérification
+            if resultat.get('differe'):
+                # Hôte limité : revenir quand le jeton sera disponible, sans compter d'erreur
+                intervalle = resultat['differe'] + random.randint(0, POLL_JITTER)
+                self._planifier(nom, time.time() + intervalle)
+                log(f"🗓️ {nom}: reporté, prochaine vérification dans {int(intervalle)}s", 'info')
+                return
+            historique_erreurs_par_match.setdefault(nom, collections.deque(maxlen=10)).append(resultat['erreur'] is not None)
+            intervalle = self._intervalle(match) + random.randint(0, POLL_JITTER)
+            self._planifier(nom, time.time() + intervalle)
+            log(f"🗓️ {nom}: prochaine vérification dans {int(intervalle)}s", 'info')
+    
+    def en_cours(self):
+        with self._lock:
+            return len(self._en_cours)
+    
+    def attente(self):
+        """Secondes avant la prochaine échéance (None si la file est vide)"""
+        with self._lock:
+            while self._heap and (self._echeances.get(self._heap[0][2]) != self._heap[0][0]
+                                  or self._heap[0][2] in self._en_cours):
+                heapq.heappop(self._heap)  # Purger les entrées obsolètes
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - time.time())
 
-    try:
-        with sync_playwright() as p:
-            # Configuration pour Docker/headless
-            browser = p.chromium.launch(
-                headless=True,
-                args=[
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-gpu',
-                    '--disable-software-rasterizer',
-                    '--disable-extensions',
-                    '--window-size=1920x1080',
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-features=IsolateOrigins,site-per-process',
-                    '--single-process',
-                    '--no-zygote'
-                ],
-                timeout=60000
-            )
-            
-            context = browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
-            
-            page = context.new_page()
-            
-            # Configuration des timeouts plus longs
-            page.set_default_timeout(120000)  # 120 secondes pour toutes les opérations
-            page.set_default_navigation_timeout(120000)
+match_scheduler = MatchScheduler()
 
-            log(f"🌐 Chargement de {nom}...", 'info')
-            try:
-                page.goto(url, timeout=120000, wait_until="domcontentloaded")
-                log(f"✅ Page chargée pour {nom}", 'success')
-            except Exception as goto_error:
-                log(f"⚠️ Erreur lors du chargement de la page pour {nom}: {goto_error}", 'warning')
-                log(f"🔄 Nouvelle tentative...", 'info')
-                page.goto(url, timeout=120000, wait_until="domcontentloaded")
-                log(f"✅ Page chargée pour {nom} (2ème tentative)", 'success')
-            
-            # Attendre BEAUCOUP plus longtemps que le contenu se charge
-            log(f"⏳ Attente du chargement complet...", 'info')
-            page.wait_for_timeout(10000)  # 10 secondes au lieu de 4
-            
-            # Scroll AVANT de chercher les éléments
-            log(f"📜 Scroll de la page...", 'info')
-            for i in range(5):  # Plus de scrolls
-                page.mouse.wheel(0, 1500)
-                page.wait_for_timeout(2000)  # Plus de temps entre chaque scroll
-            
-            # Attendre encore après le scroll
-            page.wait_for_timeout(5000)
-            
-            # Essayer de cliquer sur un bouton si présent (pour déclencher le chargement)
-            try:
-                page.wait_for_selector('button, .button, [role="button"]', timeout=5000)
-            except:
-                pass
+# ====================
+# DÉMARRAGE À CHAUD
+# ====================
+# La machine Fly s'arrête dès qu'elle n'a plus de trafic : on garde sur le volume les
+# compteurs, empreintes et échéances pour reprendre là où on en était au redémarrage.
+WARM_STATE_FILE = os.path.join(DATA_DIR, 'warm_state.json')
+WARM_STATE_INTERVAL = 60  # Snapshot au plus toutes les 60 s pendant que des checks se terminent
+etat_chaud_modifie = threading.Event()
 
-            heure = datetime.now().strftime("%H:%M:%S")
+def _dates_iso(d):
+    return {nom: dt.isoformat() for nom, dt in d.items()}
 
-            pmr_elements = page.query_selector_all('div[data-offer-type="PMR"]')
-            log(f"{nom} → PMR trouvées : {len(pmr_elements)}", 'info')
+def _dates_depuis_iso(d):
+    return {nom: datetime.fromisoformat(iso) for nom, iso in d.items()}
 
-            # Sauvegarder la détection si des PMR sont trouvées
-            if len(pmr_elements) > 0:
-                sauvegarder_detection(nom, len(pmr_elements))
+def sauvegarder_etat_chaud():
+    """Écrit le snapshot de l'état en mémoire (écriture atomique)"""
+    etat = {
+        'version': 1,
+        'sauvegarde_le': datetime.now().isoformat(),
+        'nb_checks_par_match': dict(nb_checks_par_match),
+        'dernier_check_par_match': _dates_iso(dict(dernier_check_par_match)),
+        'pmr_disponible_par_match': dict(pmr_disponible_par_match),
+        'dernier_message_indispo': _dates_iso(dict(dernier_message_indispo)),
+        'dernier_nb_pmr_par_match': dict(dernier_nb_pmr_par_match),
+        'rafales_par_match': _dates_iso(dict(rafales_par_match)),
+        'http_concluants_consecutifs': dict(http_concluants_consecutifs),
+        'historique_erreurs_par_match': {nom: list(h) for nom, h in list(historique_erreurs_par_match.items())},
+        'empreinte_par_match': {nom: dict(e['detail']) for nom, e in list(empreinte_par_match.items())},
+        'echeances': match_scheduler.echeances()
+    }
+    try:
+        temporaire = WARM_STATE_FILE + '.tmp'
+        with open(temporaire, 'w', encoding='utf-8') as f:
+            json.dump(etat, f, ensure_ascii=False)
+        os.replace(temporaire, WARM_STATE_FILE)
+    except Exception as e:
+        log(f"⚠️ Erreur sauvegarde de l'état de démarrage à chaud: {e}", 'warning')
 
-            # Mettre à jour les statistiques
-            nb_checks_par_match[nom] = nb_checks_par_match.get(nom, 0) + 1
-            dernier_check_par_match[nom] = datetime.now()
-            pmr_disponible_par_match[nom] = len(pmr_elements) > 0
+def restaurer_etat_chaud():
+    """Recharge le snapshot au démarrage. Retourne True si un état a été restauré."""
+    try:
+        with open(WARM_STATE_FILE, 'r', encoding='utf-8') as f:
+            etat = json.load(f)
+        nb_checks_par_match.update(etat.get('nb_checks_par_match', {}))
+        dernier_check_par_match.update(_dates_depuis_iso(etat.get('dernier_check_par_match', {})))
+        pmr_disponible_par_match.update(etat.get('pmr_disponible_par_match', {}))
+        dernier_message_indispo.update(_dates_depuis_iso(etat.get('dernier_message_indispo', {})))
+        dernier_nb_pmr_par_match.update(etat.get('dernier_nb_pmr_par_match', {}))
+        rafales_par_match.update(_dates_depuis_iso(etat.get('rafales_par_match', {})))
+        http_concluants_consecutifs.update(etat.get('http_concluants_consecutifs', {}))
+        for nom, historique in etat.get('historique_erreurs_par_match', {}).items():
+            historique_erreurs_par_match[nom] = collections.deque(historique, maxlen=10)
+        for nom, detail in etat.get('empreinte_par_match', {}).items():
+            empreinte_par_match[nom] = _empreinte(detail)
+        match_scheduler.restaurer(etat.get('echeances', {}))
+        log(f"♨️ État restauré depuis le snapshot du {etat.get('sauvegarde_le')} ({len(etat.get('nb_checks_par_match', {}))} match(s))", 'success')
+        return True
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        log(f"⚠️ Snapshot de démarrage à chaud illisible, démarrage à froid: {e}", 'warning')
+        return False
 
-            if len(pmr_elements) > 0:
-                envoyer_message(f"🔥 ALERTE PLACE PMR DISPONIBLE ! 🔥\n\n🎟️ Match : {nom}\n✅ Places PMR trouvées !\n\n👉 Fonce sur la billetterie maintenant !")
-            else:
-                if datetime.now() - dernier_message_indispo[nom] >= timedelta(hours=8):
-                    envoyer_message(f"😴 Pas encore de places PMR...\n\n🎟️ Match : {nom}\n❌ Aucune place PMR disponible pour le moment\n\n💪 On continue de surveiller pour toi !")
-                    dernier_message_indispo[nom] = datetime.now()
-                else:
-                    log(f"{nom} → Pas de PMR (cooldown actif)", 'info')
+restaurer_etat_chaud()
+atexit.register(sauvegarder_etat_chaud)
 
-            # Sauvegarder le status avant de fermer
-            sauvegarder_status()
+# ====================
+# RÉPARTITION ENTRE WORKERS (BAUX SQLITE)
+# ====================
+# Plusieurs process peuvent se partager les matchs : chacun prend des baux (propriétaire,
+# expiration) dans match_leases, renouvelés à chaque battement. Un match n'est vérifié
+# que par le titulaire de son bail, et seul lui envoie les alertes Telegram. Si un worker
+# meurt, ses baux expirent et les autres les reprennent. Les process doivent partager le
+# même fichier SQLite (même machine/volume, ou base répliquée type LiteFS).
+LEASES_ENABLED = os.getenv("LEASES_ENABLED", "0") == "1"
+WORKER_ID = os.getenv("FLY_MACHINE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+LEASE_TTL = int(os.getenv("LEASE_TTL", "120"))  # Secondes sans renouvellement avant reprise par un autre
+LEASE_HEARTBEAT = int(os.getenv("LEASE_HEARTBEAT", "30"))
 
-            context.close()
-            browser.close()
+class LeaseManager:
+    """Baux des matchs tenus par ce worker, avec partage équitable entre workers vivants"""
+    
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self._baux = {}  # nom -> expiration (timestamp)
+        self._workers_vivants = 1
+        self._thread = None
+    
+    def possede(self, nom):
+        """True si ce worker doit vérifier/alerter pour ce match (toujours True sans baux)"""
+        if not LEASES_ENABLED:
+            return True
+        return self._baux.get(nom, 0) > time.time()
+    
+    def filtrer(self, matchs):
+        return [m for m in matchs if self.possede(m['nom'])]
+    
+    def _battement(self, conn, noms):
+        maintenant = time.time()
+        expiration = maintenant + LEASE_TTL
+        cursor = conn.cursor()
+        cursor.execute('INSERT INTO workers (id, seen_at) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET seen_at = excluded.seen_at',
+                       (self.worker_id, maintenant))
+        cursor.execute('DELETE FROM workers WHERE seen_at < ?', (maintenant - 10 * LEASE_TTL,))
+        cursor.execute('SELECT COUNT(*) FROM workers WHERE seen_at >= ?', (maintenant - LEASE_TTL,))
+        workers_vivants = max(1, cursor.fetchone()[0])
+        quota = math.ceil(len(noms) / workers_vivants)
+        
+        # Renouveler nos baux, lâcher ceux des matchs supprimés
+        cursor.execute('UPDATE match_leases SET expires_at = ? WHERE owner = ? AND expires_at >= ?',
+                       (expiration, self.worker_id, maintenant))
+        cursor.execute('SELECT match FROM match_leases WHERE owner = ? AND expires_at >= ?', (self.worker_id, maintenant))
+        tenus = [row[0] for row in cursor.fetchall()]
+        for nom in [n for n in tenus if n not in noms]:
+            cursor.execute('DELETE FROM match_leases WHERE match = ? AND owner = ?', (nom, self.worker_id))
+        tenus = [n for n in tenus if n in noms]
+        
+        # Un worker vient d'arriver : rendre l'excédent pour qu'il le prenne
+        while len(tenus) > quota:
+            cursor.execute('DELETE FROM match_leases WHERE match = ? AND owner = ?', (tenus.pop(), self.worker_id))
+        
+        # Prendre les matchs libres ou expirés jusqu'au quota (l'UPSERT conditionnel est atomique)
+        for nom in sorted(noms):
+            if len(tenus) >= quota:
+                break
+            if nom in tenus:
+                continue
+            cursor.execute('''
+                INSERT INTO match_leases (match, owner, expires_at, acquired_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(match) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at,
+                    acquired_at = excluded.acquired_at
+                WHERE match_leases.expires_at < ?
+            ''', (nom, self.worker_id, expiration, maintenant, maintenant))
+            if cursor.rowcount:
+                tenus.append(nom)
+        conn.commit()
+        return {nom: expiration for nom in tenus}, workers_vivants
+    
+    def battement(self):
+        """Renouvelle/prend/rend les baux selon la part équitable de ce worker"""
+        noms = {m['nom'] for m in match_registry.lister()}
+        baux, workers_vivants = execute_write(self._battement, noms)
+        if set(baux) != set(self._baux) or workers_vivants != self._workers_vivants:
+            log(f"🤝 Worker {self.worker_id}: {len(baux)}/{len(noms)} match(s) ({workers_vivants} worker(s) actif(s))", 'info')
+            reveil_surveillance.set()
+        self._baux = baux
+        self._workers_vivants = workers_vivants
+    
+    def liberer(self):
+        """Rend tous les baux (arrêt propre) pour une reprise immédiate par les autres"""
+        if not LEASES_ENABLED or not self._baux:
+            return
+        def _liberer(conn):
+            conn.execute('DELETE FROM match_leases WHERE owner = ?', (self.worker_id,))
+            conn.execute('DELETE FROM workers WHERE id = ?', (self.worker_id,))
+            conn.commit()
+        try:
+            execute_write(_liberer)
+        except Exception as e:
+            log(f"⚠️ Erreur libération des baux: {e}", 'warning')
+        self._baux = {}
+    
+    def _boucle(self):
+        while True:
+            time.sleep(LEASE_HEARTBEAT)
+            try:
+                self.battement()
+            except Exception as e:
+                # Sans renouvellement, nos baux expirent d'eux-mêmes et possede() devient False
+                log(f"⚠️ Erreur battement des baux: {e}", 'warning')
+    
+    def demarrer(self):
+        if not LEASES_ENABLED or self._thread is not None:
+            return
+        self.battement()
+        self._thread = threading.Thread(target=self._boucle, name='leases', daemon=True)
+        self._thread.start()
+        match_registry.abonner(lambda version: threading.Thread(target=self.battement, daemon=True).start())
+        atexit.register(self.liberer)
+    
+    def resume(self):
+        return {
+            'actif': LEASES_ENABLED,
+            'worker': self.worker_id,
+            'workers_actifs': self._workers_vivants,
+            'matchs': sorted(nom for nom in self._baux if self.possede(nom))
+        }
 
-    except Exception as e:
-        log(f"⚠️ Erreur sur {nom} : {e}", 'error')
-        import traceback
-        log(f"📋 Détails de l'erreur :", 'error')
-        traceback.print_exc()
-        # Sauvegarder le status même en cas d'erreur
-        sauvegarder_status()
+lease_manager = LeaseManager(WORKER_ID)
 
 # Créer le fichier status.json initial
 sauvegarder_status()
@@ -1411,8 +4248,10 @@ CORS(app, resources={r"/api/*": {"origins": "*", "supports_credentials": False}}
 
 @app.route('/api/status', methods=['GET'])
 def api_get_status():
-    """Retourne le statut complet du bot depuis status.json"""
+    """Retourne le statut complet du bot (dernier snapshot, sinon status.json)"""
     try:
+        if status_courant is not None:
+            return jsonify(status_courant)
         with open(STATUS_FILE, 'r', encoding='utf-8') as f:
             data = json.load(f)
         return jsonify(data)
@@ -1425,9 +4264,7 @@ def api_get_status():
 def api_get_matches():
     """Liste tous les matchs surveillés"""
     try:
-        # Utiliser charger_matchs() pour être cohérent avec le reste du code
-        matches = charger_matchs()
-        return jsonify(matches)
+        return jsonify(match_registry.en_dicts())
     except Exception as e:
         log(f"❌ Erreur chargement matches: {e}", 'error')
         return jsonify({"error": str(e)}), 500
@@ -1454,27 +4291,18 @@ def api_add_match():
             except Exception:
                 return jsonify({"error": "URL invalide"}), 400
             
-            # Vérifier l'unicité dans la DB d'abord (source de vérité)
-            def _check_uniqueness(conn, nom, url):
-                cursor = conn.cursor()
-                cursor.execute('SELECT nom, url FROM matches WHERE nom = ? OR url = ?', (nom, url))
-                return cursor.fetchone()
+            # Unicité : index du repository d'abord, sans requête ; les contraintes UNIQUE
+            # de la base (nom, URL) refusent quand même un doublon ajouté par un autre process
+            def _doublon():
+                if match_repository.par_nom(nom) is not None:
+                    return jsonify({"error": f"Un match avec le nom '{nom}' existe déjà"}), 409
+                if match_repository.par_url(url) is not None:
+                    return jsonify({"error": f"Un match avec cette URL existe déjà"}), 409
+                return None
             
-            try:
-                existing_match = execute_with_retry(_check_uniqueness, nom, url)
-                if existing_match:
-                    existing_nom = existing_match[0] if existing_match[0] else None
-                    existing_url = existing_match[1] if len(existing_match) > 1 and existing_match[1] else None
-                    if existing_nom == nom:
-                        return jsonify({"error": f"Un match avec le nom '{nom}' existe déjà"}), 409
-                    elif existing_url == url:
-                        return jsonify({"error": f"Un match avec cette URL existe déjà"}), 409
-            except sqlite3.OperationalError as e:
-                log(f"⚠️ Erreur vérification unicité (verrou): {e}", 'warning')
-                # Continuer, on vérifiera après avec l'insertion qui échouera si doublon
-            except Exception as e:
-                log(f"⚠️ Erreur vérification unicité: {e}", 'warning')
-                # Continuer, on vérifiera après avec l'insertion qui échouera si doublon
+            reponse = _doublon()
+            if reponse is not None:
+                return reponse
             
             # Préparer le nouveau match
             competition = data.get('competition', 'Ligue 1')
@@ -1492,15 +4320,24 @@ def api_add_match():
             }
             
             # ORDRE CORRIGÉ : Sauvegarder dans SQLite D'ABORD (source de vérité)
-            save_result = save_match_to_db(new_match)
-            if not save_result:
+            new_match = match_repository.enregistrer(new_match, creation=True)
+            if new_match is None:
+                # Refusé par la base : doublon inconnu de l'index ? Relire les matchs pour le dire
+                try:
+                    match_repository.charger()
+                except Exception as e:
+                    log(f"⚠️ Erreur rechargement des matchs: {e}", 'warning')
+                reponse = _doublon()
+                if reponse is not None:
+                    return reponse
                 return jsonify({"error": "Impossible de sauvegarder le match dans la base de données"}), 500
             
             log(f"✅ Match sauvegardé dans SQLite: {nom}", 'success')
             log(f"📂 Base de données: {os.path.abspath(DB_FILE)}", 'info')
             
-            # Recharger les matches depuis la DB pour avoir la liste à jour
-            matches = charger_matchs()
+            # Mettre à jour le registre (la boucle de surveillance est notifiée)
+            match_registry.ajouter(new_match)
+            matches = match_registry.en_dicts()
             
             # Sauvegarder aussi dans le fichier local (backup)
             try:
@@ -1511,16 +4348,14 @@ def api_add_match():
                 log(f"⚠️ Erreur sauvegarde backup matches.json: {e}", 'warning')
             
             # Mettre à jour status.json immédiatement
-            global MATCHS
-            MATCHS = matches  # Mettre à jour la variable globale
             sauvegarder_status()  # Mettre à jour status.json pour que le site l'affiche
             
             log(f"✅ Match ajouté: {nom} ({url})", 'success')
             log(f"📊 Total de matchs surveillés: {len(matches)}", 'info')
-            log(f"🔄 Le match sera vérifié au prochain cycle de surveillance (~90 secondes)", 'info')
+            log(f"🔄 Le match va être vérifié immédiatement", 'info')
             log(f"💾 status.json mis à jour - le nouveau match apparaît sur le site public", 'success')
             
-            return jsonify({"success": True, "match": new_match}), 201
+            return jsonify({"success": True, "match": new_match.to_dict()}), 201
         except sqlite3.IntegrityError as e:
             error_msg = str(e)
             if "UNIQUE constraint" in error_msg or "unique" in error_msg.lower():
@@ -1540,13 +4375,12 @@ def api_add_match():
 def api_get_match_details(match_name):
     """Retourne les détails complets d'un match depuis matches.json"""
     try:
-        matches = charger_matchs()
         # Décoder le nom du match (peut contenir des caractères spéciaux)
         from urllib.parse import unquote
         match_name_decoded = unquote(match_name)
-        match = next((m for m in matches if m.get('nom') == match_name_decoded), None)
+        match = match_registry.get(match_name_decoded)
         if match:
-            return jsonify(match)
+            return jsonify(match.to_dict())
         else:
             return jsonify({"error": "Match non trouvé"}), 404
     except Exception as e:
@@ -1558,12 +4392,10 @@ def api_delete_match(index):
     """Supprime un match par son index"""
     with matches_lock:  # Protéger l'opération avec un verrou
         try:
-            # PRIORITÉ : Lire depuis SQLite (source de vérité)
-            matches = charger_matchs()
+            deleted = match_registry.par_index(index)
             
-            if 0 <= index < len(matches):
-                deleted = matches[index]  # Ne pas pop() encore, on supprime de la DB d'abord
-                match_nom = deleted.get('nom', '')
+            if deleted is not None:  # On supprime de la DB d'abord
+                match_nom = deleted.nom
                 
                 if not match_nom:
                     return jsonify({"error": "Nom de match invalide"}), 400
@@ -1575,10 +4407,12 @@ def api_delete_match(index):
                     return jsonify({"error": f"Impossible de supprimer le match '{match_nom}' de la base de données"}), 500
                 
                 log(f"✅ Match supprimé de SQLite: {match_nom}", 'success')
+                calendrier_ventes.invalider()
                 log(f"📂 Base de données: {os.path.abspath(DB_FILE)}", 'info')
                 
-                # Recharger les matches depuis la DB pour avoir la liste à jour
-                matches = charger_matchs()
+                # Mettre à jour le registre (la boucle de surveillance est notifiée)
+                match_registry.supprimer(match_nom)
+                matches = match_registry.en_dicts()
                 
                 # Sauvegarder aussi dans le fichier local (backup)
                 try:
@@ -1589,16 +4423,14 @@ def api_delete_match(index):
                     log(f"⚠️ Erreur sauvegarde matches.json: {e}", 'warning')
                 
                 # Mettre à jour status.json immédiatement
-                global MATCHS
-                MATCHS = matches  # Mettre à jour la variable globale
                 sauvegarder_status()  # Mettre à jour status.json
                 
-                log(f"🗑️ Match supprimé: {match_nom} ({deleted.get('url')})", 'error')
+                log(f"🗑️ Match supprimé: {match_nom} ({deleted.url})", 'error')
                 log(f"📊 Matchs restants: {len(matches)}", 'info')
                 log(f"💾 status.json mis à jour - le site public reflète le changement", 'success')
-                log(f"⏸️ Le match ne sera plus surveillé au prochain cycle", 'info')
+                log(f"⏸️ Le match n'est plus surveillé", 'info')
                 
-                return jsonify({"success": True, "deleted": deleted})
+                return jsonify({"success": True, "deleted": deleted.to_dict()})
             else:
                 return jsonify({"error": "Index invalide"}), 404
         except Exception as e:
@@ -1607,32 +4439,93 @@ def api_delete_match(index):
             traceback.print_exc()
             return jsonify({"error": str(e)}), 500
 
+def _fenetre_to_dict(fenetre):
+    return {'id': fenetre['id'], 'match': fenetre['match'], 'type': fenetre['type'],
+            'debut': fenetre['debut'], 'fin': fenetre['fin']}
+
+@app.route('/api/matches/<match_name>/sale-windows', methods=['GET'])
+def api_get_sale_windows(match_name):
+    """Liste les fenêtres de vente d'un match et la timeline de polling qui en découle"""
+    try:
+        from urllib.parse import unquote
+        match_name_decoded = unquote(match_name)
+        fenetres = load_sale_windows_from_db(match_name_decoded)
+        timeline = [{'debut': debut.isoformat(), 'fin': fin.isoformat(), 'phase': phase, 'intervalle': intervalle}
+                    for debut, fin, phase, intervalle in calendrier_ventes.timeline(match_name_decoded)]
+        return jsonify({"success": True, "windows": [_fenetre_to_dict(f) for f in fenetres], "timeline": timeline})
+    except Exception as e:
+        log(f"❌ Erreur chargement fenêtres de vente: {e}", 'error')
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/matches/<match_name>/sale-windows', methods=['POST'])
+def api_add_sale_window(match_name):
+    """Ajoute une fenêtre de vente (type, debut, fin au format ISO) à un match"""
+    try:
+        from urllib.parse import unquote
+        match_name_decoded = unquote(match_name)
+        if match_registry.get(match_name_decoded) is None:
+            return jsonify({"error": "Match non trouvé"}), 404
+        
+        data = request.json or {}
+        type_fenetre = (data.get('type') or '').strip()
+        if type_fenetre not in SALE_WINDOW_TYPES:
+            return jsonify({"error": f"Type invalide (attendu: {', '.join(SALE_WINDOW_TYPES)})"}), 400
+        try:
+            debut = lire_date_locale(data.get('debut') or '')
+            fin = lire_date_locale(data.get('fin') or '')
+        except ValueError:
+            return jsonify({"error": "Dates invalides (format attendu: 2025-03-01T10:00)"}), 400
+        if fin <= debut:
+            return jsonify({"error": "La fin doit être après le début"}), 400
+        
+        fenetre = {'match': match_name_decoded, 'type': type_fenetre,
+                   'debut': debut.isoformat(timespec='minutes'), 'fin': fin.isoformat(timespec='minutes')}
+        fenetre['id'] = save_sale_window_to_db(fenetre)
+        if fenetre['id'] is None:
+            return jsonify({"error": "Impossible de sauvegarder la fenêtre dans la base de données"}), 500
+        calendrier_ventes.invalider(match_name_decoded)
+        log(f"📅 Fenêtre de vente ajoutée pour {match_name_decoded}: {type_fenetre} du {fenetre['debut']} au {fenetre['fin']}", 'success')
+        return jsonify({"success": True, "window": _fenetre_to_dict(fenetre)}), 201
+    except Exception as e:
+        log(f"❌ Erreur ajout fenêtre de vente: {e}", 'error')
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/sale-windows/<int:window_id>', methods=['DELETE'])
+def api_delete_sale_window(window_id):
+    """Supprime une fenêtre de vente"""
+    match_nom = delete_sale_window_from_db(window_id)
+    if match_nom is None:
+        return jsonify({"error": "Fenêtre non trouvée"}), 404
+    calendrier_ventes.invalider(match_nom)
+    log(f"🗑️ Fenêtre de vente {window_id} supprimée ({match_nom})", 'info')
+    return jsonify({"success": True, "deleted": window_id})
+
 @app.route('/api/matches/<int:index>/check', methods=['POST'])
 def api_force_check(index):
     """Force la vérification d'un match spécifique"""
     try:
-        # Utiliser charger_matchs() pour être cohérent avec le reste du code
-        matches = charger_matchs()
+        match = match_registry.par_index(index)
         
         # Vérifier que l'index est valide
-        if 0 <= index < len(matches):
-            match = matches[index]
+        if match is not None:
             nom = match.get("nom", "Match inconnu")
             
-            # Lancer la vérification dans un thread séparé pour ne pas bloquer
-            def verifier_en_background():
-                url_match = match.get("url", "URL inconnue")
-                log(f"🔄 Vérification forcée de {nom}...", 'info')
-                log(f"🌐 URL: {url_match}", 'info')
-                verifier_match(match)
-                log(f"✅ Vérification forcée de {nom} terminée", 'success')
-            
-            threading.Thread(target=verifier_en_background, daemon=True).start()
+            # Passer par la file : une demande répétée rejoint le job déjà prévu pour ce match
+            job, fusionne = check_queue.soumettre(match, PRIORITE_FORCEE)
+            if fusionne:
+                message = f"Vérification de {nom} déjà {'en cours' if job.etat == 'en_cours' else 'prévue'}"
+            else:
+                message = f"Vérification de {nom} lancée en arrière-plan"
             
             return jsonify({
                 "success": True, 
-                "message": f"Vérification de {nom} lancée en arrière-plan"
-            })
+                "message": message,
+                "job_id": job.id,
+                "etat": job.etat,
+                "fusionne": fusionne
+            }), 202
         else:
             return jsonify({"error": "Index invalide"}), 404
     except Exception as e:
@@ -1641,112 +4534,57 @@ def api_force_check(index):
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/analytics', methods=['GET'])
-def api_get_analytics():
-    """Retourne les statistiques du site web"""
-    try:
-        # Essayer SQLite d'abord
+@app.route('/api/metrics', methods=['GET'])
+def api_metrics():
+    """Expose les métriques des checks au format texte Prometheus"""
+    # Jauges lues au moment du scrape
+    metriques.fixer('psm_browser_launches_total', browser_pool.launches)
+    metriques.fixer('psm_browser_recycles_total', browser_pool.recyclages)
+    metriques.fixer('psm_check_queue_pending', check_queue.resume()['en_attente'])
+    if memory_watchdog.echantillons:
+        metriques.fixer('psm_browser_rss_megabytes', memory_watchdog.echantillons[-1]['rss_mb'])
+    return Response(metriques.exporter(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/checks/<job_id>', methods=['GET'])
+def api_get_check(job_id):
+    """Retourne l'état (et le résultat une fois terminé) d'une vérification"""
+    job = check_queue.job(job_id)
+    if job is None:
+        return jsonify({"error": "Job inconnu"}), 404
+    return jsonify({"success": True, "job": job.to_dict()})
+
+# Les analytics vivent en mémoire : les handlers ne relisent ni ne réécrivent plus le
+# fichier à chaque visite, l'écrivain de persistance enregistre le dernier état
+analytics_lock = threading.Lock()
+analytics_courantes = None
+
+def analytics_en_memoire():
+    """Analytics courantes (sous analytics_lock), chargées une fois depuis SQLite ou le fichier local"""
+    global analytics_courantes
+    if analytics_courantes is None:
         analytics = load_analytics_from_db()
-        
-        # Fallback sur fichier local
         if not analytics:
             try:
                 with open(ANALYTICS_FILE, 'r', encoding='utf-8') as f:
                     analytics = json.load(f)
             except FileNotFoundError:
                 analytics = {}
-        
-        # S'assurer que analytics est un dictionnaire (pas None)
-        if analytics is None:
-            analytics = {}
-        
-        # S'assurer que toutes les propriétés existent
-        default_values = {
-            "visiteurs_totaux": 0,
-            "visiteurs_en_ligne": 0,
-            "visiteurs_aujourdhui": 0,
-            "temps_moyen": "0m 0s",
-            "taux_rebond": "0%",
-            "clics_telegram": 0,
-            "pic_connexions": 0,
-            "taux_retour": "0%",
-            "historique_7j": [0, 0, 0, 0, 0, 0, 0],
-            "derniere_date": None
-        }
-        
-        # Remplir les valeurs manquantes
-        for key, default_value in default_values.items():
-            if key not in analytics:
-                analytics[key] = default_value
-        
-        # Vérifier si l'historique doit être mis à jour (nouveau jour)
-        date_actuelle = datetime.now().strftime("%Y-%m-%d")
-        derniere_date = analytics.get("derniere_date")
-        
-        if derniere_date != date_actuelle and derniere_date is not None:
-            # Nouveau jour détecté, mettre à jour l'historique
-            try:
-                derniere_date_obj = datetime.strptime(derniere_date, "%Y-%m-%d")
-                date_actuelle_obj = datetime.strptime(date_actuelle, "%Y-%m-%d")
-                jours_ecoules = (date_actuelle_obj - derniere_date_obj).days
-                
-                if jours_ecoules > 0:
-                    # Décaler l'historique
-                    for i in range(min(jours_ecoules, 7)):
-                        analytics["historique_7j"].pop(0)
-                        analytics["historique_7j"].append(0)
-                    
-                    if jours_ecoules >= 7:
-                        analytics["historique_7j"] = [0, 0, 0, 0, 0, 0, 0]
-                    
-                    analytics["visiteurs_aujourdhui"] = 0
-                    analytics["derniere_date"] = date_actuelle
-                    
-                    # Sauvegarder dans Firestore
-                    # Sauvegarder dans SQLite
-                    save_analytics_to_db(analytics)
-                    
-                    # Sauvegarder aussi dans le fichier local (backup)
-                    with open(ANALYTICS_FILE, 'w', encoding='utf-8') as f:
-                        json.dump(analytics, f, ensure_ascii=False, indent=2)
-            except Exception as e:
-                print(f"⚠️ Erreur mise à jour historique: {e}")
-        
-        return jsonify(analytics)
-    except FileNotFoundError:
-        # Créer des stats par défaut (valeurs réelles, pas de simulation)
-        default_analytics = {
-            "visiteurs_totaux": 0,
-            "visiteurs_en_ligne": 0,
-            "visiteurs_aujourdhui": 0,
-            "temps_moyen": "0m 0s",
-            "taux_rebond": "0%",
-            "clics_telegram": 0,
-            "pic_connexions": 0,
-            "taux_retour": "0%",
-            "historique_7j": [0, 0, 0, 0, 0, 0, 0],
-            "derniere_date": datetime.now().strftime("%Y-%m-%d")
-        }
-        with open(ANALYTICS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(default_analytics, f, ensure_ascii=False, indent=2)
-        return jsonify(default_analytics)
-    except Exception as e:
-        print(f"❌ Erreur lecture analytics: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
+        analytics_courantes = analytics or {}
+    return analytics_courantes
 
-@app.route('/api/analytics/visitor', methods=['POST'])
-def api_track_visitor():
-    """Enregistre une visite sur le site"""
+def sauvegarder_analytics(analytics):
+    """Copie l'état courant vers l'écrivain de persistance (seul le dernier en attente est écrit)"""
+    persistence.soumettre('analytics', copy.deepcopy(analytics), cle='analytics')
+
+@app.route('/api/analytics', methods=['GET'])
+def api_get_analytics():
+    """Retourne les statistiques du site web"""
     try:
-        # Charger analytics
-        try:
-            with open(ANALYTICS_FILE, 'r', encoding='utf-8') as f:
-                analytics = json.load(f)
-        except FileNotFoundError:
-            # Initialiser avec toutes les propriétés nécessaires
-            analytics = {
+        with analytics_lock:
+            analytics = analytics_en_memoire()
+            
+            # S'assurer que toutes les propriétés existent
+            default_values = {
                 "visiteurs_totaux": 0,
                 "visiteurs_en_ligne": 0,
                 "visiteurs_aujourdhui": 0,
@@ -1758,82 +4596,127 @@ def api_track_visitor():
                 "historique_7j": [0, 0, 0, 0, 0, 0, 0],
                 "derniere_date": None
             }
-        
-        # S'assurer que toutes les propriétés existent
-        if "visiteurs_totaux" not in analytics:
-            analytics["visiteurs_totaux"] = 0
-        if "visiteurs_en_ligne" not in analytics:
-            analytics["visiteurs_en_ligne"] = 0
-        if "visiteurs_aujourdhui" not in analytics:
-            analytics["visiteurs_aujourdhui"] = 0
-        if "temps_moyen" not in analytics:
-            analytics["temps_moyen"] = "0m 0s"
-        if "taux_rebond" not in analytics:
-            analytics["taux_rebond"] = "0%"
-        if "clics_telegram" not in analytics:
-            analytics["clics_telegram"] = 0
-        if "pic_connexions" not in analytics:
-            analytics["pic_connexions"] = 0
-        if "taux_retour" not in analytics:
-            analytics["taux_retour"] = "0%"
-        if "historique_7j" not in analytics:
-            analytics["historique_7j"] = [0, 0, 0, 0, 0, 0, 0]
-        if "derniere_date" not in analytics:
-            analytics["derniere_date"] = None
-        
-        # Obtenir la date actuelle (format YYYY-MM-DD)
-        date_actuelle = datetime.now().strftime("%Y-%m-%d")
-        derniere_date = analytics.get("derniere_date")
-        
-        # Si c'est un nouveau jour, mettre à jour l'historique
-        if derniere_date != date_actuelle:
-            if derniere_date is not None:
-                # Calculer le nombre de jours écoulés
+            
+            # Remplir les valeurs manquantes
+            for key, default_value in default_values.items():
+                if key not in analytics:
+                    analytics[key] = default_value
+            
+            # Vérifier si l'historique doit être mis à jour (nouveau jour)
+            date_actuelle = datetime.now().strftime("%Y-%m-%d")
+            derniere_date = analytics.get("derniere_date")
+            
+            if derniere_date != date_actuelle and derniere_date is not None:
+                # Nouveau jour détecté, mettre à jour l'historique
                 try:
                     derniere_date_obj = datetime.strptime(derniere_date, "%Y-%m-%d")
                     date_actuelle_obj = datetime.strptime(date_actuelle, "%Y-%m-%d")
                     jours_ecoules = (date_actuelle_obj - derniere_date_obj).days
                     
-                    # Si plus d'un jour s'est écoulé, décaler l'historique
                     if jours_ecoules > 0:
-                        # Décaler l'historique vers la gauche
+                        # Décaler l'historique
                         for i in range(min(jours_ecoules, 7)):
                             analytics["historique_7j"].pop(0)
                             analytics["historique_7j"].append(0)
                         
-                        # Si plus de 7 jours, réinitialiser
                         if jours_ecoules >= 7:
                             analytics["historique_7j"] = [0, 0, 0, 0, 0, 0, 0]
+                        
+                        analytics["visiteurs_aujourdhui"] = 0
+                        analytics["derniere_date"] = date_actuelle
+                        
+                        # Sauvegarder dans SQLite + fichier local (backup)
+                        sauvegarder_analytics(analytics)
                 except Exception as e:
-                    print(f"⚠️ Erreur calcul jours: {e}")
-                    # En cas d'erreur, réinitialiser l'historique
-                    analytics["historique_7j"] = [0, 0, 0, 0, 0, 0, 0]
-            
-            # Réinitialiser le compteur du jour actuel
-            analytics["visiteurs_aujourdhui"] = 0
-            analytics["derniere_date"] = date_actuelle
-        
-        # Incrémenter les compteurs
-        analytics["visiteurs_totaux"] = analytics.get("visiteurs_totaux", 0) + 1
-        analytics["visiteurs_en_ligne"] = analytics.get("visiteurs_en_ligne", 0) + 1
-        analytics["visiteurs_aujourdhui"] = analytics.get("visiteurs_aujourdhui", 0) + 1
-        
-        # Mettre à jour l'historique des 7 derniers jours (dernier élément = aujourd'hui)
-        if len(analytics["historique_7j"]) > 0:
-            analytics["historique_7j"][-1] = analytics["visiteurs_aujourdhui"]
-        else:
-            analytics["historique_7j"] = [analytics["visiteurs_aujourdhui"]]
-        
-        # Mettre à jour le pic de connexions si nécessaire
-        if analytics["visiteurs_en_ligne"] > analytics.get("pic_connexions", 0):
-            analytics["pic_connexions"] = analytics["visiteurs_en_ligne"]
-        
-        # Sauvegarder dans SQLite
-        save_analytics_to_db(analytics)
+                    print(f"⚠️ Erreur mise à jour historique: {e}")
+            
+            analytics = copy.deepcopy(analytics)
         
-        # Sauvegarder aussi dans le fichier local (backup)
-        with open(ANALYTICS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(analytics, f, ensure_ascii=False, indent=2)
+        return jsonify(analytics)
+    except Exception as e:
+        print(f"❌ Erreur lecture analytics: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/analytics/visitor', methods=['POST'])
+def api_track_visitor():
+    """Enregistre une visite sur le site"""
+    try:
+        with analytics_lock:
+            analytics = analytics_en_memoire()
+            
+            # S'assurer que toutes les propriétés existent
+            if "visiteurs_totaux" not in analytics:
+                analytics["visiteurs_totaux"] = 0
+            if "visiteurs_en_ligne" not in analytics:
+                analytics["visiteurs_en_ligne"] = 0
+            if "visiteurs_aujourdhui" not in analytics:
+                analytics["visiteurs_aujourdhui"] = 0
+            if "temps_moyen" not in analytics:
+                analytics["temps_moyen"] = "0m 0s"
+            if "taux_rebond" not in analytics:
+                analytics["taux_rebond"] = "0%"
+            if "clics_telegram" not in analytics:
+                analytics["clics_telegram"] = 0
+            if "pic_connexions" not in analytics:
+                analytics["pic_connexions"] = 0
+            if "taux_retour" not in analytics:
+                analytics["taux_retour"] = "0%"
+            if "historique_7j" not in analytics:
+                analytics["historique_7j"] = [0, 0, 0, 0, 0, 0, 0]
+            if "derniere_date" not in analytics:
+                analytics["derniere_date"] = None
+            
+            # Obtenir la date actuelle (format YYYY-MM-DD)
+            date_actuelle = datetime.now().strftime("%Y-%m-%d")
+            derniere_date = analytics.get("derniere_date")
+            
+            # Si c'est un nouveau jour, mettre à jour l'historique
+            if derniere_date != date_actuelle:
+                if derniere_date is not None:
+                    # Calculer le nombre de jours écoulés
+                    try:
+                        derniere_date_obj = datetime.strptime(derniere_date, "%Y-%m-%d")
+                        date_actuelle_obj = datetime.strptime(date_actuelle, "%Y-%m-%d")
+                        jours_ecoules = (date_actuelle_obj - derniere_date_obj).days
+                        
+                        # Si plus d'un jour s'est écoulé, décaler l'historique
+                        if jours_ecoules > 0:
+                            # Décaler l'historique vers la gauche
+                            for i in range(min(jours_ecoules, 7)):
+                                analytics["historique_7j"].pop(0)
+                                analytics["historique_7j"].append(0)
+                            
+                            # Si plus de 7 jours, réinitialiser
+                            if jours_ecoules >= 7:
+                                analytics["historique_7j"] = [0, 0, 0, 0, 0, 0, 0]
+                    except Exception as e:
+                        print(f"⚠️ Erreur calcul jours: {e}")
+                        # En cas d'erreur, réinitialiser l'historique
+                        analytics["historique_7j"] = [0, 0, 0, 0, 0, 0, 0]
+                
+                # Réinitialiser le compteur du jour actuel
+                analytics["visiteurs_aujourdhui"] = 0
+                analytics["derniere_date"] = date_actuelle
+            
+            # Incrémenter les compteurs
+            analytics["visiteurs_totaux"] = analytics.get("visiteurs_totaux", 0) + 1
+            analytics["visiteurs_en_ligne"] = analytics.get("visiteurs_en_ligne", 0) + 1
+            analytics["visiteurs_aujourdhui"] = analytics.get("visiteurs_aujourdhui", 0) + 1
+            
+            # Mettre à jour l'historique des 7 derniers jours (dernier élément = aujourd'hui)
+            if len(analytics["historique_7j"]) > 0:
+                analytics["historique_7j"][-1] = analytics["visiteurs_aujourdhui"]
+            else:
+                analytics["historique_7j"] = [analytics["visiteurs_aujourdhui"]]
+            
+            # Mettre à jour le pic de connexions si nécessaire
+            if analytics["visiteurs_en_ligne"] > analytics.get("pic_connexions", 0):
+                analytics["pic_connexions"] = analytics["visiteurs_en_ligne"]
+            
+            # Sauvegarder dans SQLite + fichier local (backup)
+            sauvegarder_analytics(analytics)
         
         return jsonify({"success": True})
     except Exception as e:
@@ -1856,41 +4739,45 @@ def api_get_detections_history():
         log(f"❌ Erreur récupération historique: {e}", 'error')
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/detections/rollups', methods=['GET'])
+def api_get_detection_rollups():
+    """Agrégats horaires/journaliers des détections (?granularite=hourly|daily&match=&depuis=&avant=&limit=)"""
+    granularite = request.args.get('granularite', 'daily')
+    if granularite not in ROLLUPS_DETECTIONS:
+        return jsonify({"error": f"granularite doit valoir {' ou '.join(ROLLUPS_DETECTIONS)}"}), 400
+    try:
+        limit = min(int(request.args.get('limit', 500)), 5000)
+    except ValueError:
+        return jsonify({"error": "limit doit être un entier"}), 400
+    match = request.args.get('match')
+    try:
+        return jsonify({
+            "success": True,
+            "granularite": granularite,
+            "agregats": load_detection_rollups(granularite, match, request.args.get('depuis'),
+                                               request.args.get('avant'), limit),
+            "repartition": load_detection_patterns(match)
+        })
+    except Exception as e:
+        log(f"❌ Erreur lecture agrégats détections: {e}", 'error')
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/analytics/telegram-click', methods=['POST'])
 def api_track_telegram_click():
     """Enregistre un clic sur le bouton Telegram"""
     try:
-        # Charger analytics
-        try:
-            with open(ANALYTICS_FILE, 'r', encoding='utf-8') as f:
-                analytics = json.load(f)
-        except FileNotFoundError:
-            # Initialiser avec toutes les propriétés nécessaires
-            analytics = {
-                "visiteurs_totaux": 0,
-                "visiteurs_en_ligne": 0,
-                "visiteurs_aujourdhui": 0,
-                "temps_moyen": "0m 0s",
-                "taux_rebond": "0%",
-                "clics_telegram": 0,
-                "pic_connexions": 0,
-                "taux_retour": "0%",
-                "historique_7j": [0, 0, 0, 0, 0, 0, 0]
-            }
-        
-        # S'assurer que toutes les propriétés existent
-        if "clics_telegram" not in analytics:
-            analytics["clics_telegram"] = 0
-        
-        # Incrémenter
-        analytics["clics_telegram"] = analytics.get("clics_telegram", 0) + 1
-        
-        # Sauvegarder dans SQLite
-        save_analytics_to_db(analytics)
-        
-        # Sauvegarder aussi dans le fichier local (backup)
-        with open(ANALYTICS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(analytics, f, ensure_ascii=False, indent=2)
+        with analytics_lock:
+            analytics = analytics_en_memoire()
+            
+            # S'assurer que toutes les propriétés existent
+            if "clics_telegram" not in analytics:
+                analytics["clics_telegram"] = 0
+            
+            # Incrémenter
+            analytics["clics_telegram"] = analytics.get("clics_telegram", 0) + 1
+            
+            # Sauvegarder dans SQLite + fichier local (backup)
+            sauvegarder_analytics(analytics)
         
         return jsonify({"success": True})
     except Exception as e:
@@ -1913,6 +4800,40 @@ def api_get_logs():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/traces', methods=['GET', 'POST'])
+def api_traces():
+    """Niveau et échantillonnage des traces de diagnostic ; POST {"niveau": "debug", "echantillon": 0.1}"""
+    if request.method == 'POST':
+        data = request.json or {}
+        try:
+            trace.configurer(data.get('niveau'), data.get('echantillon'))
+        except (ValueError, TypeError) as e:
+            return jsonify({"error": str(e)}), 400
+        log(f"🔎 Traces: {trace.resume()['niveau']} (échantillon {trace.echantillon})", 'info')
+    return jsonify({"success": True, "traces": trace.resume()})
+
+@app.route('/api/checker/stats', methods=['GET'])
+def api_get_checker_stats():
+    """Retourne les statistiques internes du checker (tiers HTTP/navigateur...)"""
+    try:
+        return jsonify({
+            "success": True,
+            "tiers": get_tier_stats(),
+            "requetes": dict(route_stats),
+            "changements": list(derniers_changements),
+            "memoire": memory_watchdog.resume(),
+            "file": check_queue.resume(),
+            "debit": rate_limiter.resume(),
+            "baux": lease_manager.resume(),
+            "sqlite": db_pool.resume(),
+            "persistance": persistence.resume(),
+            "matchs": match_repository.resume(),
+            "traces": trace.resume(),
+            "status": status_snapshot.resume()
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/groq/analyze', methods=['GET'])
 def api_groq_analyze():
     """Génère une analyse IA complète du match avec Groq (analysis, comparison, weather, lineups)"""
@@ -1926,20 +4847,11 @@ def api_groq_analyze():
         if cached_data:
             return jsonify(cached_data)
         
-        # Charger les données du match depuis status.json
-        try:
-            with open(STATUS_FILE, 'r', encoding='utf-8') as f:
-                status = json.load(f)
-        except FileNotFoundError:
-            return jsonify({"error": "status.json non trouvé"}), 404
-        
-        match = next((m for m in status.get('matchs', []) if m['nom'] == match_name), None)
-        if not match:
+        # Données complètes du match depuis le registre, et sa ligne de status
+        match_data = match_registry.get(match_name)
+        if not match_data:
             return jsonify({"error": "Match non trouvé"}), 404
-        
-        # Charger les données complètes du match depuis matches.json
-        matches_list = charger_matchs()
-        match_data = next((m for m in matches_list if m.get('nom') == match_name), None)
+        match = load_match_status_from_db(match_name) or {"nb_checks": 0, "pmr_disponible": False}
         
         # Extraire les équipes
         teams = extract_teams_from_match_name(match_name)
@@ -2248,10 +5160,6 @@ def start_flask_api():
     """Démarre l'API Flask dans un thread séparé"""
     app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False)
 
-# Démarrer l'API Flask en arrière-plan
-threading.Thread(target=start_flask_api, daemon=True).start()
-log("🔌 API Flask démarrée sur le port 5000", 'success')
-
 # Démarrer le serveur web dans un thread séparé
 def start_web_server():
     """Serveur web simple pour servir index.html et status.json"""
@@ -2419,23 +5327,96 @@ def start_web_server():
     log(f"📱 Site accessible sur http://localhost:{port}/index.html", 'info')
     server.serve_forever()
 
-# Lancer le serveur web en arrière-plan
-threading.Thread(target=start_web_server, daemon=True).start()
-
-log("🚀 Bot PSM démarré avec serveur web intégré!", 'success')
-
-# ✅ BOUCLE PRINCIPALE MULTI-MATCHS
-while True:
-    MATCHS = charger_matchs()  # Recharger les matchs à chaque itération
-    log(f"📋 Cycle de surveillance: {len(MATCHS)} match(s) à vérifier", 'info')
-    if len(MATCHS) > 0:
-        matchs_noms = ', '.join([m['nom'] for m in MATCHS])
-        log(f"📝 Matchs: {matchs_noms}", 'info')
-    for match in MATCHS:
-        verifier_match(match)
+def _replanifier_apres_check(scheduler, job):
+    """Rappel de fin de job : l'échéance du match part de la fin de son check"""
+    r = job.resultat
+    if r['erreur']:
+        log(f"   ❌ {r['nom']}: {r['duree']:.1f}s (erreur)", 'info')
+    elif r['differe']:
+        log(f"   🚦 {r['nom']}: reporté de {r['differe']:.0f}s (limitation de débit)", 'info')
+    else:
+        log(f"   ✅ {r['nom']}: {r['duree']:.1f}s ({r['nb_pmr']} PMR via {r['source']})", 'info')
+    try:
+        scheduler.replanifier(job.match, r)
+    except Exception as e:
+        # Ne jamais laisser un match (fenêtre de vente mal formée...) arrêter la surveillance
+        log(f"⚠️ Erreur replanification de {job.nom}: {e}", 'error')
+    etat_chaud_modifie.set()
+    # La nouvelle échéance (rafale...) peut tomber avant la fin de la pause en cours
+    reveil_surveillance.set()
 
-    pause = 90 + random.randint(0, 5)
-    log(f"⏳ Pause {pause} secondes...", 'info')
-    time.sleep(pause)
+def boucle_surveillance():
+    """
+    Boucle principale multi-matchs : met les matchs dus en file sans attendre leurs checks,
+    puis dort jusqu'à la prochaine échéance ou la fin d'un check (reveil_surveillance).
+    """
+    scheduler = match_scheduler
+    derniere_resync = time.monotonic()
+    dernier_snapshot = time.monotonic()
+    # Ajout/suppression via l'API : réveiller la boucle pour prendre le changement tout de suite
+    match_registry.abonner(lambda version: reveil_surveillance.set())
+    
+    while True:
+        # Filet de sécurité : relire SQLite de temps en temps (modifs faites hors de ce process)
+        if time.monotonic() - derniere_resync >= POLL_RESYNC_INTERVAL:
+            match_registry.recharger()
+            derniere_resync = time.monotonic()
+        matchs = lease_manager.filtrer(match_registry.lister())
+        scheduler.synchroniser(matchs)
+        
+        dus = scheduler.matchs_dus()
+        if dus:
+            log(f"📋 Cycle de surveillance: {len(dus)}/{len(matchs)} match(s) à vérifier", 'info')
+            log(f"📝 Matchs: {', '.join(m['nom'] for m in dus)}", 'info')
+            # Chaque match est replanifié dès la fin de son propre check, pas à la fin du lot
+            for match in dus:
+                check_queue.soumettre(match, rappel=lambda job: _replanifier_apres_check(scheduler, job))
+        
+        # Snapshot de démarrage à chaud : borné dans le temps, plus de fin de cycle commune
+        prochain_snapshot = None
+        if etat_chaud_modifie.is_set():
+            prochain_snapshot = WARM_STATE_INTERVAL - (time.monotonic() - dernier_snapshot)
+            if prochain_snapshot <= 0:
+                etat_chaud_modifie.clear()
+                sauvegarder_etat_chaud()
+                dernier_snapshot = time.monotonic()
+                prochain_snapshot = None
+        
+        attente = scheduler.attente()
+        prochaine_resync = POLL_RESYNC_INTERVAL - (time.monotonic() - derniere_resync)
+        pause = min(attente if attente is not None else POLL_RESYNC_INTERVAL, prochaine_resync)
+        if prochain_snapshot is not None:
+            pause = min(pause, prochain_snapshot)
+        pause = max(1.0, pause)
+        if pause >= 10 and not scheduler.en_cours():
+            log(f"⏳ Pause {int(pause)} secondes...", 'info')
+        reveil_surveillance.wait(pause)
+        reveil_surveillance.clear()
 
+def main():
+    """Démarre l'API Flask, le serveur web et la boucle de surveillance"""
+    # SIGTERM (arrêt de la machine) : sortir proprement pour que les handlers atexit
+    # (écritures en attente, snapshot de démarrage à chaud, navigateur, baux) s'exécutent
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    # Démarrer l'API Flask en arrière-plan
+    threading.Thread(target=start_flask_api, daemon=True).start()
+    log("🔌 API Flask démarrée sur le port 5000", 'success')
+    
+    # Lancer le serveur web en arrière-plan
+    threading.Thread(target=start_web_server, daemon=True).start()
+    
+    # Surveiller la mémoire de Chromium
+    memory_watchdog.demarrer()
+    
+    # Prendre nos baux avant la première vérification (si plusieurs workers)
+    lease_manager.demarrer()
+    
+    log("🚀 Bot PSM démarré avec serveur web intégré!", 'success')
+    
+    # ✅ BOUCLE PRINCIPALE MULTI-MATCHS
+    boucle_surveillance()
 
+# Importé (benchmark, outils) : ni les serveurs ni la boucle ne démarrent
+if __name__ == '__main__':
+    main()